@@ -1,8 +1,45 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-import json
+import logging
 import os
 import sqlite3
+import threading
+import time
+
+# functions.* 只定義類別與函式，匯入時不讀取資料檔 (合計約 10ms，匯入時間主要是 Flask 本身)；
+# 較重的 NumPy 只在批次票價計算時載入 (見 get_batch_fare_evaluator)
+from functions.batch_requests import MAX_BATCH_REQUESTS, batch_connection_count, pinned_batch_state, run_batch
+from functions.db_pool import ReadOnlyConnectionPool
+from functions.fare_engine import default_engine
+from functions.http_cache import accepts_gzip, conditional_cache, dataset_version
+from functions.journey_planner import DEFAULT_MAX_TRANSFERS, MAX_TRANSFERS, JourneyGraphCache
+from functions.metrics import Metrics
+from functions.request_log import RequestSampler, parse_sample_rates, setup_logging
+from functions.response_cache import MISSING, ResponseCache
+from functions.route_payloads import build_route_payload, lookup_route_payload, serialize_payload
+from functions.route_search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, RouteSearchCache
+from functions.route_snapshot import RouteSnapshotStore
+from functions.rule_registry import clean_name, get_rule_registry, seed_rule_registry
+from functions.segment_index import SegmentIndex, count_segments
+from functions.startup_snapshot import (SNAPSHOT_FILE, StartupState, hot_payloads, load_startup_snapshot,
+                                        read_build_id, route_seed)
+from functions.static_assets import StaticAssetStore, send_asset
+from functions.stop_index import (DEFAULT_NEARBY_LIMIT, DEFAULT_NEARBY_RADIUS, MAX_NEARBY_LIMIT,
+                                  MAX_NEARBY_RADIUS, StopRoutesIndex, find_nearby_stops)
+
+# 結構化 JSON log：由背景執行緒寫出，請求處理不會等待 I/O
+setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger("api")
+access_logger = logging.getLogger("api.access")
+
+# 存取 log 取樣比例，例如 LOG_SAMPLE_RATES="/api/route_stops=0.1,/health=0" (5xx 一律紀錄)
+request_sampler = RequestSampler(
+    parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+    default_rate=float(os.getenv("LOG_SAMPLE_DEFAULT", "1.0")),
+)
+
+# 5xx 回應的錯誤訊息；例外內容只寫入 log，不回傳給用戶端
+INTERNAL_ERROR = "Internal server error"
 
 # 設定前端資料夾路徑
 FRONTEND_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend')
@@ -10,43 +47,135 @@ FRONTEND_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
 app = Flask(__name__, static_folder=FRONTEND_FOLDER)
 CORS(app)  # 允許跨域請求（GitHub Pages 需要）
 
+# 請求內容大小上限 (asgi.py 讀取內容時也使用同一上限)；預設可容納 MAX_BATCH_ITINERARIES 筆的 /api/batch_fare
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(16 * 1024 * 1024)))
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+REQUEST_TOO_LARGE = "Request body too large"
+
 
 # ============================================
 # 靜態檔案服務（模擬 GitHub Pages）
 # ============================================
+# build_assets.py 產生的雜湊檔名與預先壓縮內容 (frontend/dist/)，不存在時直接提供原始檔案
+static_assets = StaticAssetStore(FRONTEND_FOLDER)
+
+
 @app.route('/')
 def serve_index():
     """提供首頁"""
-    return send_from_directory(FRONTEND_FOLDER, 'index.html')
+    return serve_static('index.html')
 
 
 @app.route('/<path:filename>')
 def serve_static(filename):
     """提供其他靜態檔案（HTML, CSS, JS）"""
+    asset = static_assets.lookup(filename)
+    if asset is not None:
+        return send_asset(asset)
     return send_from_directory(FRONTEND_FOLDER, filename)
 
 
 
-# 定義票價與公車段數
-FARE_RATES = {
-    "full_fare": 15,
-    "student_fare": 12,
-    "half_fare": 8
-}
+# 票價、折扣與車種定義集中於 fare_engine
+fare_engine = default_engine
+
+# 啟動進度 (/ready)
+startup_state = StartupState()
+
+# 管線預先產生的啟動快照 (路線清單、規則、熱門路線站牌內容)，由啟動預熱載入；不存在時改由各原始檔載入
+STARTUP_SNAPSHOT_PATH = os.getenv("STARTUP_SNAPSHOT_PATH", os.path.join(app.root_path, 'data', 'processed', SNAPSHOT_FILE))
+
+# 路線快照 (第一次使用或啟動預熱時載入)，檔案更新時自動替換
+ALL_ROUTES_PATH = os.path.join(app.root_path, 'data', 'processed', 'all_routes.json')
+route_store = RouteSnapshotStore(ALL_ROUTES_PATH, load=False)
+
+DB_PATH = os.path.join(app.root_path, 'data', 'bus_data.db')
+db_pool = ReadOnlyConnectionPool(DB_PATH)
+
+
+def get_route_snapshot():
+    """目前的路線快照 (/api/batch 子請求中固定為批次開始時的版本)。"""
+    state = pinned_batch_state.get()
+    if state is not None:
+        return state.snapshot
+    return route_store.get()
+
+
+def current_dataset_version():
+    """目前資料版本 (bus_data.db + all_routes.json)，供 ETag 使用。"""
+    state = pinned_batch_state.get()
+    if state is not None:
+        return state.version
+    return dataset_version(DB_PATH, route_store.get())
+
 
-# 打折扣款費用
-DISCOUNT_RATES = {
-    "full_fare": -8,
-    "student_fare": -6,
-    "half_fare": -4
-}
+# 請求數、延遲、SQL 查詢時間與快取命中率，由 /metrics 輸出
+metrics = Metrics()
 
-BUS_OPTIONS = [
-    "台北市一般公車", "新北市一般公車", "幹線公車", "快速公車",
-    "市民小巴", "內科專車", "跳蛙公車", "新北市新巴士"
-]
 
-CITIES = {"taipei": "台北市", "newtaipei": "新北市"}
+@app.before_request
+def start_request_timer():
+    request.environ['metrics.start'] = time.perf_counter()
+
+
+@app.before_request
+def reject_large_request():
+    # 在端點讀取內容前拒絕，避免端點的例外處理將 413 轉為 500
+    if request.content_length is not None and request.content_length > MAX_REQUEST_BYTES:
+        return jsonify({"error": REQUEST_TOO_LARGE}), 413
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = request.environ.get('metrics.start')
+    if start is not None:
+        # 以路由樣板作為標籤，避免路徑參數造成標籤數量無限增加
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        status = response.status_code
+        duration = time.perf_counter() - start
+        metrics.observe_request(endpoint, request.method, status, duration)
+        if request.if_none_match:
+            metrics.count_cache("http_etag", status == 304)
+
+        if request_sampler.should_log(endpoint, status):
+            access_logger.log(
+                logging.ERROR if status >= 500 else logging.INFO,
+                "request",
+                extra={"fields": {
+                    "method": request.method,
+                    "endpoint": endpoint,
+                    "path": request.full_path.rstrip('?'),
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 3),
+                }}
+            )
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus text format 指標。
+    """
+    response = app.response_class(metrics.render(), mimetype='text/plain')
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    就緒檢查：啟動後的預熱 (快照、快取) 完成前回傳 503。
+    /health 只代表伺服器存活，可在預熱期間立即回應。
+    """
+    if not startup_state.ready:
+        response = jsonify({"status": "starting"})
+        status = 503
+    else:
+        response = jsonify(dict(startup_state.details, status="ready"))
+        status = 200
+    response.headers["Cache-Control"] = "no-store"
+    return response, status
 
 # 新增的健康檢查 API 端點
 @app.route('/health', methods=['GET'])
@@ -54,48 +183,60 @@ def health_check():
     """
     健康檢查 API，檢查伺服器是否在線。
     """
-    return jsonify({"status": "ok"}), 200
+    response = jsonify({"status": "ok"})
+    response.headers["Cache-Control"] = "no-store"
+    return response, 200
 
 # 新增的 API 端點，用來載入所有公車路線資料
 @app.route('/api/routes', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=3600")
 def get_routes():
     """
     載入所有公車路線資料。
     """
     try:
-        file_path = os.path.join(app.root_path, 'data', 'processed', 'all_routes.json')
-        
+        snapshot = get_route_snapshot()
+
         # 檢查檔案是否存在，以避免 FileNotFoundError
-        if not os.path.exists(file_path):
+        if snapshot is None:
             return jsonify({"error": "all_routes.json file not found at the specified path"}), 500
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            all_routes = json.load(f)
-            # print(routes)
+        # 「幹線」路線置前的排序結果已於載入快照時預先計算
+        return jsonify(snapshot.route_list)
+    except Exception:
+        logger.exception("get_routes failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
 
-        routes = []
 
-        for route in all_routes.keys():
-            temp_line_dict = {"RouteName" : route}
-            temp_line_dict["OutputName"] = route
-            if (all_routes[route]["OtherRouteName"] != None):
-                temp_line_dict["OutputName"] = all_routes[route]["OtherRouteName"] + " " + route
-            routes.append(temp_line_dict)
+route_search = RouteSearchCache()
 
-        # 將所有路線分為「幹線」路線和其他路線
-        trunk_routes = [route for route in routes if "幹線" in route["OutputName"]]
-        trunk_routes.sort(key=lambda x: x["OutputName"])
-        other_routes = [route for route in routes if "幹線" not in route["OutputName"]]
-        
-        # 將「幹線」路線列表放在其他路線列表前面，然後返回合併後的列表
-        sorted_routes = trunk_routes + other_routes
-        # print(sorted_routes)
-        return jsonify(sorted_routes)
-    except Exception as e:
-        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+@app.route('/api/routes/search', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=3600")
+def search_routes():
+    """
+    路線自動完成：依前端相同的排序規則回傳前 limit 筆符合的路線。
+    Query Params: q (搜尋字串), limit (預設 20，最多 200)
+    """
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int)
+    if limit is None or limit <= 0:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    limit = min(limit, MAX_SEARCH_LIMIT)
+
+    try:
+        snapshot = get_route_snapshot()
+        if snapshot is None:
+            return jsonify({"error": "all_routes.json file not found at the specified path"}), 500
+
+        return jsonify(route_search.get(snapshot).search(query, limit))
+    except Exception:
+        logger.exception("search_routes failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
 
 
 @app.route('/api/bus_options', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=3600")
 def get_bus_options():
     """
     取得所有不重複的公車種類清單。
@@ -107,8 +248,9 @@ def get_bus_options():
     try:
         cursor = conn.cursor()
         # 排除 null 或空字串
-        cursor.execute("SELECT DISTINCT bus_type FROM routes WHERE bus_type IS NOT NULL AND bus_type != '' ORDER BY bus_type")
-        types = [row[0] for row in cursor.fetchall()]
+        with metrics.query_timer("bus_options"):
+            cursor.execute("SELECT DISTINCT bus_type FROM routes WHERE bus_type IS NOT NULL AND bus_type != '' ORDER BY bus_type")
+            types = [row[0] for row in cursor.fetchall()]
 
         # 指定排序邏輯 (可選)
         # 例如: 一般公車 > 幹線公車 > ...
@@ -126,130 +268,331 @@ def get_bus_options():
         types.sort(key=sort_key)
         
         return jsonify(types)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
+    except Exception:
+        logger.exception("get_bus_options failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
 
 
 def get_db_connection():
-    db_path = os.path.join(app.root_path, 'data', 'bus_data.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    取得目前執行緒共用的唯讀連線 (由 db_pool 管理，呼叫端不需關閉)。
+    /api/batch 子請求使用批次共用的連線。
+    資料庫不存在或無法開啟時回傳 None。
+    """
+    state = pinned_batch_state.get()
+    if state is not None:
+        return state.conn
+    return db_pool.get()
+
+# /api/route_stops 回應快取 (LRU，依筆數與位元組數設上限，資料版本改變時清空)
+route_stops_cache = ResponseCache(
+    max_entries=int(os.getenv("ROUTE_STOPS_CACHE_ENTRIES", "512")),
+    max_bytes=int(os.getenv("ROUTE_STOPS_CACHE_BYTES", str(32 * 1024 * 1024))),
+    ttl=int(os.getenv("ROUTE_STOPS_CACHE_TTL", "3600")),
+)
+metrics.register_cache("route_stops", route_stops_cache.stats)
+
+
+def route_stops_key(route_name):
+    """/api/route_stops 快取的 key：去除空白並統一「臺/台」與全形括號 (clean_name)。"""
+    return clean_name(route_name.strip())
+
+
+def load_route_stops_payload(conn, route_name):
+    """
+    由資料庫取得路線站牌內容，回傳 (payload, payload_gzip) 或 None (查無路線)。
+    """
+    # 優先使用建置資料庫時預先產生的內容 (單次索引查詢，直接回傳位元組)
+    try:
+        with metrics.query_timer("route_payload"):
+            row = lookup_route_payload(conn, route_name)
+    except sqlite3.OperationalError:
+        # 舊版資料庫沒有 route_payloads，改為即時組出內容
+        row = None
+        with metrics.query_timer("route_payload_live"):
+            route = conn.execute(
+                'SELECT route_unique_id, nameZh, city, departureZh, destinationZh FROM routes WHERE nameZh = ? ORDER BY id LIMIT 1',
+                (route_name,)
+            ).fetchone()
+            if route is not None:
+                body = serialize_payload(build_route_payload(conn.cursor(), route, get_rule_registry()))
+                row = (body, None)
+
+    return row
+
 
 @app.route('/api/route_stops', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=600", vary_encoding=True)
 def get_route_stops():
     """
     根據路線名稱查詢所有站牌 (包含去程與返程)
     Query Params: route_name (e.g. "617")
     """
+    route_name = (request.args.get('route_name') or '').strip()
+    if not route_name:
+        return jsonify({"error": "Missing route_name parameter"}), 400
+
+    try:
+        # 熱門路線直接由記憶體快取回傳，不需再查詢資料庫
+        version = current_dataset_version()
+        key = route_stops_key(route_name)
+        row = route_stops_cache.get(key, version)
+        if row is MISSING:
+            conn = get_db_connection()
+            if conn is None:
+                return jsonify({"error": "Database connection failed"}), 500
+
+            row = load_route_stops_payload(conn, route_name)
+            if row is None and key != route_name:
+                row = load_route_stops_payload(conn, key)
+            # 只快取存在的路線，任意的路線名稱不會佔用快取
+            if row is not None:
+                route_stops_cache.put(key, row, len(row[0]) + len(row[1] or b""), version)
+
+        if row is None:
+            return jsonify({"error": f"Route '{route_name}' not found"}), 404
+
+        payload, payload_gzip = row
+        if payload_gzip is not None and accepts_gzip():
+            response = app.response_class(payload_gzip, mimetype='application/json')
+            response.headers["Content-Encoding"] = "gzip"
+            return response
+        return app.response_class(payload, mimetype='application/json')
+        
+    except Exception:
+        logger.exception("get_route_stops failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
+
+# 站對站段數查詢 API
+segment_index = SegmentIndex(query_timer=metrics.query_timer)
+metrics.register_cache("segment_index", segment_index.stats)
+
+# 單次批次查詢的上限
+MAX_SEGMENT_QUERIES = 10000
+
+
+def parse_stop_param(value):
+    """站牌參數：純數字視為 seqNo，其餘視為站名。"""
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    return value
+
+
+@app.route('/api/segments', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=600")
+def get_segments():
+    """
+    查詢某路線兩站之間的段數。
+    Query Params: route_name, board, alight (seqNo 或站名)
+    """
+    route_name = request.args.get('route_name')
+    board = request.args.get('board')
+    alight = request.args.get('alight')
+    if not route_name or not board or not alight:
+        return jsonify({"error": "Missing route_name, board or alight parameter"}), 400
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    try:
+        arrays = segment_index.get(conn, route_name, current_dataset_version())
+        if arrays is None:
+            return jsonify({"error": f"Route '{route_name}' not found"}), 404
+
+        result = count_segments(arrays, parse_stop_param(board), parse_stop_param(alight))
+        if "error" in result:
+            return jsonify(result), 400
+        result["route_name"] = arrays.route_name
+        return jsonify(result)
+    except Exception:
+        logger.exception("get_segments failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
+
+
+@app.route('/api/segments', methods=['POST'])
+def post_segments():
+    """
+    批次查詢段數。
+    Body: {"queries": [{"route_name": "307", "board": 3, "alight": "臺北車站"}, ...]}
+    回傳: {"results": [...]}，順序與 queries 相同，失敗的項目含 error。
+    """
+    data = request.get_json(silent=True)
+    queries = data.get('queries') if isinstance(data, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "Invalid data format"}), 400
+    if len(queries) > MAX_SEGMENT_QUERIES:
+        return jsonify({"error": f"Too many queries (max {MAX_SEGMENT_QUERIES})"}), 400
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    try:
+        version = current_dataset_version()
+        results = []
+        for query in queries:
+            if not isinstance(query, dict) or not query.get('route_name'):
+                results.append({"error": "Invalid data format"})
+                continue
+            route_name = query.get('route_name')
+            arrays = segment_index.get(conn, route_name, version)
+            if arrays is None:
+                results.append({"error": f"Route '{route_name}' not found"})
+                continue
+            results.append(count_segments(arrays, parse_stop_param(query.get('board')), parse_stop_param(query.get('alight'))))
+        return jsonify({"results": results})
+    except Exception:
+        logger.exception("post_segments failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
+
+
+@app.route('/api/segments/matrix', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=3600")
+def get_segment_matrix():
+    """
+    輸出某路線所有上下車站組合的段數矩陣 (離線使用)。
+    data 為 base64 編碼的上三角 uint8 陣列：依序為 (0,1), (0,2) ... (0,n-1), (1,2) ...
+    """
     route_name = request.args.get('route_name')
     if not route_name:
         return jsonify({"error": "Missing route_name parameter"}), 400
 
     conn = get_db_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
     try:
-        cursor = conn.cursor()
-        
-        # 1. 查詢 Route ID
-        # 這裡可能會有多筆 (例如不同城市有相同路線名)，目前先取第一筆，或回傳列表讓前端選
-        # 為簡化，假設路線名能唯一識別，或由前端傳入 City 更好。
-        # 目前先只用 route_name 查。
-        cursor.execute('SELECT route_unique_id, nameZh, city FROM routes WHERE nameZh = ?', (route_name,))
-        routes = cursor.fetchall()
-        
-        if not routes:
+        arrays = segment_index.get(conn, route_name, current_dataset_version())
+        if arrays is None:
             return jsonify({"error": f"Route '{route_name}' not found"}), 404
+        return jsonify(arrays.matrix_payload())
+    except Exception:
+        logger.exception("get_segment_matrix failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
+
+@app.route('/api/nearby_stops', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=600")
+def get_nearby_stops():
+    """
+    查詢附近的實體站牌 (依距離排序)。
+    Query Params: lat, lon, radius (公尺，預設 500，最大 5000), limit (預設 20，最大 200)
+    """
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    radius = request.args.get('radius', DEFAULT_NEARBY_RADIUS, type=float)
+    limit = request.args.get('limit', DEFAULT_NEARBY_LIMIT, type=int)
+
+    if lat is None or lon is None or not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        return jsonify({"error": "Missing or invalid lat/lon parameter"}), 400
+    if radius is None or not (0 < radius <= MAX_NEARBY_RADIUS):
+        return jsonify({"error": f"radius must be between 0 and {MAX_NEARBY_RADIUS} meters"}), 400
+    if limit is None or not (0 < limit <= MAX_NEARBY_LIMIT):
+        return jsonify({"error": f"limit must be between 1 and {MAX_NEARBY_LIMIT}"}), 400
 
-        # 暫時取第一個匹配的路線 (之後可優化支援多個)
-        target_route = routes[0]
-        route_id = target_route['route_unique_id']
-        
-        # 2. 查詢站牌
-        cursor.execute('''
-            SELECT nameZh, goBack, seqNo, segment_boarding, segment_alighting
-            FROM stops 
-            WHERE route_unique_id = ? 
-            ORDER BY goBack, seqNo
-        ''', (route_id,))
-        
-        stops = cursor.fetchall()
-        
-        outbound = []
-        inbound = []
-        
-        for stop in stops:
-            stop_data = {
-                "name": stop['nameZh'], 
-                "seq": stop['seqNo'],
-                "boarding": stop['segment_boarding'],
-                "alighting": stop['segment_alighting']
-            }
-            if stop['goBack'] == 0:
-                outbound.append(stop_data)
-            else:
-                inbound.append(stop_data)
-                
-        # 載入雙端發車列表
-        dual_terminal_list = []
-        static_folder = os.path.join(app.root_path, 'data', 'static')
-        dual_list_path = os.path.join(static_folder, 'dual_terminal_routes.json')
-        if os.path.exists(dual_list_path):
-             with open(dual_list_path, 'r', encoding='utf-8') as f:
-                 dual_terminal_list = json.load(f)
-
-        # 載入官方資料誤植清單
-        corrections_path = os.path.join(static_folder, 'official_data_corrections.json')
-        ignore_same_terminal = []
-        if os.path.exists(corrections_path):
-             with open(corrections_path, 'r', encoding='utf-8') as f:
-                 corrections = json.load(f)
-                 ignore_same_terminal = corrections.get('ignore_same_terminal', [])
-
-        warning_msg = ""
-        # 1. 檢查是否在手動列表中
-        is_manual_dual = False
-        for d in dual_terminal_list["exact_match"]:
-            if d == target_route['nameZh']: # Exact match
-                is_manual_dual = True
-                break
-            
-        for d in dual_terminal_list["fuzzy_match"]:
-            if d in target_route['nameZh']: # Fuzzy match
-                is_manual_dual = True
-                break
-        
-        if is_manual_dual:
-             warning_msg = "⚠️ 注意：此路線去程不接駛返程。"
-        
-        # 2. 啟發式檢查：去程末站 vs 返程首站 名稱相同（排除已確認的官方誤植路線）
-        elif outbound and inbound and target_route['nameZh'] not in ignore_same_terminal:
-             last_out = outbound[-1]['name']
-             first_in = inbound[0]['name']
-             if last_out == first_in:
-                  warning_msg = f"⚠️ 提醒：此路線末端為折返站 [{last_out}]，請確認是否需重新購票或下車。"
-
-        # 使用官方表定起訖點 (routes 資料表已存)
-        cursor.execute('SELECT departureZh, destinationZh FROM routes WHERE route_unique_id = ?', (route_id,))
-        route_info = cursor.fetchone()
-        outbound_dest = route_info['destinationZh'] if route_info else ""
-        inbound_dest = route_info['departureZh'] if route_info else ""
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    try:
+        with metrics.query_timer("nearby_stops"):
+            stops = find_nearby_stops(conn, lat, lon, radius, limit)
+        return jsonify({"stops": stops})
+    except sqlite3.OperationalError:
+        logger.exception("get_nearby_stops failed")
+        return jsonify({"error": "Stop index not available"}), 503
+    except Exception:
+        logger.exception("get_nearby_stops failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
+
+# 站牌停靠路線 API
+stop_routes_index = StopRoutesIndex(query_timer=metrics.query_timer)
+
+
+@app.route('/api/stop_routes', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=600")
+def get_stop_routes():
+    """
+    查詢停靠某站牌的所有路線 (含方向、seqNo 與上下車段次)。
+    Query Params: stop_id (實體站牌 id，見 /api/nearby_stops) 或 name (站名，回傳所有同名站牌)
+    """
+    stop_id = request.args.get('stop_id', type=int)
+    name = request.args.get('name')
+    if stop_id is None and not name:
+        return jsonify({"error": "Missing stop_id or name parameter"}), 400
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    try:
+        version = current_dataset_version()
+        if stop_id is not None:
+            stop = stop_routes_index.by_id(conn, stop_id, version)
+            stops = [stop] if stop is not None else []
+        else:
+            stops = stop_routes_index.by_name(conn, name, version)
+        if not stops:
+            return jsonify({"error": f"Stop '{stop_id if stop_id is not None else name}' not found"}), 404
+        return jsonify({"stops": stops})
+    except sqlite3.OperationalError:
+        logger.exception("get_stop_routes failed")
+        return jsonify({"error": "Stop index not available"}), 503
+    except Exception:
+        logger.exception("get_stop_routes failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
+
+# 轉乘規劃 API
+journey_graphs = JourneyGraphCache(query_timer=metrics.query_timer)
+
+
+@app.route('/api/journey', methods=['GET'])
+@conditional_cache(current_dataset_version, "public, max-age=600")
+def get_journey():
+    """
+    規劃起訖站牌之間總票價最低 (同票價時轉乘最少) 的搭乘方式。
+    Query Params: from, to (實體站牌 id 或站名), fare_type (預設 full_fare), max_transfers (預設 2，最多 3)
+    """
+    origin = request.args.get('from')
+    destination = request.args.get('to')
+    fare_type = request.args.get('fare_type', 'full_fare')
+    max_transfers = request.args.get('max_transfers', DEFAULT_MAX_TRANSFERS, type=int)
+    if not origin or not destination:
+        return jsonify({"error": "Missing from or to parameter"}), 400
+    if max_transfers is None or not (0 <= max_transfers <= MAX_TRANSFERS):
+        return jsonify({"error": f"max_transfers must be between 0 and {MAX_TRANSFERS}"}), 400
+
+    fare_type_id = fare_engine.encode_fare_type(fare_type)
+    if fare_type_id is None:
+        return jsonify({"error": "Invalid fare type"}), 400
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection failed"}), 500
 
+    try:
+        graph = journey_graphs.get(conn, current_dataset_version())
+        origins = graph.resolve(parse_stop_param(origin))
+        if not origins:
+            return jsonify({"error": f"Stop '{origin}' not found"}), 404
+        destinations = graph.resolve(parse_stop_param(destination))
+        if not destinations:
+            return jsonify({"error": f"Stop '{destination}' not found"}), 404
+
+        legs = graph.plan(origins, destinations, fare_type_id, max_transfers)
+        if legs is None:
+            return jsonify({"error": "No journey found"}), 404
         return jsonify({
-            "route_name": target_route['nameZh'],
-            "city": target_route['city'],
-            "outbound": outbound,
-            "inbound": inbound,
-            "outbound_dest": outbound_dest,
-            "inbound_dest": inbound_dest,
-            "warning": warning_msg
+            "total_fare": sum(leg["fare"] for leg in legs),
+            "transfers": max(len(legs) - 1, 0),
+            "legs": legs
         })
-        
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
+    except sqlite3.OperationalError:
+        logger.exception("get_journey failed")
+        return jsonify({"error": "Journey graph not available"}), 503
+    except Exception:
+        logger.exception("get_journey failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
 
 # 車種輸入版票價計算 API
 @app.route('/type_calculate_fare', methods=['POST'])
@@ -266,39 +609,27 @@ def type_calculate_fare():
             return jsonify({"error": "Invalid data format"}), 400
 
         # 檢查票種是否存在
-        if fare_type not in FARE_RATES:
+        fare_type_id = fare_engine.encode_fare_type(fare_type)
+        if fare_type_id is None:
             return jsonify({"error": "Invalid fare type"}), 400
 
-        # 獲取單段票價
-        rate_per_trip = FARE_RATES[fare_type]
-        discount_per_trip = DISCOUNT_RATES[fare_type]
-        total_fare = 0
-
-        # 遍歷每組搭乘數據並計算總價
-        # 紀錄前一段車種
-        previous_bus_type = None
-
+        # 遍歷每組搭乘數據，轉為 (車種 id, 搭乘段數)
+        legs = []
         for trip in bus_trips:
             trip_count = trip.get('trip_count')
-            now_bus_type = trip.get('bus_type')
             if not isinstance(trip_count, int) or trip_count <= 0:
                 return jsonify({"error": "Trip count must be a non-negative integer"}), 400
+            legs.append((fare_engine.encode_bus_type(trip.get('bus_type')), trip_count))
 
-            # 新北市新巴士免費且不須刷卡，不計費也不影響轉乘折扣
-            if now_bus_type == "新北市新巴士":
-                continue
-            
-            # 總費用 = 單段票價 * 搭乘段數
-            total_fare += (rate_per_trip * trip_count)
-            total_fare += (is_get_discount(previous_bus_type, now_bus_type) * discount_per_trip)
-            previous_bus_type = now_bus_type
+        # 新北市新巴士免費且不須刷卡，不計費也不影響轉乘折扣 (由 fare_engine 處理)
+        total_fare = fare_engine.total_fare(fare_type_id, legs)
 
         # 返回 JSON 格式的結果
         return jsonify({"total_fare": total_fare})
 
-    except Exception as e:
-        # 處理任何可能發生的錯誤
-        return jsonify({"error": str(e)}), 500
+    except Exception:
+        logger.exception("type_calculate_fare failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
     
 @app.route('/line_calculate_fare', methods=['POST'])
 def line_calculate_fare():
@@ -310,75 +641,218 @@ def line_calculate_fare():
         bus_trips = data.get('bus_trips')  # 從前端接收路線名稱列表
         fare_type = data.get('fare_type', 'full_fare')
 
-        print(data)
-        print(bus_trips)
-        print(fare_type)
+        logger.debug("line_calculate_fare", extra={"fields": {"fare_type": fare_type, "bus_trips": bus_trips}})
 
-
-        # 載入所有路線資料以查詢車種
-        file_path = os.path.join(app.root_path, 'data', 'processed', 'all_routes.json')
-        with open(file_path, 'r', encoding='utf-8') as f:
-            all_routes = json.load(f)
-
-        total_fare = 0
-        previous_bus_type = None
+        # 使用共用路線快照查詢車種
+        snapshot = get_route_snapshot()
+        if snapshot is None:
+            return jsonify({"error": "all_routes.json file not found at the specified path"}), 500
+        all_routes = snapshot.routes
 
         # 檢查票種是否存在
-        if fare_type not in FARE_RATES:
+        fare_type_id = fare_engine.encode_fare_type(fare_type)
+        if fare_type_id is None:
             return jsonify({"error": "Invalid fare type"}), 400
-            
-        rate_per_trip = FARE_RATES.get(fare_type)
-        discount_per_trip = DISCOUNT_RATES.get(fare_type)
-
 
+        legs = []
         for trip in bus_trips:
             trip_count = trip.get('trip_count')
             line_name = trip.get('line_name')
 
-            route_info = all_routes.get(line_name)
+            now_bus_type = resolve_line_bus_type(all_routes, line_name)
 
-            if not route_info:
+            if not now_bus_type:
                 return jsonify({"error": f"Route '{line_name}' not found"}), 400
 
-            now_bus_type = route_info.get('BusType')
-            if (now_bus_type == "一般公車"):
-                now_bus_type = CITIES.get(route_info.get('City')) + now_bus_type
-
-            if (now_bus_type == "新北市新巴士"):
+            type_id = fare_engine.encode_bus_type(now_bus_type)
+            if fare_engine.is_free(type_id):
                 continue
 
             if not isinstance(trip_count, int) or trip_count <= 0:
                 return jsonify({"error": "Trip count must be a non-negative integer"}), 400
-            
-            # 總費用 = 單段票價 * 搭乘段數
-            total_fare += (rate_per_trip * trip_count)
-            total_fare += (is_get_discount(previous_bus_type, now_bus_type) * discount_per_trip)
-            previous_bus_type = now_bus_type
 
-            
+            legs.append((type_id, trip_count))
+
+        total_fare = fare_engine.total_fare(fare_type_id, legs)
         return jsonify({"total_fare": total_fare})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    except Exception:
+        logger.exception("line_calculate_fare failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
 
 
-def is_get_discount(previous_bus_type: str, now_bus_type: str):
-    if (previous_bus_type == None):
-        return 0
-    
-    # 無打折轉乘方向 (dict) [key = 前一段車種, value = 後一段車種 list]
-    without_discount_dict = {
-        "台北市一般公車": ["台北市一般公車","新北市一般公車"],
-        "新北市一般公車": ["台北市一般公車","新北市一般公車"],
-        "市民小巴": ["新北市一般公車"],
-        "內科專車": ["新北市一般公車"]
+def resolve_line_bus_type(all_routes, line_name):
+    """
+    由路線名稱查詢計費用車種 (一般公車需加上所屬縣市)，查無路線時回傳 None。
+    """
+    route_info = all_routes.get(line_name)
+    if not route_info:
+        return None
+    return fare_engine.route_bus_type(route_info)
+
+
+# 批次票價計算使用 NumPy，延後到第一次使用 (或啟動預熱) 時才載入，縮短冷啟動時間
+batch_fare_evaluator = None
+_batch_fare_lock = threading.Lock()
+
+
+def get_batch_fare_evaluator():
+    global batch_fare_evaluator
+    if batch_fare_evaluator is None:
+        with _batch_fare_lock:
+            if batch_fare_evaluator is None:
+                from functions.batch_fare import BatchFareEvaluator
+                batch_fare_evaluator = BatchFareEvaluator(fare_engine)
+    return batch_fare_evaluator
+
+
+# 批次票價計算 API
+@app.route('/api/batch_fare', methods=['POST'])
+def batch_fare():
+    """
+    一次計算多筆行程的總票價。
+    Body: {
+        "fare_type": "full_fare",            (預設票種，各行程可另外指定 fare_type)
+        "itineraries": [
+            {"bus_trips": [{"bus_type": "幹線公車", "trip_count": 1}, ...]},
+            {"bus_trips": [{"line_name": "307", "trip_count": 2}, ...], "fare_type": "half_fare"}
+        ]
     }
+    回傳: {"results": [{"total_fare": 37}, {"error": "..."}]}，順序與 itineraries 相同。
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid data format"}), 400
+
+        itineraries = data.get('itineraries')
+        fare_type = data.get('fare_type', 'full_fare')
+
+        if not isinstance(itineraries, list) or not itineraries:
+            return jsonify({"error": "Invalid data format"}), 400
+        from functions.batch_fare import MAX_BATCH_ITINERARIES
+        if len(itineraries) > MAX_BATCH_ITINERARIES:
+            return jsonify({"error": f"Too many itineraries (max {MAX_BATCH_ITINERARIES})"}), 400
+
+        snapshot = get_route_snapshot()
+        all_routes = snapshot.routes if snapshot is not None else {}
+
+        results = get_batch_fare_evaluator().calculate(
+            itineraries,
+            fare_type,
+            lambda line_name: resolve_line_bus_type(all_routes, line_name)
+        )
+        return jsonify({"results": results})
+    except Exception:
+        logger.exception("batch_fare failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
+
+
+# 多工批次 API
+@app.route('/api/batch', methods=['POST'])
+def batch_requests():
+    """
+    在一次 HTTP 往返中執行多個子請求 (共用同一版資料庫與資料快照，子請求各自使用一條連線同時執行)。
+    Body: {
+        "requests": [
+            {"id": "stops", "method": "GET", "path": "/api/route_stops", "params": {"route_name": "307"}},
+            {"id": "fare", "method": "POST", "path": "/line_calculate_fare", "body": {...}}
+        ]
+    }
+    回傳: {"results": [{"id": "stops", "status": 200, "body": {...}}, ...]}，順序與 requests 相同。
+    """
+    data = request.get_json(silent=True)
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Invalid data format"}), 400
+    if len(items) > MAX_BATCH_REQUESTS:
+        return jsonify({"error": f"Too many requests (max {MAX_BATCH_REQUESTS})"}), 400
+
+    snapshot = route_store.get()
+    version = dataset_version(DB_PATH, snapshot)
+    # 每個同時執行的子請求各自一條唯讀連線 (SQLite 會將同一連線上的呼叫序列化)，全部開在同一個資料庫檔案上
+    conns = db_pool.open_pinned(batch_connection_count(items))
+    try:
+        results = run_batch(app, items, conns, snapshot, version)
+        return jsonify({"results": results})
+    except Exception:
+        logger.exception("batch_requests failed")
+        return jsonify({"error": INTERNAL_ERROR}), 500
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def seed_hot_route_stops(snapshot):
+    """
+    將啟動快照中的熱門路線站牌內容放入 /api/route_stops 快取
+    (僅在資料庫的建置識別碼與快照相同時)。回傳放入的筆數。
+    """
+    conn = db_pool.get()
+    if conn is None:
+        return 0
+    try:
+        build_id = snapshot["payloads"]["build_id"]
+        if build_id is None or read_build_id(conn) != build_id:
+            return 0
+        version = current_dataset_version()
+        count = 0
+        for name, payload, payload_gzip in hot_payloads(snapshot):
+            route_stops_cache.put(route_stops_key(name), (payload, payload_gzip), len(payload) + len(payload_gzip or b""), version)
+            count += 1
+        return count
+    finally:
+        # 預熱執行緒結束後不再使用此連線
+        db_pool.close()
+
+
+def warm_up():
+    """
+    伺服器啟動後於背景執行的預熱 (見 start_warm_up)：由啟動快照載入路線清單、規則與熱門路線內容
+    (沒有快照時讀取原始檔)。預熱期間 /health 與其他端點可立即回應；預熱完成後 /ready 才回傳 200。
+    """
+    details = {}
+    try:
+        snapshot = load_startup_snapshot(STARTUP_SNAPSHOT_PATH)
+        details["snapshot"] = snapshot is not None
+        if snapshot is not None:
+            route_store.seed(*route_seed(snapshot))
+            rules = snapshot["rules"]
+            details["rules_seeded"] = seed_rule_registry(rules["data"], rules["digests"])
+            details["hot_payloads"] = seed_hot_route_stops(snapshot)
+        details["routes_loaded"] = route_store.get() is not None
+    except Exception as e:
+        logger.exception("warm_up failed")
+        details["warm_up_error"] = type(e).__name__
+    finally:
+        startup_state.mark_ready(**details)
+
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+def start_warm_up():
+    """
+    在背景執行緒啟動預熱 (只啟動一次)。由伺服器進入點呼叫：gunicorn.conf.py (worker 啟動後)、
+    asgi.py (lifespan startup) 與下方的本地執行；匯入 app 時不會啟動。
+    """
+    global _warm_up_started
+    if _warm_up_started:
+        return
+    with _warm_up_lock:
+        if not _warm_up_started:
+            threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+            _warm_up_started = True
+
+
+@app.before_request
+def ensure_warm_up():
+    # 其他未呼叫 start_warm_up 的伺服器 (或測試用 client) 於第一個請求時啟動預熱，/ready 才會轉為 200
+    if not _warm_up_started:
+        start_warm_up()
 
-    if (without_discount_dict.get(previous_bus_type) != None):
-        for i in without_discount_dict.get(previous_bus_type):
-            if (i == now_bus_type):
-                return 0
-    return 1
 
 if __name__ == '__main__':
     # 在本地運行，方便測試
+    start_warm_up()
     app.run(debug=True)
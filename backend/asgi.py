@@ -0,0 +1,172 @@
+"""
+非同步 (ASGI) 服務模式。
+
+與 app.py 提供相同的端點，但由單一 event loop 接收所有連線，
+同步的 Flask 端點 (SQLite 查詢、讀檔) 交給有上限的執行緒池處理，
+少量執行緒即可同時服務大量用戶端。
+
+啟動方式:
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+    (或) gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+
+環境變數:
+    ASGI_THREADS      執行緒池大小 (預設 8)
+    ASGI_MAX_PENDING  同時等待執行緒的請求上限，超過時回傳 503 (預設 ASGI_THREADS * 16)
+    MAX_REQUEST_BYTES 請求內容大小上限，超過時回傳 413 (與 app.py 共用，預設 16 MiB)
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import MAX_REQUEST_BYTES, REQUEST_TOO_LARGE, app as flask_app, start_warm_up
+
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "8"))
+ASGI_MAX_PENDING = int(os.getenv("ASGI_MAX_PENDING", str(ASGI_THREADS * 16)))
+
+
+def build_environ(scope, body):
+    """將 ASGI HTTP scope 轉為 WSGI environ (PEP 3333)。"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(len(body)),
+    }
+
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+    return environ
+
+
+def call_wsgi(environ):
+    """在執行緒中執行 Flask，回傳 (status_code, headers, body)。"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: None
+
+    result = flask_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], body
+
+
+class ASGIApplication:
+    def __init__(self, threads=ASGI_THREADS, max_pending=ASGI_MAX_PENDING):
+        self.threads = threads
+        self.max_pending = max_pending
+        self.executor = None
+        self.pending = None
+
+    def _ensure_started(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="asgi-worker")
+            self.pending = asyncio.Semaphore(self.max_pending)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._ensure_started()
+                start_warm_up()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.executor is not None:
+                    self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        self._ensure_started()
+
+        # 健康檢查不需要資料庫，直接在 event loop 回應
+        if scope["path"] == "/health" and scope["method"] == "GET":
+            await self._send(send, 200, [
+                (b"content-type", b"application/json"),
+                (b"cache-control", b"no-store"),
+                (b"access-control-allow-origin", b"*"),
+            ], b'{"status":"ok"}\n')
+            return
+
+        # 與 Flask 相同的內容大小上限 (MAX_REQUEST_BYTES)：Content-Length 超過時不讀取，
+        # 未提供 Content-Length (chunked) 時讀取超過上限即停止
+        too_large = [(b"content-type", b"application/json")], json.dumps({"error": REQUEST_TOO_LARGE}).encode()
+        for name, value in scope.get("headers", []):
+            if name.lower() == b"content-length" and value.isdigit() and int(value) > MAX_REQUEST_BYTES:
+                await self._send(send, 413, *too_large)
+                return
+
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_REQUEST_BYTES:
+                await self._send(send, 413, *too_large)
+                return
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        if self.pending.locked():
+            await self._send(send, 503, [(b"content-type", b"application/json")],
+                             json.dumps({"error": "Server busy"}).encode())
+            return
+
+        async with self.pending:
+            loop = asyncio.get_running_loop()
+            status, headers, content = await loop.run_in_executor(
+                self.executor, call_wsgi, build_environ(scope, body)
+            )
+
+        await self._send(send, status, headers, content)
+
+    @staticmethod
+    async def _send(send, status, headers, content):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
+
+
+application = ASGIApplication()
@@ -0,0 +1,212 @@
+"""
+資料管線產出檔 (各城市原始資料、merged_*.json、all_routes.json) 的讀寫。
+
+各階段一律以邏輯路徑 (例如 merged/merged_bus_routes.json) 指定檔案，實際寫入的格式可選：
+- json:      精簡 JSON (不縮排)
+- ndjson:    每行一筆紀錄 (見 iter_ndjson_lines)，git 可逐行比對差異
+- json.gz / ndjson.gz: 上述格式再以 gzip 壓縮
+實際檔名為邏輯路徑去掉 .json 後加上格式的副檔名；讀取時自動尋找存在的版本，
+因此任何階段都能讀取任一格式的輸入。寫入新格式時會刪除其他格式的舊檔。
+
+預設格式由環境變數 PIPELINE_DATA_FORMAT 決定 (未設定時為 json)，各階段也可用 --format 指定。
+"""
+import gzip
+import io
+import json
+import os
+
+FORMATS = ("json", "json.gz", "ndjson", "ndjson.gz")
+DEFAULT_FORMAT = os.getenv("PIPELINE_DATA_FORMAT", "json")
+if DEFAULT_FORMAT not in FORMATS:
+    raise ValueError(f"PIPELINE_DATA_FORMAT must be one of {', '.join(FORMATS)}")
+
+# 以 mtime=0 壓縮，內容相同時檔案也完全相同 (內容雜湊比對與 git 不會誤判為變更)
+GZIP_LEVEL = 6
+
+
+def _stem(path):
+    for fmt in sorted(FORMATS, key=len, reverse=True):
+        if path.endswith('.' + fmt):
+            return path[:-len(fmt) - 1]
+    return path
+
+
+def artifact_path(path, fmt):
+    """邏輯路徑在指定格式下的實際檔名。"""
+    return f"{_stem(path)}.{fmt}"
+
+
+def artifact_format(path):
+    """由實際檔名判斷格式 (未知副檔名視為 json)。"""
+    for fmt in sorted(FORMATS, key=len, reverse=True):
+        if path.endswith('.' + fmt):
+            return fmt
+    return "json"
+
+
+def find_artifact(path):
+    """
+    回傳邏輯路徑目前存在的實際檔案；有多個格式時取最新的一個，皆不存在時回傳 None。
+    """
+    newest = None
+    newest_mtime = None
+    for fmt in FORMATS:
+        candidate = artifact_path(path, fmt)
+        try:
+            mtime = os.stat(candidate).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if newest is None or mtime > newest_mtime:
+            newest, newest_mtime = candidate, mtime
+    return newest
+
+
+def artifact_exists(path):
+    return find_artifact(path) is not None
+
+
+# ---------------------------------------------------------------------------
+# NDJSON
+#
+# 每行為 [路徑, 值]：路徑為由根節點開始的 key (dict) 或 index (list) 陣列，值放到該位置。
+# 第一行的路徑為 [] (根節點本身)。同類型物件組成的 list (例如 BusInfo、RouteFare) 視為紀錄清單，
+# 其中每筆紀錄獨立一行；其餘 dict / list 先寫出空容器，再依序寫出各子節點。
+# ---------------------------------------------------------------------------
+
+def _is_records(value):
+    return isinstance(value, list) and len(value) > 0 and all(isinstance(item, (dict, list)) for item in value)
+
+
+def _has_records(value):
+    if _is_records(value):
+        return True
+    if isinstance(value, dict):
+        children = value.values()
+    elif isinstance(value, list):
+        children = value
+    else:
+        return False
+    return any(_has_records(child) for child in children)
+
+
+def ndjson_line(path, value):
+    """NDJSON 的一行 (不含換行)：將 value 放到 path 的位置。"""
+    return json.dumps([list(path), value], ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_ndjson_lines(value, path=()):
+    """逐行產生 value 的 NDJSON 表示 (不含換行)。"""
+    if not isinstance(value, (dict, list)) or (path and not _has_records(value)):
+        yield ndjson_line(path, value)
+        return
+
+    yield ndjson_line(path, {} if isinstance(value, dict) else [])
+    children = value.items() if isinstance(value, dict) else enumerate(value)
+    if _is_records(value):
+        for index, item in children:
+            yield ndjson_line(path + (index,), item)
+    else:
+        for key, child in children:
+            yield from iter_ndjson_lines(child, path + (key,))
+
+
+def load_ndjson(lines):
+    """由 NDJSON 的各行還原資料 (iter_ndjson_lines 的反向操作)。"""
+    # 所有行合併為一個陣列一次解析，比逐行呼叫 json.loads 快
+    entries = json.loads('[' + ','.join(line for line in lines if line.strip()) + ']')
+    root = None
+    for path, value in entries:
+        if not path:
+            root = value
+            continue
+        parent = root
+        for key in path[:-1]:
+            parent = parent[key]
+        if isinstance(parent, list):
+            parent.append(value)
+        else:
+            parent[path[-1]] = value
+    return root
+
+
+# ---------------------------------------------------------------------------
+# 讀寫
+# ---------------------------------------------------------------------------
+
+def open_text(path, mode='r', compressed=None):
+    """以 UTF-8 文字模式開啟實際檔案，.gz (或 compressed=True) 自動解壓縮 / 壓縮。"""
+    if compressed is None:
+        compressed = path.endswith('.gz')
+    if compressed:
+        if 'w' in mode:
+            raw = open(path, 'wb')
+            stream = gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0)
+            # 關閉文字串流時一併關閉底層檔案
+            stream.myfileobj = raw
+        else:
+            stream = gzip.open(path, 'rb')
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def loads_artifact(raw, path):
+    """解析實際檔案 path 的原始內容 (bytes)。"""
+    fmt = artifact_format(path)
+    if fmt.endswith('.gz'):
+        raw = gzip.decompress(raw)
+    text = raw.decode('utf-8')
+    if fmt.startswith('ndjson'):
+        return load_ndjson(text.splitlines())
+    return json.loads(text)
+
+
+def load_artifact(path):
+    """讀取邏輯路徑的資料 (任一格式)；皆不存在時拋出 FileNotFoundError。"""
+    actual = find_artifact(path)
+    if actual is None:
+        raise FileNotFoundError(f"No such artifact: {path}")
+    with open_text(actual) as f:
+        if artifact_format(actual).startswith('ndjson'):
+            return load_ndjson(f.read().splitlines())
+        return json.load(f)
+
+
+def write_value(value, out, fmt):
+    """將 value 以 fmt (不含 .gz) 的格式寫入文字串流 out。"""
+    if fmt.startswith('ndjson'):
+        for line in iter_ndjson_lines(value):
+            out.write(line)
+            out.write('\n')
+    else:
+        json.dump(value, out, ensure_ascii=False, separators=(',', ':'))
+
+
+def remove_other_formats(path, keep):
+    """刪除邏輯路徑除 keep 以外的其他格式檔案。"""
+    for fmt in FORMATS:
+        other = artifact_path(path, fmt)
+        if other != keep and os.path.exists(other):
+            os.remove(other)
+
+
+def dump_artifact(value, path, fmt=None):
+    """
+    以指定格式寫入邏輯路徑 (先寫暫存檔再替換)，並刪除其他格式的舊檔。
+    回傳實際寫入的檔名。
+    """
+    fmt = fmt or DEFAULT_FORMAT
+    actual = artifact_path(path, fmt)
+    tmp_path = actual + '.tmp'
+    with open_text(tmp_path, 'w', compressed=fmt.endswith('.gz')) as out:
+        write_value(value, out, fmt)
+    os.replace(tmp_path, actual)
+    remove_other_formats(path, actual)
+    return actual
+
+
+def convert_artifact(path, fmt):
+    """將邏輯路徑現有的檔案轉為 fmt 格式；已是該格式時不做任何事。回傳實際檔名或 None。"""
+    actual = find_artifact(path)
+    if actual is None or actual == artifact_path(path, fmt):
+        return actual
+    return dump_artifact(load_artifact(path), path, fmt)
@@ -0,0 +1,149 @@
+import numpy as np
+
+# 單次請求可計算的行程上限
+MAX_BATCH_ITINERARIES = 50000
+
+# 每段搭乘段數的上限：超過時該行程回報錯誤 (避免超出 int64，且 bincount 以 float64 加總仍可精確表示)
+MAX_TRIP_COUNT = 1000
+
+
+def trip_count_error(trip_count):
+    """搭乘段數不合法時回傳錯誤訊息，否則回傳 None。"""
+    if not isinstance(trip_count, int) or trip_count <= 0:
+        return "Trip count must be a non-negative integer"
+    if trip_count > MAX_TRIP_COUNT:
+        return f"Trip count must not exceed {MAX_TRIP_COUNT}"
+    return None
+
+
+class BatchFareEvaluator:
+    """
+    批次票價計算：將多筆行程攤平成「段」陣列，以 NumPy 一次計算。
+    - 車種 / 票種編碼與轉乘折扣矩陣沿用 fare_engine.FareEngine
+    - 每段票價 = 單段票價 * 搭乘段數 + 轉乘折扣旗標 * 折扣金額
+    - 以 bincount 依行程加總
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.rates = np.array(engine.rates, dtype=np.int64)
+        self.discounts = np.array(engine.discounts, dtype=np.int64)
+        self.discount_matrix = np.array(engine.transfer_matrix, dtype=np.int64)
+
+    def encode(self, itineraries, default_fare_type, resolve_bus_type=None):
+        """
+        將行程轉成段陣列。
+        itineraries: [{"bus_trips": [...], "fare_type": (可省略)}, ...]
+        resolve_bus_type: 以路線名稱查詢車種的函式 (line_name 模式)，查無路線時回傳 None
+        回傳 (legs, errors)，errors 為 {行程索引: 錯誤訊息}
+        """
+        engine = self.engine
+        itin_idx = []
+        type_ids = []
+        trip_counts = []
+        fare_ids = []
+        errors = {}
+
+        for idx, itinerary in enumerate(itineraries):
+            if not isinstance(itinerary, dict):
+                errors[idx] = "Invalid data format"
+                continue
+
+            fare_type = itinerary.get('fare_type', default_fare_type)
+            bus_trips = itinerary.get('bus_trips')
+            if not fare_type or not bus_trips or not isinstance(bus_trips, list):
+                errors[idx] = "Invalid data format"
+                continue
+            fare_id = engine.encode_fare_type(fare_type)
+            if fare_id is None:
+                errors[idx] = "Invalid fare type"
+                continue
+
+            legs = []
+            for trip in bus_trips:
+                if not isinstance(trip, dict):
+                    errors[idx] = "Invalid data format"
+                    break
+                trip_count = trip.get('trip_count')
+
+                if 'line_name' in trip:
+                    if resolve_bus_type is None:
+                        errors[idx] = "Invalid data format"
+                        break
+                    line_name = trip.get('line_name')
+                    now_bus_type = resolve_bus_type(line_name)
+                    if now_bus_type is None:
+                        errors[idx] = f"Route '{line_name}' not found"
+                        break
+                    type_id = engine.encode_bus_type(now_bus_type)
+                    # 與 /line_calculate_fare 相同：免費公車先略過再檢查段數
+                    if engine.is_free(type_id):
+                        continue
+                    error = trip_count_error(trip_count)
+                    if error is not None:
+                        errors[idx] = error
+                        break
+                else:
+                    type_id = engine.encode_bus_type(trip.get('bus_type'))
+                    # 與 /type_calculate_fare 相同：先檢查段數再略過免費公車
+                    error = trip_count_error(trip_count)
+                    if error is not None:
+                        errors[idx] = error
+                        break
+                    if engine.is_free(type_id):
+                        continue
+
+                legs.append((type_id, trip_count))
+
+            if idx in errors:
+                continue
+
+            for type_id, trip_count in legs:
+                itin_idx.append(idx)
+                type_ids.append(type_id)
+                trip_counts.append(trip_count)
+                fare_ids.append(fare_id)
+
+        legs = (
+            np.array(itin_idx, dtype=np.int64),
+            np.array(type_ids, dtype=np.int64),
+            np.array(trip_counts, dtype=np.int64),
+            np.array(fare_ids, dtype=np.int64),
+        )
+        return legs, errors
+
+    def evaluate(self, legs, n_itineraries):
+        """
+        legs: encode() 產生的 (行程索引, 車種 id, 搭乘段數, 票種 id) 陣列，需依行程與搭乘順序排列
+        回傳每個行程的總票價 (int64 陣列)
+        """
+        itin_idx, type_ids, trip_counts, fare_ids = legs
+        if len(itin_idx) == 0:
+            return np.zeros(n_itineraries, dtype=np.int64)
+
+        # 每個行程的第一段沒有前一段車種，不適用轉乘折扣
+        first_leg = np.ones(len(itin_idx), dtype=bool)
+        first_leg[1:] = itin_idx[1:] != itin_idx[:-1]
+        prev_type_ids = np.empty_like(type_ids)
+        prev_type_ids[0] = 0
+        prev_type_ids[1:] = type_ids[:-1]
+
+        discount_flags = self.discount_matrix[prev_type_ids, type_ids]
+        discount_flags[first_leg] = 0
+
+        leg_fares = self.rates[fare_ids] * trip_counts + discount_flags * self.discounts[fare_ids]
+        totals = np.bincount(itin_idx, weights=leg_fares, minlength=n_itineraries)
+        return np.rint(totals).astype(np.int64)
+
+    def calculate(self, itineraries, default_fare_type, resolve_bus_type=None):
+        """回傳與輸入順序相同的結果列表：{"total_fare": n} 或 {"error": msg}。"""
+        legs, errors = self.encode(itineraries, default_fare_type, resolve_bus_type)
+        totals = self.evaluate(legs, len(itineraries))
+
+        results = []
+        for idx, total in enumerate(totals.tolist()):
+            if idx in errors:
+                results.append({"error": errors[idx]})
+            else:
+                results.append({"total_fare": total})
+        return results
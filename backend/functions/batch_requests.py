@@ -0,0 +1,141 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.test import EnvironBuilder
+
+logger = logging.getLogger("api")
+
+# 單次 /api/batch 可包含的子請求上限
+MAX_BATCH_REQUESTS = 20
+
+# 同時執行子請求的執行緒數 (每個執行中的子請求各自使用一條資料庫連線)
+BATCH_THREADS = int(os.getenv("BATCH_THREADS", "4"))
+
+# 可在批次中呼叫的端點 (不含 /api/batch 本身、/metrics 與靜態檔案)
+BATCH_ALLOWED_PATHS = ("/health", "/type_calculate_fare", "/line_calculate_fare")
+BATCH_ALLOWED_PREFIX = "/api/"
+BATCH_DENIED_PATHS = ("/api/batch",)
+
+# 子請求執行期間固定使用的資料狀態 (批次的連線、路線快照、資料版本)；一般請求為 None
+pinned_batch_state = contextvars.ContextVar("pinned_batch_state", default=None)
+
+_executor = None
+
+
+class PinnedState:
+    """
+    子請求使用的資料狀態。同一批次的 snapshot、version 相同，conn 則是該子請求獨占的連線；
+    批次的所有連線開在同一個資料庫檔案上 (見 ReadOnlyConnectionPool.open_pinned)，看到同一版內容。
+    """
+    __slots__ = ("conn", "snapshot", "version")
+
+    def __init__(self, conn, snapshot, version):
+        self.conn = conn
+        self.snapshot = snapshot
+        self.version = version
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BATCH_THREADS, thread_name_prefix="batch-request")
+    return _executor
+
+
+def validate_sub_request(item):
+    """檢查子請求格式，回傳 (method, path, params, body) 或錯誤訊息字串。"""
+    if not isinstance(item, dict):
+        return "Invalid data format"
+
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    params = item.get('params') or {}
+    body = item.get('body')
+
+    if method not in ("GET", "POST"):
+        return f"Method '{method}' not allowed"
+    if not isinstance(path, str) or not isinstance(params, dict):
+        return "Invalid data format"
+    if path in BATCH_DENIED_PATHS or not (path in BATCH_ALLOWED_PATHS or path.startswith(BATCH_ALLOWED_PREFIX)):
+        return f"Path '{path}' not allowed in batch"
+    return method, path, params, body
+
+
+def _dispatch(app, method, path, params, body):
+    builder = EnvironBuilder(
+        method=method,
+        path=path,
+        query_string=params,
+        json=body if method == "POST" else None,
+        # 子請求的結果會內嵌在 JSON 中，不使用壓縮
+        headers={"Accept-Encoding": "identity"},
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    with app.request_context(environ):
+        response = app.full_dispatch_request()
+
+    data = response.get_data()
+    if response.mimetype == "application/json":
+        payload = json.loads(data) if data else None
+    else:
+        payload = data.decode("utf-8", errors="replace")
+    return response.status_code, payload
+
+
+def _run_one(app, connections, snapshot, version, index, item):
+    parsed = validate_sub_request(item)
+    result = {"id": item.get('id', index) if isinstance(item, dict) else index}
+    if isinstance(parsed, str):
+        result.update(status=400, body={"error": parsed})
+        return result
+
+    # SQLite 連線同一時間只由一個執行緒使用：取出一條閒置的連線，完成後歸還
+    conn = connections.get() if connections is not None else None
+    token = pinned_batch_state.set(PinnedState(conn, snapshot, version))
+    try:
+        status, payload = _dispatch(app, *parsed)
+    except Exception:
+        logger.exception("batch sub-request failed")
+        status, payload = 500, {"error": "Internal server error"}
+    finally:
+        pinned_batch_state.reset(token)
+        if conn is not None:
+            connections.put(conn)
+
+    result.update(status=status, body=payload)
+    return result
+
+
+def run_batch(app, items, conns, snapshot, version):
+    """
+    同時執行多個子請求 (皆為唯讀，彼此獨立)，回傳與 items 順序相同的 [{"id", "status", "body"}, ...]。
+    conns: 開在同一個資料庫檔案上的連線 (資料庫不存在時為空 list)；同時執行的子請求數不超過連線數。
+    """
+    connections = None
+    if conns:
+        connections = queue.SimpleQueue()
+        for conn in conns:
+            connections.put(conn)
+
+    if len(items) == 1 or len(conns) == 1:
+        return [_run_one(app, connections, snapshot, version, index, item) for index, item in enumerate(items)]
+
+    executor = _get_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, _run_one, app, connections, snapshot, version, index, item)
+        for index, item in enumerate(items)
+    ]
+    return [future.result() for future in futures]
+
+
+def batch_connection_count(items):
+    """批次需要開啟的連線數：同時執行的子請求數。"""
+    return max(1, min(len(items), BATCH_THREADS))
@@ -0,0 +1,165 @@
+"""
+前端靜態檔案建置：為 JS / CSS 加上內容雜湊檔名，改寫 HTML 與 ES module import 的參照，
+並預先產生 gzip 與 brotli 壓縮檔。輸出至 frontend/dist/，由 API 伺服器直接提供預先壓縮的內容。
+原始 frontend/ 不會被修改 (GitHub Pages 仍使用原始檔案)。
+
+    python ./backend/functions/build_assets.py
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:  # 未安裝 Brotli 時只產生 gzip
+    brotli = None
+
+MANIFEST_FORMAT = 1
+MANIFEST_FILE = 'manifest.json'
+DIST_DIR = 'dist'
+
+# 加上雜湊檔名的資源 (其餘如 HTML 維持原檔名，作為入口頁面)
+HASHED_EXTENSIONS = ('.js', '.css')
+ASSET_EXTENSIONS = HASHED_EXTENSIONS + ('.html',)
+
+# 預先壓縮檔的副檔名
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# ES module 的相對 import: import ... from './x.js' / import './x.js'
+IMPORT_PATTERN = re.compile(r'''((?:\bfrom|\bimport)\s*['"]\./)([\w.-]+)(['"])''')
+# HTML 中的 <script src> 與 <link href>
+HTML_REF_PATTERN = re.compile(r'''(\b(?:src|href)=["'](?:\./)?)([\w.-]+)(["'])''')
+
+HASH_LENGTH = 10
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name, digest):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+def _rewrite(pattern, text, names):
+    def replace(match):
+        target = names.get(match.group(2))
+        if target is None:
+            return match.group(0)
+        return match.group(1) + target + match.group(3)
+    return pattern.sub(replace, text)
+
+
+def _module_order(sources):
+    """依 import 關係排序 JS 模組 (被依賴者在前)，被 import 的檔名需先確定雜湊才能改寫參照。"""
+    deps = {
+        name: [dep for dep in (m.group(2) for m in IMPORT_PATTERN.finditer(text)) if dep in sources and dep != name]
+        for name, text in sources.items()
+    }
+    order = []
+    state = {}
+
+    def visit(name):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Circular import involving {name}")
+        state[name] = "visiting"
+        for dep in deps[name]:
+            visit(dep)
+        state[name] = "done"
+        order.append(name)
+
+    for name in sorted(sources):
+        visit(name)
+    return order
+
+
+def compress_variants(data):
+    """回傳 {編碼: 壓縮後內容}，只保留比原始內容小的版本。"""
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def build_assets(frontend_dir):
+    """
+    建置 frontend_dir/dist/ 並回傳 manifest。
+    manifest["files"][提供的檔名] = {"source", "etag", "immutable", "encodings"}
+    manifest["assets"][原始檔名] = 提供的檔名
+    """
+    dist_dir = os.path.join(frontend_dir, DIST_DIR)
+    names = sorted(
+        name for name in os.listdir(frontend_dir)
+        if name.endswith(ASSET_EXTENSIONS) and os.path.isfile(os.path.join(frontend_dir, name))
+    )
+    texts = {}
+    for name in names:
+        with open(os.path.join(frontend_dir, name), 'r', encoding='utf-8') as f:
+            texts[name] = f.read()
+
+    outputs = {}
+    assets = {}
+
+    # 1. CSS 與其他沒有參照的資源
+    for name in names:
+        if name.endswith('.css'):
+            data = texts[name].encode('utf-8')
+            assets[name] = hashed_name(name, content_hash(data))
+            outputs[assets[name]] = (name, data, True)
+
+    # 2. JS 模組：依賴者的內容包含被依賴者的雜湊檔名，因此由葉節點開始
+    modules = {name: text for name, text in texts.items() if name.endswith('.js')}
+    for name in _module_order(modules):
+        data = _rewrite(IMPORT_PATTERN, modules[name], assets).encode('utf-8')
+        assets[name] = hashed_name(name, content_hash(data))
+        outputs[assets[name]] = (name, data, True)
+
+    # 3. HTML 入口頁面維持原檔名，只改寫參照
+    for name in names:
+        if name.endswith('.html'):
+            data = _rewrite(HTML_REF_PATTERN, texts[name], assets).encode('utf-8')
+            assets[name] = name
+            outputs[name] = (name, data, False)
+
+    # 先寫入暫存目錄再替換，伺服器不會讀到建置一半的內容
+    tmp_dir = dist_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    files = {}
+    for served_name, (source, data, immutable) in sorted(outputs.items()):
+        variants = compress_variants(data)
+        with open(os.path.join(tmp_dir, served_name), 'wb') as f:
+            f.write(data)
+        for encoding, body in variants.items():
+            with open(os.path.join(tmp_dir, served_name + ENCODING_SUFFIXES[encoding]), 'wb') as f:
+                f.write(body)
+        files[served_name] = {
+            "source": source,
+            "etag": content_hash(data),
+            "immutable": immutable,
+            "encodings": sorted(variants),
+        }
+
+    manifest = {"format": MANIFEST_FORMAT, "assets": assets, "files": files}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.replace(tmp_dir, dist_dir)
+
+    hashed = sum(1 for entry in files.values() if entry["immutable"])
+    print(f"已建置前端資源: {dist_dir} (雜湊檔名 {hashed} 個，入口頁面 {len(files) - hashed} 個，"
+          f"brotli {'啟用' if brotli is not None else '未安裝'})")
+    return manifest
+
+
+if __name__ == "__main__":
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    build_assets(os.path.join(os.path.dirname(backend_dir), 'frontend'))
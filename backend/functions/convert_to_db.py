@@ -3,13 +3,27 @@ import json
 import os
 import argparse
 import sys
+import time
+import uuid
 
 # Ensure we can import from the same directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
 
 import parse_buffer_zones
+from functions import artifacts
+from functions import fare_engine
+from functions import fare_list
+from functions import journey_planner
+from functions import route_payloads
+from functions import rule_registry
+from functions import stop_index
+from functions.pipeline_state import run_stage
+from functions.rule_registry import get_rule_registry
 
 def create_tables(conn):
     cursor = conn.cursor()
@@ -73,13 +87,12 @@ def create_tables(conn):
 
 def import_routes(conn, base_dir):
     json_path = os.path.join(base_dir, 'data', 'merged', 'merged_bus_routes.json')
-    if not os.path.exists(json_path):
+    if not artifacts.artifact_exists(json_path):
         print(f"檔案不存在: {json_path}")
         return
 
     print("正在匯入路線資料...")
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = artifacts.load_artifact(json_path)
 
     cursor = conn.cursor()
     count = 0
@@ -151,13 +164,12 @@ def import_routes(conn, base_dir):
 
 def import_stops(conn, base_dir):
     json_path = os.path.join(base_dir, 'data', 'merged', 'merged_stops.json')
-    if not os.path.exists(json_path):
+    if not artifacts.artifact_exists(json_path):
         print(f"檔案不存在: {json_path}")
         return
 
     print("正在匯入站牌資料 (這可能需要一點時間)...")
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = artifacts.load_artifact(json_path)
 
     cursor = conn.cursor()
     count = 0
@@ -209,112 +221,37 @@ def import_stops(conn, base_dir):
 
     print(f"已匯入 {count} 筆站牌資料。")
 
+ROUTE_FARES_INSERT = f'''
+INSERT INTO route_fares ({", ".join(fare_list.FARE_ROW_FIELDS)})
+VALUES ({", ".join("?" * len(fare_list.FARE_ROW_FIELDS))})
+'''
+
 def import_route_fares(conn, base_dir):
-    json_path = os.path.join(base_dir, 'data', 'merged', 'merged_bus_route_fare_list.json')
-    if not os.path.exists(json_path):
+    """匯入 update_data.py 以 fare_list.py 轉出、merge_data.py 合併的票價資料列 (不需再逐層解析)。"""
+    json_path = os.path.join(base_dir, 'data', 'merged', 'merged_bus_route_fare_rows.json')
+    if not artifacts.artifact_exists(json_path):
         print(f"檔案不存在: {json_path}")
         return
 
     print("正在匯入票價結構資料...")
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = artifacts.load_artifact(json_path)
 
     cursor = conn.cursor()
     
     count = 0
-    for city, fares in data.items():
-        if not fares:
+    for city, document in data.items():
+        if not document:
             continue
-        
-        actual_fares_list = []
-        if isinstance(fares, list):
-            for item in fares:
-                if isinstance(item, dict) and "RouteFare" in item:
-                    actual_fares_list = item["RouteFare"]
-                    break
-        
-        if not actual_fares_list:
-            print(f"[{city}] Warning: No RouteFare list found in data.")
+        if document.get("fields") != list(fare_list.FARE_ROW_FIELDS):
+            print(f"[{city}] Warning: Unexpected fare row fields {document.get('fields')}, skipped.")
             continue
-            
-        print(f"[{city}] Found {len(actual_fares_list)} routes in RouteFare list.")
-            
-        batch_data = []
-        skip_counts = {"no_section": 0, "no_buffer_container": 0, "empty_buffer": 0, "success": 0, "error": 0}
-        
-        for fare in actual_fares_list:
-            try:
-                r_id = fare.get("RouteID")
-                pricing_type = fare.get("FarePricingType")
-                
-                if pricing_type != "SectionFare":
-                    skip_counts["no_section"] += 1
-                    continue
-                    
-                section_fare = fare.get("SectionFare", {})
-                if not section_fare: 
-                    skip_counts["no_section"] += 1
-                    continue
-                    
-                buffer_zones_container = section_fare.get("BufferZones", {})
-                if isinstance(buffer_zones_container, str) or not buffer_zones_container:
-                    skip_counts["no_buffer_container"] += 1
-                    continue
-                    
-                buffer_zones = buffer_zones_container.get("BufferZone")
-                if not buffer_zones:
-                    skip_counts["empty_buffer"] += 1
-                    continue
-                    
-                if not isinstance(buffer_zones, list):
-                    buffer_zones = [buffer_zones]
-                    
-                for zone in buffer_zones:
-                    try:
-                        if not isinstance(zone, dict):
-                            continue
-                            
-                        direction = zone.get("Direction")
-                        seq = zone.get("SectionSequence")
-                        origin_block = zone.get("FareBufferZoneOrigin", {})
-                        origin_id = origin_block.get("OriginStopID")
-                        dest_block = zone.get("FareBufferZoneDestination", {})
-                        dest_id = dest_block.get("DestinationStopID")
-                        desc = "Buffer Zone" # Simplified
-                        
-                        batch_data.append((r_id, direction, seq, origin_id, dest_id, desc, city))
-                        skip_counts["success"] += 1
-                        
-                    except Exception as e_zone:
-                        print(f"Error parsing zone for Route {r_id}: {e_zone}")
-                        continue
-                        
-            except Exception as e:
-                skip_counts["error"] += 1
-                print(f"Error parsing fare: {e}")
-                continue
 
-            if len(batch_data) >= 5000:
-                cursor.executemany('''
-                INSERT INTO route_fares (route_unique_id, direction, section_sequence, origin_stop_id, destination_stop_id, description, city)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', batch_data)
-                conn.commit()
-                count += len(batch_data)
-                batch_data = []
-
-        if batch_data:
-            cursor.executemany('''
-            INSERT INTO route_fares (route_unique_id, direction, section_sequence, origin_stop_id, destination_stop_id, description, city)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', batch_data)
-            conn.commit()
-            count += len(batch_data)
-        
-        print(f"[{city}] Status: {skip_counts}")
-
-    print(f"已匯入 {count} 筆票價結構資料。")
+        rows = document.get("rows") or []
+        cursor.executemany(ROUTE_FARES_INSERT, rows)
+        count += len(rows)
+        print(f"[{city}] {len(rows)} rows, skipped: {document.get('skipped')}")
 
+    conn.commit()
     print(f"已匯入 {count} 筆票價結構資料。")
 
 
@@ -358,27 +295,112 @@ def process_segments(conn):
         conn.commit()
         print("段次計算完成。")
     except Exception as e:
+        # 段次不完整的資料庫不可發布，交由 build_database 捨棄建置檔
         print(f"段次計算發生錯誤: {e}")
-        import traceback
-        traceback.print_exc()
+        raise
+
+def write_build_info(conn):
+    """
+    紀錄此次建置的識別碼，啟動快照以此確認預先載入的內容屬於同一版資料庫。
+    """
+    cursor = conn.cursor()
+    cursor.execute('DROP TABLE IF EXISTS build_info')
+    cursor.execute('CREATE TABLE build_info (key TEXT PRIMARY KEY, value TEXT)')
+    cursor.executemany('INSERT INTO build_info (key, value) VALUES (?, ?)', [
+        ("build_id", uuid.uuid4().hex),
+        ("built_at", time.strftime('%Y-%m-%dT%H:%M:%S%z')),
+    ])
+    conn.commit()
+
+
+def build_path_for(db_path):
+    """建置中的資料庫檔名 (與正式檔案同一目錄，確保可以原子替換)。"""
+    return f"{db_path}.build-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+
+
+def remove_stale_builds(db_path):
+    """清除先前中斷的建置留下的暫存檔。"""
+    prefix = os.path.basename(db_path) + ".build-"
+    data_dir = os.path.dirname(db_path)
+    for name in os.listdir(data_dir):
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(data_dir, name))
+                print(f"已刪除未完成的建置檔: {name}")
+            except OSError:
+                pass
+
+
+def publish_database(build_path, db_path, retries=5, delay=1.0):
+    """
+    將建置完成的資料庫以 os.replace 原子替換為正式檔案。
+    API 已開啟的連線仍指向舊檔案，查詢不受影響；之後的請求會由連線池偵測到新檔案並改用新版本，
+    任何時刻都不會讀到建置到一半的資料庫。
+    (Windows 上若舊檔案仍被開啟，替換可能暫時失敗，會重試數次)
+    成功時回傳 True；重試後仍失敗時回傳 False，腳本以結束碼 1 結束，工作流程不會提交舊的資料庫。
+    """
+    # 替換前先確保內容已寫入磁碟
+    with open(build_path, 'rb') as f:
+        os.fsync(f.fileno())
+
+    for attempt in range(retries):
+        try:
+            os.replace(build_path, db_path)
+            return True
+        except PermissionError:
+            if attempt == retries - 1:
+                break
+            time.sleep(delay)
+
+    print(f"無法替換資料庫 (正被使用中)，新版本保留於: {build_path}", file=sys.stderr)
+    return False
+
+
+def build_inputs(base_dir):
+    """
+    建置資料庫所讀取的檔案：合併資料、靜態規則，以及建置邏輯本身的程式碼。
+    任一內容改變時才需要重新建置。
+    """
+    data_dir = os.path.join(base_dir, 'data')
+    static_dir = os.path.join(data_dir, 'static')
+    inputs = [
+        os.path.join(data_dir, 'merged', 'merged_bus_routes.json'),
+        os.path.join(data_dir, 'merged', 'merged_stops.json'),
+        os.path.join(data_dir, 'merged', 'merged_bus_route_fare_rows.json'),
+        os.path.join(static_dir, 'bus_type_map.json'),
+    ]
+    inputs += [os.path.join(static_dir, name) for name in rule_registry.RULE_FILES]
+    modules = (parse_buffer_zones, route_payloads, stop_index, journey_planner, rule_registry, fare_engine,
+               fare_list, artifacts)
+    inputs += [os.path.abspath(__file__)] + [os.path.abspath(module.__file__) for module in modules]
+    return inputs
+
 
 def main():
+    """建置 (或略過) 資料庫，成功時回傳 True；資料庫無法發布時回傳 False。"""
+    parser = argparse.ArgumentParser(description="Build data/bus_data.db from the merged data.")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the inputs are unchanged.")
+    args = parser.parse_args()
+
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     db_path = os.path.join(base_dir, 'data', 'bus_data.db')
-    
-    print(f"建立資料庫: {db_path}")
-    
-    # 若存在則先刪除，確保資料乾淨
-    if os.path.exists(db_path):
-        try:
-            os.remove(db_path)
-            print("已刪除舊資料庫")
-        except PermissionError:
-            print("無法刪除舊資料庫，可能正被使用中。")
-            return
+    return run_stage('convert_to_db', build_inputs(base_dir), [db_path], lambda: build_database(base_dir, db_path),
+                     args.force)
+
+
+def build_database(base_dir, db_path):
+    """建置資料庫並原子替換正式檔案，成功時回傳 True；建置過程的錯誤會捨棄建置檔後往上拋出。"""
+
+    # 先寫入暫存的版本檔，完成後再原子替換，API 不需要停機也不會遇到鎖定
+    remove_stale_builds(db_path)
+    build_path = build_path_for(db_path)
+    print(f"建立資料庫: {db_path} (建置檔: {os.path.basename(build_path)})")
+
+    conn = sqlite3.connect(build_path)
+    # 建置檔在完成前不會被讀取，失敗時直接捨棄，因此不需要 journal 與同步寫入
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
 
-    conn = sqlite3.connect(db_path)
-    
     try:
         create_tables(conn)
         import_routes(conn, base_dir)
@@ -391,13 +413,29 @@ def main():
         # 呼叫段次處理邏輯
         process_segments(conn)
         
-        print("轉檔完成！")
-    except Exception as e:
+        # 預先產生 /api/route_stops 的回傳內容
+        route_payloads.build_route_payloads(conn, get_rule_registry())
+
+        # 實體站牌、空間索引 (/api/nearby_stops) 與停靠路線索引 (/api/stop_routes)
+        stop_ids = stop_index.build_stop_index(conn)
+        stop_index.build_stop_routes(conn, stop_ids)
+
+        # 轉乘路網 (/api/journey)
+        journey_planner.build_journey_graph(conn, stop_ids)
+
+        write_build_info(conn)
+    except BaseException as e:
+        # 保留現有的正式資料庫，捨棄建置到一半的檔案；錯誤往上拋出，不會執行發布
         print(f"轉檔失敗: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
         conn.close()
+        os.remove(build_path)
+        raise
+    conn.close()
+
+    if publish_database(build_path, db_path):
+        print("轉檔完成！")
+        return True
+    return False
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,106 @@
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ReadOnlyConnectionPool:
+    """
+    每個執行緒各自持有一條唯讀 SQLite 連線並重複使用。
+    - 以 URI mode=ro 開啟並設定 query_only，API 端不可能寫入資料庫
+    - 調大 mmap_size / cache_size，避免每次請求重新暖機 page cache
+    - 連線層級的 statement cache 讓相同 SQL 只需編譯一次
+    每次取用時比對資料庫檔案的 inode/mtime/大小，管線替換檔案後會自動改開新檔。
+    """
+
+    def __init__(self, db_path, mmap_size=256 * 1024 * 1024, cache_size_kib=64 * 1024, cached_statements=256):
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+
+    @staticmethod
+    def _file_identity(st):
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _connect(self, check_same_thread=True):
+        uri = pathlib.Path(os.path.abspath(self.db_path)).as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, cached_statements=self.cached_statements,
+                               check_same_thread=check_same_thread)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def get(self):
+        """
+        取得目前執行緒的連線；資料庫不存在時回傳 None。
+        呼叫端不需要 (也不應該) 關閉回傳的連線。
+        """
+        try:
+            identity = self._file_identity(os.stat(self.db_path))
+        except FileNotFoundError:
+            self.close()
+            return None
+
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.identity == identity:
+            return conn
+
+        # 檔案已被替換 (或尚未連線)：關閉舊連線，改開新檔
+        self.close()
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            logger.warning("無法開啟資料庫 %s: %s", self.db_path, e)
+            return None
+
+        self._local.conn = conn
+        self._local.identity = identity
+        return conn
+
+    def open_pinned(self, count, attempts=3):
+        """
+        開啟 count 條不屬於連線池的唯讀連線 (供 /api/batch 使用)，保證全部開在同一個資料庫檔案上：
+        管線只會以 os.replace 替換整個檔案、不會就地修改，因此同一檔案的內容不會改變。
+        開啟前後檔案被替換時重新開啟。連線可交給其他執行緒使用 (同一時間只能由一個執行緒使用)，
+        呼叫端負責關閉；資料庫不存在或無法開啟時回傳空 list。
+        """
+        for _ in range(attempts):
+            try:
+                before = self._file_identity(os.stat(self.db_path))
+            except FileNotFoundError:
+                return []
+            conns = []
+            try:
+                for _ in range(count):
+                    conns.append(self._connect(check_same_thread=False))
+                after = self._file_identity(os.stat(self.db_path))
+            except (sqlite3.Error, FileNotFoundError) as e:
+                logger.warning("無法開啟資料庫 %s: %s", self.db_path, e)
+                after = None
+            if after == before:
+                return conns
+            for conn in conns:
+                conn.close()
+            if after is None:
+                return []
+        logger.warning("資料庫 %s 持續被替換，無法開啟批次連線", self.db_path)
+        return []
+
+    def close(self):
+        """關閉目前執行緒持有的連線。"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            self._local.identity = None
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
@@ -0,0 +1,141 @@
+import argparse
+
+# 定義票價與公車段數
+FARE_RATES = {
+    "full_fare": 15,
+    "student_fare": 12,
+    "half_fare": 8
+}
+
+# 打折扣款費用
+DISCOUNT_RATES = {
+    "full_fare": -8,
+    "student_fare": -6,
+    "half_fare": -4
+}
+
+BUS_OPTIONS = [
+    "台北市一般公車", "新北市一般公車", "幹線公車", "快速公車",
+    "市民小巴", "內科專車", "跳蛙公車", "新北市新巴士"
+]
+
+CITIES = {"taipei": "台北市", "newtaipei": "新北市"}
+
+# 新北市新巴士免費且不須刷卡，不計費也不影響轉乘折扣
+FREE_BUS_TYPE = "新北市新巴士"
+
+# 無打折轉乘方向 (dict) [key = 前一段車種, value = 後一段車種 list]
+WITHOUT_DISCOUNT = {
+    "台北市一般公車": ["台北市一般公車", "新北市一般公車"],
+    "新北市一般公車": ["台北市一般公車", "新北市一般公車"],
+    "市民小巴": ["新北市一般公車"],
+    "內科專車": ["新北市一般公車"]
+}
+
+
+class FareEngine:
+    """
+    查表式票價引擎。
+    - 車種編碼為小整數：BUS_OPTIONS 依序為 0..N-1，其他未知車種共用 N
+    - transfer_matrix[前一段][後一段] 為是否適用轉乘折扣 (0/1)
+    - rates / discounts 依票種 id 查詢單段票價與折扣金額
+    每段計算皆為常數時間，可供 API、批次計算與命令列共用。
+    """
+
+    def __init__(self, bus_types=BUS_OPTIONS, fare_rates=FARE_RATES, discount_rates=DISCOUNT_RATES,
+                 without_discount=WITHOUT_DISCOUNT):
+        self.bus_types = tuple(bus_types)
+        self.type_ids = {t: i for i, t in enumerate(self.bus_types)}
+        self.other_type_id = len(self.bus_types)
+        self.free_type_id = self.type_ids.get(FREE_BUS_TYPE)
+
+        self.fare_types = tuple(fare_rates.keys())
+        self.fare_type_ids = {t: i for i, t in enumerate(self.fare_types)}
+        self.rates = tuple(fare_rates[t] for t in self.fare_types)
+        self.discounts = tuple(discount_rates[t] for t in self.fare_types)
+
+        n = len(self.bus_types) + 1
+        matrix = [[1] * n for _ in range(n)]
+        for prev_type, now_types in without_discount.items():
+            prev_id = self.type_ids.get(prev_type)
+            if prev_id is None:
+                continue
+            for now_type in now_types:
+                now_id = self.type_ids.get(now_type)
+                if now_id is not None:
+                    matrix[prev_id][now_id] = 0
+        self.transfer_matrix = tuple(tuple(row) for row in matrix)
+
+    def encode_bus_type(self, bus_type):
+        return self.type_ids.get(bus_type, self.other_type_id)
+
+    def encode_fare_type(self, fare_type):
+        """回傳票種 id，不存在時回傳 None。"""
+        return self.fare_type_ids.get(fare_type)
+
+    def is_free(self, type_id):
+        return type_id == self.free_type_id
+
+    def route_bus_type(self, route_info):
+        """由 all_routes.json 的路線資訊取得計費用車種 (一般公車需加上所屬縣市)。"""
+        bus_type = route_info.get('BusType')
+        if bus_type == "一般公車":
+            bus_type = CITIES.get(route_info.get('City')) + bus_type
+        return bus_type
+
+    def discount_flag(self, prev_type_id, now_type_id):
+        if prev_type_id is None:
+            return 0
+        return self.transfer_matrix[prev_type_id][now_type_id]
+
+    def leg_fare(self, fare_type_id, prev_type_id, now_type_id, trip_count):
+        """單段費用 = 單段票價 * 搭乘段數 + 轉乘折扣。"""
+        return (self.rates[fare_type_id] * trip_count
+                + self.discount_flag(prev_type_id, now_type_id) * self.discounts[fare_type_id])
+
+    def total_fare(self, fare_type_id, legs):
+        """
+        legs: [(車種 id, 搭乘段數), ...]，依搭乘順序排列。
+        免費公車不計費也不影響轉乘折扣。
+        """
+        total = 0
+        prev_type_id = None
+        for type_id, trip_count in legs:
+            if type_id == self.free_type_id:
+                continue
+            total += self.leg_fare(fare_type_id, prev_type_id, type_id, trip_count)
+            prev_type_id = type_id
+        return total
+
+
+default_engine = FareEngine()
+
+
+def is_get_discount(previous_bus_type, now_bus_type):
+    """以車種名稱查詢是否適用轉乘折扣 (前一段為 None 時不適用)。"""
+    if previous_bus_type is None:
+        return 0
+    return default_engine.discount_flag(
+        default_engine.encode_bus_type(previous_bus_type),
+        default_engine.encode_bus_type(now_bus_type)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculate the total bus fare for a trip sequence.")
+    parser.add_argument('fare_type', choices=list(FARE_RATES.keys()), help="Fare type.")
+    parser.add_argument('legs', nargs='+', help="Legs as BUS_TYPE:TRIP_COUNT, e.g. 幹線公車:2")
+    args = parser.parse_args()
+
+    legs = []
+    for leg in args.legs:
+        bus_type, _, trip_count = leg.rpartition(':')
+        if not bus_type or not trip_count.isdigit() or int(trip_count) <= 0:
+            parser.error(f"Invalid leg '{leg}' (expected BUS_TYPE:TRIP_COUNT)")
+        legs.append((default_engine.encode_bus_type(bus_type), int(trip_count)))
+
+    print(default_engine.total_fare(default_engine.encode_fare_type(args.fare_type), legs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+BusRouteFareList (票價資料) 的專用轉換：直接將每個 RouteFare 的 BufferZone 轉為
+route_fares 資料表的一列 (可直接交給 executemany)，不需先轉成通用的巢狀 dict。
+
+- iter_fare_rows: 由原始 XML 逐筆產生 (iterparse，只處理 RouteFare 節點)
+- json_fare_rows / route_fare_rows: 由 JSON 格式的票價資料 (與 xml_to_dict 的結構相同) 產生
+兩者對同一份資料產生相同的結果。update_data.py 下載票價資料時以此轉為 bus_route_fare_rows.json
+(write_fare_rows_document 逐列寫出，內容同 fare_rows_document)，convert_to_db.py 直接以 executemany 匯入。
+"""
+import json
+import xml.etree.ElementTree as ET
+
+from functions.artifacts import ndjson_line
+
+# route_fares 資料表的欄位順序 (不含 id)
+FARE_ROW_FIELDS = ("route_unique_id", "direction", "section_sequence", "origin_stop_id",
+                   "destination_stop_id", "description", "city")
+
+BUFFER_ZONE_DESCRIPTION = "Buffer Zone"  # Simplified
+
+# 略過原因 (與 convert_to_db 的統計項目相同)
+SKIP_NO_SECTION = "no_section"
+SKIP_NO_BUFFER_CONTAINER = "no_buffer_container"
+SKIP_EMPTY_BUFFER = "empty_buffer"
+SKIP_ERROR = "error"
+
+
+def _int(value):
+    """數字字串轉為 int；空值或非數字維持原值 (與 SQLite INTEGER 欄位的轉換相同)。"""
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.lstrip('-').isdigit():
+            return int(stripped)
+    return value
+
+
+def _row(route_id, direction, seq, origin_id, dest_id, city):
+    return (_int(route_id), _int(direction), _int(seq), _int(origin_id), _int(dest_id),
+            BUFFER_ZONE_DESCRIPTION, city)
+
+
+def route_fare_rows(fare, city):
+    """
+    由 JSON 結構的一筆 RouteFare 產生 route_fares 的資料列。
+    回傳 (rows, 略過原因)；有資料時略過原因為 None。
+    """
+    if fare.get("FarePricingType") != "SectionFare":
+        return [], SKIP_NO_SECTION
+    section_fare = fare.get("SectionFare")
+    if not section_fare or not isinstance(section_fare, dict):
+        return [], SKIP_NO_SECTION
+
+    # 沒有緩衝區的路線，xml_to_dict 會將空的 <BufferZones/> 轉為空字串
+    buffer_zones = section_fare.get("BufferZones")
+    if not buffer_zones or not isinstance(buffer_zones, dict):
+        return [], SKIP_NO_BUFFER_CONTAINER
+
+    # 只有一個 BufferZone 時 xml_to_dict 不會轉為 list
+    zones = buffer_zones.get("BufferZone")
+    if not zones:
+        return [], SKIP_EMPTY_BUFFER
+    if not isinstance(zones, list):
+        zones = [zones]
+
+    route_id = fare.get("RouteID")
+    rows = []
+    for zone in zones:
+        if not isinstance(zone, dict):
+            continue
+        origin = zone.get("FareBufferZoneOrigin") or {}
+        dest = zone.get("FareBufferZoneDestination") or {}
+        rows.append(_row(route_id, zone.get("Direction"), zone.get("SectionSequence"),
+                         origin.get("OriginStopID") if isinstance(origin, dict) else None,
+                         dest.get("DestinationStopID") if isinstance(dest, dict) else None, city))
+    return rows, None
+
+
+def _text(elem, path):
+    """findtext 的結果去除空白；節點不存在時回傳 None (與 dict.get 相同)。"""
+    text = elem.findtext(path)
+    return text.strip() if text is not None else None
+
+
+def xml_route_fare_rows(fare, city):
+    """由 XML 的一個 <RouteFare> 節點產生 route_fares 的資料列，回傳 (rows, 略過原因)。"""
+    if _text(fare, '{*}FarePricingType') != "SectionFare":
+        return [], SKIP_NO_SECTION
+    section_fare = fare.find('{*}SectionFare')
+    if section_fare is None or len(section_fare) == 0:
+        return [], SKIP_NO_SECTION
+
+    buffer_zones = section_fare.find('{*}BufferZones')
+    if buffer_zones is None or len(buffer_zones) == 0:
+        return [], SKIP_NO_BUFFER_CONTAINER
+
+    zones = buffer_zones.findall('{*}BufferZone')
+    if not zones:
+        return [], SKIP_EMPTY_BUFFER
+
+    route_id = _text(fare, '{*}RouteID')
+    rows = []
+    for zone in zones:
+        if len(zone) == 0:
+            continue
+        rows.append(_row(route_id,
+                         _text(zone, '{*}Direction'),
+                         _text(zone, '{*}SectionSequence'),
+                         _text(zone, '{*}FareBufferZoneOrigin/{*}OriginStopID'),
+                         _text(zone, '{*}FareBufferZoneDestination/{*}DestinationStopID'),
+                         city))
+    return rows, None
+
+
+def iter_fare_rows(source, city, skip_counts=None):
+    """
+    以 iterparse 逐筆讀取 BusRouteFareList XML (檔案路徑或串流)，產生 route_fares 的資料列。
+    每個 <RouteFare> 轉換後立即清除，記憶體用量不隨資料大小增加。
+    skip_counts: 可選的 dict，累計各略過原因的筆數。
+    """
+    for _, elem in ET.iterparse(source, events=("end",)):
+        if elem.tag.rpartition('}')[2] != "RouteFare":
+            continue
+        rows, reason = xml_route_fare_rows(elem, city)
+        elem.clear()
+        if reason is not None and skip_counts is not None:
+            skip_counts[reason] = skip_counts.get(reason, 0) + 1
+        yield from rows
+
+
+def json_fare_rows(data, city, skip_counts=None):
+    """
+    由整份 JSON 格式的票價資料 ([UpdateTime, UpdateInterval, AuthorityCode, {"RouteFare": [...]}])
+    產生 route_fares 的資料列。skip_counts 同 iter_fare_rows。
+    """
+    fares = []
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict) and "RouteFare" in item:
+                fares = item["RouteFare"]
+                break
+    if isinstance(fares, dict):
+        fares = [fares]
+
+    for fare in fares:
+        if isinstance(fare, dict):
+            rows, reason = route_fare_rows(fare, city)
+        else:
+            rows, reason = [], SKIP_ERROR
+        if reason is not None and skip_counts is not None:
+            skip_counts[reason] = skip_counts.get(reason, 0) + 1
+        yield from rows
+
+
+def fare_rows_document(rows, skip_counts):
+    """bus_route_fare_rows.json 的內容：欄位名稱、資料列與各略過原因的筆數。"""
+    return {"fields": list(FARE_ROW_FIELDS), "rows": [list(row) for row in rows], "skipped": dict(skip_counts)}
+
+
+def write_fare_rows_document(rows, skip_counts, out, ndjson=False):
+    """
+    以串流方式寫出 fare_rows_document 的內容 (rows 可為產生器，逐列寫出)。
+    skip_counts 於 rows 讀完後才寫出，因此可與 rows 共用同一個正在累計的 dict。
+    ndjson=True 時的各行與 artifacts.iter_ndjson_lines 相同。回傳資料列數。
+    """
+    count = 0
+    if ndjson:
+        out.write(ndjson_line((), {}) + '\n')
+        out.write(ndjson_line(("fields",), list(FARE_ROW_FIELDS)) + '\n')
+        out.write(ndjson_line(("rows",), []) + '\n')
+        for count, row in enumerate(rows, 1):
+            out.write(ndjson_line(("rows", count - 1), list(row)) + '\n')
+        out.write(ndjson_line(("skipped",), dict(skip_counts)) + '\n')
+        return count
+
+    out.write('{"fields":' + json.dumps(list(FARE_ROW_FIELDS), separators=(',', ':')) + ',"rows":[')
+    for count, row in enumerate(rows, 1):
+        if count > 1:
+            out.write(',')
+        out.write(json.dumps(list(row), ensure_ascii=False, separators=(',', ':')))
+    out.write('],"skipped":' + json.dumps(dict(skip_counts), ensure_ascii=False, separators=(',', ':')) + '}')
+    return count
@@ -0,0 +1,69 @@
+import functools
+import hashlib
+import os
+
+from flask import make_response, request
+
+
+def dataset_version(db_path, snapshot):
+    """
+    由 bus_data.db 的建置資訊 (mtime/大小) 與 all_routes.json 快照雜湊組成資料版本。
+    只使用 os.stat，不會開啟 SQLite 或解析 JSON。
+    """
+    try:
+        st = os.stat(db_path)
+        db_part = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    except FileNotFoundError:
+        db_part = "nodb"
+
+    routes_part = snapshot.digest if snapshot is not None else "noroutes"
+    return hashlib.sha1(f"{db_part}:{routes_part}".encode()).hexdigest()[:16]
+
+
+def make_etag(version, *parts):
+    """以資料版本與請求內容 (路徑、查詢參數) 產生 strong ETag (不含引號)。"""
+    h = hashlib.sha1(version.encode())
+    for part in parts:
+        h.update(b"\0")
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+    return h.hexdigest()[:20]
+
+
+def accepts_gzip():
+    """用戶端是否接受 gzip 編碼的回應。"""
+    return request.accept_encodings["gzip"] > 0
+
+
+def conditional_cache(version_func, cache_control, vary_encoding=False):
+    """
+    GET 端點的條件式快取裝飾器。
+    If-None-Match 命中時直接回傳 304，不執行端點本身；
+    200 回應則附上 ETag 與指定的 Cache-Control。
+    vary_encoding: 端點會依 Accept-Encoding 回傳不同編碼時設為 True，
+    ETag 會區分編碼並加上 Vary: Accept-Encoding。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            parts = [request.path, request.query_string]
+            if vary_encoding:
+                parts.append("gzip" if accepts_gzip() else "identity")
+            etag = make_etag(version_func(), *parts)
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response("", 304)
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = cache_control
+                if vary_encoding:
+                    response.vary.add("Accept-Encoding")
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if vary_encoding:
+                response.vary.add("Accept-Encoding")
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = cache_control
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,301 @@
+import heapq
+import threading
+from array import array
+
+from functions.fare_engine import default_engine
+from functions.rule_registry import clean_name
+from functions.stop_index import physical_stop_key
+
+# 預設與最大轉乘次數
+DEFAULT_MAX_TRANSFERS = 2
+MAX_TRANSFERS = 3
+
+
+def create_journey_tables(cursor):
+    cursor.execute('DROP TABLE IF EXISTS journey_patterns')
+    cursor.execute('''
+    CREATE TABLE journey_patterns (
+        id INTEGER PRIMARY KEY,
+        route_id INTEGER, -- 對應 routes.id
+        nameZh TEXT,
+        city TEXT,
+        bus_type TEXT, -- 計費用車種 (一般公車已加上所屬縣市)
+        goBack INTEGER
+    )
+    ''')
+
+    cursor.execute('DROP TABLE IF EXISTS journey_pattern_stops')
+    cursor.execute('''
+    CREATE TABLE journey_pattern_stops (
+        pattern_id INTEGER,
+        pos INTEGER, -- 此方向內的順序 (0 起算)
+        physical_stop_id INTEGER, -- 對應 physical_stops.id，同一實體站牌即可轉乘
+        seqNo INTEGER,
+        nameZh TEXT,
+        segment_boarding INTEGER,
+        segment_alighting INTEGER,
+        PRIMARY KEY (pattern_id, pos)
+    ) WITHOUT ROWID
+    ''')
+
+
+def build_journey_graph(conn, stop_ids, engine=default_engine):
+    """
+    於建置資料庫時整理轉乘圖：每條路線的每個方向為一個 pattern，依序列出經過的實體站牌與上下車段次。
+    stop_ids: stop_index.build_stop_index 回傳的 {physical_stop_key: physical_stop_id}
+    需在段次計算 (process_segments) 與站牌空間索引完成後呼叫。
+    """
+    print("正在建立轉乘路網 (journey_patterns)...")
+    cursor = conn.cursor()
+    create_journey_tables(cursor)
+
+    # 同一路線 (route_unique_id) 重複出現時只取 id 最小者
+    cursor.execute('''
+        SELECT MIN(id), route_unique_id, nameZh, city, bus_type
+        FROM routes
+        GROUP BY route_unique_id
+        ORDER BY MIN(id)
+    ''')
+    routes = cursor.fetchall()
+
+    patterns = []
+    pattern_stops = []
+    for route_id, route_unique_id, name, city, bus_type in routes:
+        fare_bus_type = engine.route_bus_type({"BusType": bus_type, "City": city})
+        cursor.execute('''
+            SELECT goBack, seqNo, nameZh, longitude, latitude, segment_boarding, segment_alighting
+            FROM stops
+            WHERE route_unique_id = ?
+            ORDER BY goBack, seqNo
+        ''', (route_unique_id,))
+
+        current = None
+        pos = 0
+        for go_back, seq, stop_name, longitude, latitude, boarding, alighting in cursor.fetchall():
+            try:
+                key = physical_stop_key(stop_name, float(longitude), float(latitude))
+            except (TypeError, ValueError):
+                continue
+            physical_id = stop_ids.get(key)
+            if physical_id is None:
+                continue
+
+            if current != go_back:
+                current = go_back
+                pos = 0
+                patterns.append((len(patterns) + 1, route_id, name, city, fare_bus_type, go_back))
+            pattern_stops.append((len(patterns), pos, physical_id, seq, stop_name, boarding or 1, alighting or 1))
+            pos += 1
+
+    cursor.executemany('''
+        INSERT INTO journey_patterns (id, route_id, nameZh, city, bus_type, goBack)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', patterns)
+    cursor.executemany('''
+        INSERT INTO journey_pattern_stops (pattern_id, pos, physical_stop_id, seqNo, nameZh, segment_boarding, segment_alighting)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', pattern_stops)
+    conn.commit()
+    print(f"已建立 {len(patterns)} 個路線方向、{len(pattern_stops)} 個停靠點的轉乘路網。")
+
+
+class Pattern:
+    """單一路線方向的停靠順序 (實體站牌 id、seqNo、站名與上下車段次)。"""
+    __slots__ = ("route_name", "city", "bus_type", "type_id", "direction", "stops", "seqs", "names",
+                 "boarding", "alighting")
+
+    def __init__(self, route_name, city, bus_type, type_id, direction):
+        self.route_name = route_name
+        self.city = city
+        self.bus_type = bus_type
+        self.type_id = type_id
+        self.direction = direction
+        self.stops = array('i')
+        self.seqs = array('i')
+        self.names = []
+        self.boarding = array('i')
+        self.alighting = array('i')
+
+
+class JourneyGraph:
+    """
+    記憶體中的轉乘圖。
+    - patterns: Pattern 清單
+    - stop_patterns[實體站牌 id] = [(pattern 索引, 停靠位置), ...]
+    - stop_names / name_index: 實體站牌站名，以及正規化站名 -> 實體站牌 id 清單
+    - transfer_stops: 可轉乘的實體站牌 (有兩個以上路線方向停靠)
+    """
+
+    def __init__(self, conn, engine=default_engine):
+        self.engine = engine
+        self.patterns = []
+        self.stop_patterns = {}
+        self.stop_names = {}
+        self.name_index = {}
+
+        pattern_index = {}
+        for pattern_id, name, city, bus_type, go_back in conn.execute(
+                'SELECT id, nameZh, city, bus_type, goBack FROM journey_patterns ORDER BY id'):
+            pattern_index[pattern_id] = len(self.patterns)
+            self.patterns.append(Pattern(name, city, bus_type, engine.encode_bus_type(bus_type), go_back))
+
+        for pattern_id, physical_id, seq, stop_name, boarding, alighting in conn.execute('''
+                SELECT pattern_id, physical_stop_id, seqNo, nameZh, segment_boarding, segment_alighting
+                FROM journey_pattern_stops
+                ORDER BY pattern_id, pos'''):
+            idx = pattern_index[pattern_id]
+            pattern = self.patterns[idx]
+            self.stop_patterns.setdefault(physical_id, []).append((idx, len(pattern.stops)))
+            pattern.stops.append(physical_id)
+            pattern.seqs.append(seq)
+            pattern.names.append(stop_name)
+            pattern.boarding.append(boarding)
+            pattern.alighting.append(alighting)
+
+        for physical_id, stop_name in conn.execute('SELECT id, nameZh FROM physical_stops'):
+            if physical_id in self.stop_patterns:
+                self.stop_names[physical_id] = stop_name
+                self.name_index.setdefault(clean_name(stop_name or ""), []).append(physical_id)
+
+        # 有兩個以上路線方向停靠的站牌 (可轉乘)
+        self.transfer_stops = frozenset(stop for stop, served in self.stop_patterns.items() if len(served) > 1)
+
+    def resolve(self, stop):
+        """
+        將站牌參數 (實體站牌 id 或站名) 轉為實體站牌 id 清單。
+        同名站牌 (例如道路兩側) 都視為起訖點；找不到時回傳空清單。
+        """
+        if isinstance(stop, bool):
+            return []
+        if isinstance(stop, int):
+            return [stop] if stop in self.stop_patterns else []
+        if isinstance(stop, str):
+            return list(self.name_index.get(clean_name(stop), []))
+        return []
+
+    def plan(self, origins, destinations, fare_type_id, max_transfers=DEFAULT_MAX_TRANSFERS):
+        """
+        以 (票價, 轉乘次數) 為標籤的 Dijkstra，找出總票價最低 (同票價時轉乘最少) 的行程。
+        狀態為 (實體站牌, 前一段計費車種, 已搭乘段數)：轉乘折扣只取決於前一段車種，
+        因此票價在同一狀態下可以直接比較。免費公車不計費也不改變前一段車種 (與 FareEngine 相同)。
+        找不到行程時回傳 None。
+        """
+        engine = self.engine
+        rate = engine.rates[fare_type_id]
+        discount = engine.discounts[fare_type_id]
+        matrix = engine.transfer_matrix
+        free_type_id = engine.free_type_id
+        patterns = self.patterns
+        stop_patterns = self.stop_patterns
+        transfer_stops = self.transfer_stops
+        targets = set(destinations)
+        max_legs = max_transfers + 1
+
+        # 前一段車種以 -1 表示尚未搭乘 (或只搭過免費公車)
+        # labels[i] = (前一個 label 索引, pattern 索引, 上車位置, 下車位置, 此段票價)
+        labels = []
+        heap = []
+        best = {}
+        settled = set()
+        for stop in origins:
+            if stop in targets:
+                return []
+            best[(stop, -1, 0)] = (0, 0)
+            heap.append((0, 0, stop, -1, -1, -1))
+        heapq.heapify(heap)
+
+        while heap:
+            fare, legs, stop, prev_type, prev_label, prev_pattern = heapq.heappop(heap)
+            state = (stop, prev_type, legs)
+            if state in settled:
+                continue
+            settled.add(state)
+
+            if stop in targets:
+                return self._journey(labels, prev_label, fare)
+            if legs >= max_legs:
+                continue
+
+            for idx, pos in stop_patterns.get(stop, ()):
+                # 不在同一路線上下車後再搭回同一路線
+                if idx == prev_pattern:
+                    continue
+                pattern = patterns[idx]
+                type_id = pattern.type_id
+                if type_id == free_type_id:
+                    base = 0
+                    seg_rate = 0
+                    next_type = prev_type
+                else:
+                    base = (matrix[prev_type][type_id] * discount) if prev_type >= 0 else 0
+                    seg_rate = rate
+                    next_type = type_id
+
+                board = pattern.boarding[pos] - 1
+                alighting = pattern.alighting
+                route_stops = pattern.stops
+                next_legs = legs + 1
+                for j in range(pos + 1, len(route_stops)):
+                    next_stop = route_stops[j]
+                    # 只有目的地或可轉乘其他路線的站牌才需要下車
+                    if next_stop not in targets and (next_legs >= max_legs or next_stop not in transfer_stops):
+                        continue
+                    segments = alighting[j] - board
+                    leg_fare = base + seg_rate * (segments if segments > 1 else 1)
+                    label = (fare + leg_fare, next_legs)
+                    next_state = (next_stop, next_type, next_legs)
+                    known = best.get(next_state)
+                    if known is not None and known <= label:
+                        continue
+                    best[next_state] = label
+                    labels.append((prev_label, idx, pos, j, leg_fare))
+                    heapq.heappush(heap, (fare + leg_fare, next_legs, next_stop, next_type, len(labels) - 1, idx))
+        return None
+
+    def _journey(self, labels, label_idx, total_fare):
+        legs = []
+        while label_idx >= 0:
+            prev_label, idx, board, alight, leg_fare = labels[label_idx]
+            pattern = self.patterns[idx]
+            segments = pattern.alighting[alight] - pattern.boarding[board] + 1
+            legs.append({
+                "route_name": pattern.route_name,
+                "city": pattern.city,
+                "bus_type": pattern.bus_type,
+                "direction": pattern.direction,
+                "board": {"seq": pattern.seqs[board], "name": pattern.names[board], "stop_id": pattern.stops[board]},
+                "alight": {"seq": pattern.seqs[alight], "name": pattern.names[alight], "stop_id": pattern.stops[alight]},
+                "segments": segments if segments > 1 else 1,
+                "fare": leg_fare
+            })
+            label_idx = prev_label
+        legs.reverse()
+        return legs
+
+
+class JourneyGraphCache:
+    """
+    依資料版本快取 JourneyGraph：第一次查詢時由資料庫載入，新的 bus_data.db 出現時重新載入。
+    資料庫沒有轉乘圖資料表 (舊版資料庫) 時會拋出 sqlite3.OperationalError。
+    query_timer: 可選的計時 context manager 工廠 (例如 Metrics.query_timer)。
+    """
+
+    def __init__(self, query_timer=None):
+        self._lock = threading.Lock()
+        self._version = None
+        self._graph = None
+        self._query_timer = query_timer
+
+    def get(self, conn, version):
+        graph = self._graph
+        if graph is not None and self._version == version:
+            return graph
+        with self._lock:
+            if self._graph is None or self._version != version:
+                if self._query_timer is not None:
+                    with self._query_timer("journey_graph"):
+                        self._graph = JourneyGraph(conn)
+                else:
+                    self._graph = JourneyGraph(conn)
+                self._version = version
+            return self._graph
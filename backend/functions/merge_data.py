@@ -1,10 +1,30 @@
+import argparse
 import json
 import os
+import sys
 
-def merge_specific_file(base_dir, file_name, output_name):
+# Ensure we can import from the backend directory
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from functions import artifacts
+from functions.pipeline_state import run_stage
+
+CITIES = ('taipei', 'newtaipei')
+
+# (各縣市的檔名, 合併後的檔名)
+MERGE_FILES = (
+    ('bus_routes.json', 'merged_bus_routes.json'),  # 1. 路線資料
+    ('stops.json', 'merged_stops.json'),  # 2. 站牌資料
+    ('stop_locations.json', 'merged_stop_locations.json'),  # 3. 站牌位置資料
+    ('bus_route_fare_rows.json', 'merged_bus_route_fare_rows.json'),  # 4. 票價資料 (route_fares 資料列)
+)
+
+def merge_specific_file(base_dir, file_name, output_name, fmt=None):
     """
     通用合併函式：
-    讀取台北和新北的指定檔案，並合併成一個檔案。
+    讀取台北和新北的指定檔案 (任一格式)，並以 fmt 格式合併成一個檔案。
     結構為: { "taipei": ..., "newtaipei": ... }
     """
     taipei_file = os.path.join(base_dir, 'data', 'taipei', file_name)
@@ -19,16 +39,14 @@ def merge_specific_file(base_dir, file_name, output_name):
 
     try:
         # 讀取台北資料
-        if os.path.exists(taipei_file):
+        if artifacts.artifact_exists(taipei_file):
             print(f"讀取台北資料: {file_name}")
-            with open(taipei_file, 'r', encoding='utf-8') as f:
-                merged_data["taipei"] = json.load(f)
+            merged_data["taipei"] = artifacts.load_artifact(taipei_file)
 
         # 讀取新北資料
-        if os.path.exists(new_taipei_file):
+        if artifacts.artifact_exists(new_taipei_file):
             print(f"讀取新北資料: {file_name}")
-            with open(new_taipei_file, 'r', encoding='utf-8') as f:
-                merged_data["newtaipei"] = json.load(f)
+            merged_data["newtaipei"] = artifacts.load_artifact(new_taipei_file)
 
         # 這裡檢查一下是否至少有一邊有讀到，避免產生全空的廢檔 (看需求)
         # 但為了保持格式一致，即使是 None 也寫入可能是預期行為
@@ -39,10 +57,10 @@ def merge_specific_file(base_dir, file_name, output_name):
 
         # 儲存合併後的資料
         print(f"正在儲存合併檔案: {output_name}")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(merged_data, f, ensure_ascii=False, indent=4)
+        output_file = artifacts.dump_artifact(merged_data, output_file, fmt)
         
         print(f"資料已成功合併並儲存至 {output_file}")
+        return True
         
     except FileNotFoundError as e:
         print(f"找不到檔案: {e}")
@@ -50,21 +68,29 @@ def merge_specific_file(base_dir, file_name, output_name):
         print(f"JSON 解析失敗 ({file_name}): {e}")
     except Exception as e:
         print(f"合併資料時發生錯誤 ({file_name}): {e}")
+    return False
 
-def merge_all_data():
+def merge_all_data(force=False, fmt=None):
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    
-    # 1. 路線資料
-    merge_specific_file(base_dir, 'bus_routes.json', 'merged_bus_routes.json')
-    
-    # 2. 站牌資料 (新增)
-    merge_specific_file(base_dir, 'stops.json', 'merged_stops.json')
-    
-    # 3. 站牌位置資料 (新增)
-    merge_specific_file(base_dir, 'stop_locations.json', 'merged_stop_locations.json')
-
-    # 4. 票價資料 (新增)
-    merge_specific_file(base_dir, 'bus_route_fare_list.json', 'merged_bus_route_fare_list.json')
+    data_dir = os.path.join(base_dir, 'data')
+
+    # 各縣市資料 (update_data.py 的輸出) 與合併邏輯都沒有變更時略過
+    inputs = [os.path.join(data_dir, city, file_name) for city in CITIES for file_name, _ in MERGE_FILES]
+    inputs.append(os.path.abspath(__file__))
+    fmt = fmt or artifacts.DEFAULT_FORMAT
+    outputs = [artifacts.artifact_path(os.path.join(data_dir, 'merged', output_name), fmt)
+               for _, output_name in MERGE_FILES]
+
+    def merge():
+        results = [merge_specific_file(base_dir, file_name, output_name, fmt) for file_name, output_name in MERGE_FILES]
+        return all(results)
+
+    return run_stage('merge_data', inputs, outputs, merge, force)
 
 if __name__ == "__main__":
-    merge_all_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Merge Taipei and New Taipei data files.")
+    parser.add_argument('--force', action='store_true', help="Run even if the inputs are unchanged.")
+    parser.add_argument('--format', choices=artifacts.FORMATS, default=artifacts.DEFAULT_FORMAT,
+                        help="On-disk format of the merged files (default: $PIPELINE_DATA_FORMAT or json).")
+    args = parser.parse_args()
+    merge_all_data(args.force, args.format)
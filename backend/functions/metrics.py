@@ -0,0 +1,161 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 延遲直方圖的上界 (秒)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+
+class Metrics:
+    """
+    行程內的輕量指標收集，輸出 Prometheus text format。
+    - 每個端點的請求數 (依狀態碼)、錯誤數 (5xx) 與延遲直方圖
+    - 每種 SQL 查詢 (以標籤區分) 的執行時間直方圖
+    - 快取命中 / 未命中計數 (直接計數或於輸出時呼叫 collector 讀取)
+    每次紀錄只是一個 lock 內的幾次整數運算，成本在微秒以下。
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._errors = {}
+        self._latency = {}
+        self._queries = {}
+        self._cache = {}
+        self._cache_collectors = {}
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if status >= 500:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+            hist = self._latency.get(endpoint)
+            if hist is None:
+                hist = self._latency[endpoint] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    def observe_query(self, label, seconds):
+        with self._lock:
+            hist = self._queries.get(label)
+            if hist is None:
+                hist = self._queries[label] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    @contextmanager
+    def query_timer(self, label):
+        """計時一段 SQL 查詢：with metrics.query_timer("bus_options"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_query(label, time.perf_counter() - start)
+
+    def count_cache(self, cache, hit, amount=1):
+        with self._lock:
+            key = (cache, "hit" if hit else "miss")
+            self._cache[key] = self._cache.get(key, 0) + amount
+
+    def register_cache(self, cache, collector):
+        """
+        登錄自行計數的快取；collector() 回傳 dict (例如 {"hit": 10, "miss": 2, "eviction": 0})，
+        於輸出 /metrics 時讀取。
+        """
+        self._cache_collectors[cache] = collector
+
+    def _histogram_lines(self, name, label_name, histograms):
+        lines = []
+        for label, hist in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{_labels([(label_name, label), ("le", bound)])}}} {cumulative}')
+            cumulative += hist.counts[-1]
+            lines.append(f'{name}_bucket{{{_labels([(label_name, label), ("le", "+Inf")])}}} {cumulative}')
+            lines.append(f'{name}_sum{{{_labels([(label_name, label)])}}} {hist.total:.6f}')
+            lines.append(f'{name}_count{{{_labels([(label_name, label)])}}} {hist.count}')
+        return lines
+
+    def render(self):
+        """以 Prometheus text exposition format 輸出所有指標。"""
+        with self._lock:
+            requests = dict(self._requests)
+            errors = dict(self._errors)
+            latency = {k: self._copy_hist(v) for k, v in self._latency.items()}
+            queries = {k: self._copy_hist(v) for k, v in self._queries.items()}
+            cache = dict(self._cache)
+
+        for cache_name, collector in self._cache_collectors.items():
+            try:
+                for result, value in collector().items():
+                    cache[(cache_name, result)] = value
+            except Exception:
+                continue
+
+        lines = [
+            "# HELP api_requests_total Total HTTP requests by endpoint, method and status.",
+            "# TYPE api_requests_total counter",
+        ]
+        for (endpoint, method, status), value in sorted(requests.items()):
+            lines.append(f'api_requests_total{{{_labels([("endpoint", endpoint), ("method", method), ("status", status)])}}} {value}')
+
+        lines += [
+            "# HELP api_request_errors_total HTTP requests that ended with a 5xx status.",
+            "# TYPE api_request_errors_total counter",
+        ]
+        for endpoint, value in sorted(errors.items()):
+            lines.append(f'api_request_errors_total{{{_labels([("endpoint", endpoint)])}}} {value}')
+
+        lines += [
+            "# HELP api_request_duration_seconds HTTP request latency by endpoint.",
+            "# TYPE api_request_duration_seconds histogram",
+        ]
+        lines += self._histogram_lines("api_request_duration_seconds", "endpoint", latency)
+
+        lines += [
+            "# HELP sqlite_query_duration_seconds SQLite query time by statement label.",
+            "# TYPE sqlite_query_duration_seconds histogram",
+        ]
+        lines += self._histogram_lines("sqlite_query_duration_seconds", "statement", queries)
+
+        lines += [
+            "# HELP cache_events_total Cache hits, misses and evictions by cache.",
+            "# TYPE cache_events_total counter",
+        ]
+        for (cache_name, result), value in sorted(cache.items()):
+            lines.append(f'cache_events_total{{{_labels([("cache", cache_name), ("result", result)])}}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _copy_hist(hist):
+        copy = Histogram(hist.buckets)
+        copy.counts = list(hist.counts)
+        copy.total = hist.total
+        copy.count = hist.count
+        return copy
@@ -6,6 +6,8 @@ import re
 # Add parent directory to path to import db conversion if needed
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from functions.rule_registry import clean_name, get_rule_registry
+
 def parse_buffer_zones_from_db():
     try:
         db_path = os.path.join(os.path.dirname(__file__), '../data/bus_data.db')
@@ -144,58 +146,35 @@ def process_standard_route(cursor, rid, desc_text, route_name):
         
     return apply_buffer_logic(cursor, rid, ranges, route_name)
 
-def clean_name(n):
-    n = n.replace('（', '(').replace('）', ')')
-    n = n.replace('臺', '台')
-    # Strict mode: keep parens content
-    return n.strip()
-
 def compute_buffer_events(stops, ranges=None, route_name="", manual_zones=None):
     events = {}
     for s in stops:
         events[s['seqNo']] = []
         
     # =========================================================
-    # PASS 1.5: Special Turnaround Rules (Loaded from JSON)
+    # PASS 1.5: Special Turnaround Rules (Compiled by rule_registry)
     # =========================================================
-    import json
-    import os
-    
-    rules_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'static', 'special_turnaround_rules.json')
-    special_rules = []
-    if os.path.exists(rules_path):
-        try:
-            with open(rules_path, 'r', encoding='utf-8') as f:
-                special_rules = json.load(f)
-        except Exception as e:
-            print(f"Error loading special rules: {e}")
+    registry = get_rule_registry()
+    special_rules = registry.special_rules
     
     # Track which sequences are Official Starts/Ends (for Pass 2 blocking)
     official_starts = set()
     official_ends = set()
 
     if special_rules:
-        # Helper for rules
-        def rule_clean(n):
-             return clean_name(n)
-             
-        stop_names_cleaned = [rule_clean(s['nameZh']) for s in stops]
+        stop_names_cleaned = [clean_name(s['nameZh']) for s in stops]
         
         for rule in special_rules:
-            seq_target = [rule_clean(n) for n in rule.get('sequence', [])]
-            trigger_stop = rule_clean(rule.get('trigger_stop', ''))
-            if not seq_target or not trigger_stop: continue
+            seq_target = list(rule.sequence)
+            first_name = seq_target[0]
+            rel_idx = rule.trigger_index
             
             # Sliding window search for sequence
             n = len(seq_target)
             for i in range(len(stops) - n + 1):
+                if stop_names_cleaned[i] != first_name: continue
                 window = stop_names_cleaned[i : i+n]
                 if window == seq_target:
-                    try:
-                        rel_idx = seq_target.index(trigger_stop)
-                    except ValueError:
-                        continue 
-                    
                     abs_idx = i + rel_idx
                     s_trigger = stops[abs_idx]
                     
@@ -359,31 +338,6 @@ def compute_buffer_events(stops, ranges=None, route_name="", manual_zones=None):
     # PASS 2: Turnaround Buffer Marking (Updated Algorithm)
     # =========================================================
     
-    # Load Dual Terminal List
-    dual_terminal_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'static', 'dual_terminal_routes.json')
-    dual_terminal_config = {"exact_match": [], "fuzzy_match": []}
-    
-    if os.path.exists(dual_terminal_path):
-        try:
-             with open(dual_terminal_path, 'r', encoding='utf-8') as f:
-                 loaded_data = json.load(f)
-                 if isinstance(loaded_data, list):
-                     dual_terminal_config["exact_match"] = loaded_data
-                 elif isinstance(loaded_data, dict):
-                     dual_terminal_config = loaded_data
-        except: pass
-    
-    # Load Official Data Corrections (routes with incorrectly duplicated terminal stops)
-    corrections_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'static', 'official_data_corrections.json')
-    ignore_same_terminal_list = []
-    
-    if os.path.exists(corrections_path):
-        try:
-            with open(corrections_path, 'r', encoding='utf-8') as f:
-                corrections_data = json.load(f)
-                ignore_same_terminal_list = corrections_data.get("ignore_same_terminal", [])
-        except: pass
-        
     go_stops = [s for s in stops if s['goBack'] == 0]
     back_stops = [s for s in stops if s['goBack'] == 1]
     
@@ -399,34 +353,10 @@ def compute_buffer_events(stops, ranges=None, route_name="", manual_zones=None):
         c_first_back = clean_name(first_back['nameZh'])
         
         # Check if this route should ignore same-terminal detection (official data error)
-        should_ignore_same_terminal = (route_name in ignore_same_terminal_list)
+        should_ignore_same_terminal = registry.ignores_same_terminal(route_name)
         
-        # Check Exact Match (Support both string and object format)
-        exact_list = dual_terminal_config.get("exact_match", [])
-        dual_terminal_entry = None
-        for entry in exact_list:
-            if isinstance(entry, str):
-                # Legacy string format
-                if entry == route_name:
-                    dual_terminal_entry = {"route": entry, "loop_range": None}
-                    break
-            elif isinstance(entry, dict):
-                # New object format with loop_range
-                if entry.get("route") == route_name:
-                    dual_terminal_entry = entry
-                    break
-        
-        is_dual_terminal = (dual_terminal_entry is not None)
-        loop_range = dual_terminal_entry.get("loop_range") if dual_terminal_entry else None
-        
-        # Check Fuzzy Match
-        if not is_dual_terminal:
-            fuzzy_list = dual_terminal_config.get("fuzzy_match", [])
-            for pattern in fuzzy_list:
-                if pattern in route_name:
-                    is_dual_terminal = True
-                    loop_range = None  # Fuzzy match always uses default method
-                    break
+        # Check Dual Terminal list (exact match may carry a loop_range, fuzzy match always uses default method)
+        is_dual_terminal, loop_range = registry.dual_terminal_entry(route_name)
         
         # Determine if we should treat as disconnected turnaround
         # If route is in ignore_same_terminal list and last_go == first_back, use special loop detection
@@ -0,0 +1,104 @@
+"""
+資料管線的變更紀錄 (data/pipeline_manifest.json)。
+
+- feeds: update_data.py 紀錄每份資料的 ETag / Last-Modified / 內容雜湊，以及最近一次執行是否有變更，
+  下次下載時以條件式請求 (If-None-Match / If-Modified-Since) 略過未變更的資料。
+- stages: 各階段 (merge_data、convert_to_db、process_routes) 上次成功執行時的輸入雜湊，
+  輸入完全相同且輸出仍存在時，該階段直接略過。
+"""
+import hashlib
+import json
+import os
+import time
+
+from functions.artifacts import find_artifact
+
+MANIFEST_FILE = 'pipeline_manifest.json'
+MANIFEST_FORMAT = 1
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, 'data')
+
+
+def manifest_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, MANIFEST_FILE)
+
+
+def load_manifest(data_dir=DATA_DIR):
+    """讀取變更紀錄；不存在或格式不符時回傳空的紀錄。"""
+    try:
+        with open(manifest_path(data_dir), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = None
+    if not isinstance(manifest, dict) or manifest.get("format") != MANIFEST_FORMAT:
+        manifest = {"format": MANIFEST_FORMAT, "feeds": {}, "stages": {}}
+    return manifest
+
+
+def save_manifest(manifest, data_dir=DATA_DIR):
+    path = manifest_path(data_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """檔案內容的 sha256；檔案不存在時回傳 None。"""
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+def input_digests(paths, base_dir=BACKEND_DIR):
+    """
+    {相對於 backend/ 的路徑: sha256}，用於比對階段輸入是否改變。
+    路徑為產出檔的邏輯路徑時，以實際存在的格式 (見 artifacts.py) 計算。
+    """
+    return {os.path.relpath(path, base_dir).replace(os.sep, '/'): file_digest(find_artifact(path) or path)
+            for path in paths}
+
+
+def stage_is_current(stage, inputs, outputs, data_dir=DATA_DIR):
+    """
+    回傳 (是否可略過, 目前輸入的雜湊)。
+    輸入與上次成功執行時完全相同，且所有輸出都存在時才可略過。
+    """
+    digests = input_digests(inputs)
+    previous = load_manifest(data_dir)["stages"].get(stage)
+    current = (previous is not None
+               and previous.get("inputs") == digests
+               and all(os.path.exists(path) for path in outputs))
+    return current, digests
+
+
+def mark_stage_done(stage, digests, data_dir=DATA_DIR):
+    """紀錄階段成功執行時的輸入雜湊。"""
+    manifest = load_manifest(data_dir)
+    manifest["stages"][stage] = {
+        "inputs": digests,
+        "completed_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+    save_manifest(manifest, data_dir)
+
+
+def run_stage(stage, inputs, outputs, func, force=False, data_dir=DATA_DIR):
+    """
+    輸入未改變時略過 func；否則執行 func()，成功 (回傳 True) 後紀錄此次的輸入雜湊。
+    回傳 func 的結果 (略過時為 True)。
+    """
+    current, digests = stage_is_current(stage, inputs, outputs, data_dir)
+    if current and not force:
+        print(f"[{stage}] 輸入未變更，略過。")
+        return True
+
+    ok = func()
+    if ok:
+        mark_stage_done(stage, digests, data_dir)
+    return ok
@@ -1,5 +1,15 @@
+import argparse
 import json
 import os
+import sys
+
+# Ensure we can import from the backend directory
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from functions import artifacts
+from functions.pipeline_state import run_stage
 
 
 def get_type(merged_data:str, bus_type_map:dict, bus_other_name_map:dict,return_routes:dict, city:str):
@@ -41,9 +51,10 @@ def get_type(merged_data:str, bus_type_map:dict, bus_other_name_map:dict,return_
             }
     
 
-def process_and_save_routes():
+def process_and_save_routes(fmt=None):
     """
-    從合併資料中提取路線名稱、車種、所屬地，並儲存為單獨的 JSON 檔案。
+    從合併資料中提取路線名稱、車種、所屬地，並以 fmt 格式 (見 artifacts.py) 儲存為單獨的檔案。
+    成功時回傳 True。
     """
     # 根據腳本位置設定資料目錄
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -57,24 +68,23 @@ def process_and_save_routes():
 
     try:
         # 讀取合併後的資料
-        if not os.path.exists(merged_file):
+        if not artifacts.artifact_exists(merged_file):
             print(f"錯誤：找不到合併資料檔案 {merged_file}")
-            return
+            return False
 
-        with open(merged_file, 'r', encoding='utf-8') as f:
-            merged_data = json.load(f)
+        merged_data = artifacts.load_artifact(merged_file)
 
         # 讀取車種對照表
         if not os.path.exists(bus_type_file):
             print(f"錯誤：找不到車種對照表檔案 {bus_type_file}")
-            return
+            return False
 
         with open(bus_type_file, 'r', encoding='utf-8') as f:
             bus_type_map = json.load(f)
 
         if not os.path.exists(bus_other_name_file):
             print(f"錯誤：找不到車種其他名稱檔案 {bus_other_name_file}")
-            return
+            return False
 
         with open(bus_other_name_file, 'r', encoding='utf-8') as f:
             bus_other_name_map = json.load(f)
@@ -95,13 +105,33 @@ def process_and_save_routes():
             os.makedirs(output_dir)
 
         # 儲存處理後的資料
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(all_routes, f, ensure_ascii=False, indent=4)
+        output_file = artifacts.dump_artifact(all_routes, output_file, fmt)
         
         print(f"路線資料已成功處理並儲存至 {output_file}")
+        return True
         
     except Exception as e:
         print(f"處理路線資料時發生錯誤: {e}")
+    return False
+
+
+def run(force=False, fmt=None):
+    """合併路線資料、車種對照表與處理邏輯都沒有變更時略過。"""
+    data_dir = os.path.join(backend_dir, 'data')
+    inputs = [
+        os.path.join(data_dir, 'merged', 'merged_bus_routes.json'),
+        os.path.join(data_dir, 'static', 'bus_type_map.json'),
+        os.path.join(data_dir, 'static', 'bus_other_name.json'),
+        os.path.abspath(__file__),
+    ]
+    fmt = fmt or artifacts.DEFAULT_FORMAT
+    outputs = [artifacts.artifact_path(os.path.join(data_dir, 'processed', 'all_routes.json'), fmt)]
+    return run_stage('process_routes', inputs, outputs, lambda: process_and_save_routes(fmt), force)
 
 if __name__ == "__main__":
-    process_and_save_routes()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build processed/all_routes.json from the merged route data.")
+    parser.add_argument('--force', action='store_true', help="Run even if the inputs are unchanged.")
+    parser.add_argument('--format', choices=artifacts.FORMATS, default=artifacts.DEFAULT_FORMAT,
+                        help="On-disk format of all_routes (default: $PIPELINE_DATA_FORMAT or json).")
+    args = parser.parse_args()
+    run(args.force, args.format)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import atexit
+import datetime
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    將 log record 轉為單行 JSON：time, level, logger, message，
+    加上 extra={"fields": {...}} 傳入的欄位與例外堆疊 (exc)。
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+                    .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    """
+    只把 log record 放入佇列，JSON 格式化交給背景執行緒；
+    例外堆疊必須在原執行緒轉為文字 (traceback 物件不能跨執行緒保留)。
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener = None
+
+
+def setup_logging(level="INFO", stream=None):
+    """
+    設定非阻塞的結構化 log：
+    - 呼叫端只把 log record 放入佇列 (RecordQueueHandler)，不做格式化與 I/O
+    - 背景執行緒 (QueueListener) 負責轉為 JSON 並寫入 stream (預設 stdout)
+    重複呼叫時沿用已啟動的設定。
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    handler = RecordQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def parse_sample_rates(spec):
+    """
+    解析端點取樣比例設定，例如 "/api/route_stops=0.1,/health=0"。
+    格式錯誤的項目會被忽略。
+    """
+    rates = {}
+    for item in (spec or "").split(","):
+        endpoint, _, rate = item.strip().rpartition("=")
+        if not endpoint:
+            continue
+        try:
+            rates[endpoint] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class RequestSampler:
+    """
+    依端點決定是否紀錄存取 log。
+    rates: {路由樣板: 比例}，未列出的端點使用 default_rate；5xx 錯誤一律紀錄。
+    """
+
+    def __init__(self, rates=None, default_rate=1.0):
+        self.rates = dict(rates or {})
+        self.default_rate = default_rate
+
+    def should_log(self, endpoint, status):
+        if status >= 500:
+            return True
+        rate = self.rates.get(endpoint, self.default_rate)
+        if rate >= 1.0:
+            return True
+        return rate > 0.0 and random.random() < rate
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+# 快取未命中時 get() 回傳的哨兵值，與任何快取內容 (包含 None) 都不相同；
+# /api/route_stops 只快取存在的路線，查無路線不會放入快取
+MISSING = object()
+
+
+class ResponseCache:
+    """
+    行程內的回應快取 (LRU + TTL)。
+    - 同時以筆數 (max_entries) 與內容大小 (max_bytes) 設上限，超過時淘汰最久未使用者
+    - 每筆資料存放 ttl 秒後視為過期
+    - 以資料版本區分內容：偵測到新的資料版本 (新的 bus_data.db) 時整個清空
+    統計 hit / miss / eviction / flush 次數，供 /metrics 輸出。
+    """
+
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024, ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.flushes += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key, version):
+        """回傳快取內容；沒有 (或已過期) 時回傳 MISSING。"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            value, size, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size, version):
+        """存入一筆內容；size 為其位元組數，超過 max_bytes 的內容不快取。"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        return {
+            "hit": self.hits,
+            "miss": self.misses,
+            "eviction": self.evictions,
+            "flush": self.flushes,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
@@ -0,0 +1,115 @@
+import gzip
+import json
+import sqlite3
+
+
+def build_route_payload(cursor, route, rules):
+    """
+    組出 /api/route_stops 的回傳內容 (去返程站牌、段次、起訖點與提醒訊息)。
+    route: routes 資料表的一列 (需含 route_unique_id, nameZh, city, departureZh, destinationZh)
+    rules: rule_registry.RuleRegistry
+    """
+    cursor.execute('''
+        SELECT nameZh, goBack, seqNo, segment_boarding, segment_alighting
+        FROM stops
+        WHERE route_unique_id = ?
+        ORDER BY goBack, seqNo
+    ''', (route['route_unique_id'],))
+
+    outbound = []
+    inbound = []
+
+    for stop in cursor.fetchall():
+        stop_data = {
+            "name": stop['nameZh'],
+            "seq": stop['seqNo'],
+            "boarding": stop['segment_boarding'],
+            "alighting": stop['segment_alighting']
+        }
+        if stop['goBack'] == 0:
+            outbound.append(stop_data)
+        else:
+            inbound.append(stop_data)
+
+    route_name = route['nameZh']
+    warning_msg = ""
+    # 1. 檢查是否在手動列表中 (完全比對 / 子字串比對)
+    if rules.is_dual_terminal(route_name):
+        warning_msg = "⚠️ 注意：此路線去程不接駛返程。"
+
+    # 2. 啟發式檢查：去程末站 vs 返程首站 名稱相同（排除已確認的官方誤植路線）
+    elif outbound and inbound and not rules.ignores_same_terminal(route_name):
+        last_out = outbound[-1]['name']
+        first_in = inbound[0]['name']
+        if last_out == first_in:
+            warning_msg = f"⚠️ 提醒：此路線末端為折返站 [{last_out}]，請確認是否需重新購票或下車。"
+
+    # 使用官方表定起訖點
+    return {
+        "route_name": route_name,
+        "city": route['city'],
+        "outbound": outbound,
+        "inbound": inbound,
+        "outbound_dest": route['destinationZh'] or "",
+        "inbound_dest": route['departureZh'] or "",
+        "warning": warning_msg
+    }
+
+
+def serialize_payload(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def create_route_payloads_table(conn):
+    cursor = conn.cursor()
+    cursor.execute('DROP TABLE IF EXISTS route_payloads')
+    cursor.execute('''
+    CREATE TABLE route_payloads (
+        route_id INTEGER PRIMARY KEY, -- 對應 routes.id (同名路線取 id 最小者)
+        route_unique_id INTEGER,
+        nameZh TEXT,
+        city TEXT,
+        payload BLOB, -- UTF-8 JSON
+        payload_gzip BLOB -- 預先壓縮的 payload
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_payloads_name ON route_payloads (nameZh, route_id)')
+    conn.commit()
+
+
+def build_route_payloads(conn, rules, compress=True):
+    """
+    於建置資料庫時，為每條路線預先產生 /api/route_stops 的 JSON (與 gzip 版本)。
+    需在段次計算 (process_segments) 完成後呼叫。
+    """
+    print("正在產生路線站牌快取 (route_payloads)...")
+    create_route_payloads_table(conn)
+
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, route_unique_id, nameZh, city, departureZh, destinationZh FROM routes ORDER BY id")
+    routes = cursor.fetchall()
+
+    batch_data = []
+    for route in routes:
+        body = serialize_payload(build_route_payload(cursor, route, rules))
+        body_gzip = gzip.compress(body, compresslevel=9, mtime=0) if compress else None
+        batch_data.append((route['id'], route['route_unique_id'], route['nameZh'], route['city'], body, body_gzip))
+
+    cursor.executemany('''
+    INSERT INTO route_payloads (route_id, route_unique_id, nameZh, city, payload, payload_gzip)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', batch_data)
+    conn.commit()
+    print(f"已產生 {len(batch_data)} 筆路線站牌快取。")
+
+
+def lookup_route_payload(conn, route_name):
+    """
+    以路線名稱查詢預先產生的內容，回傳 (payload, payload_gzip) 或 None。
+    資料庫沒有 route_payloads 資料表 (舊版資料庫) 時會拋出 sqlite3.OperationalError。
+    """
+    return conn.execute(
+        'SELECT payload, payload_gzip FROM route_payloads WHERE nameZh = ? ORDER BY route_id LIMIT 1',
+        (route_name,)
+    ).fetchone()
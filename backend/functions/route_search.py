@@ -0,0 +1,130 @@
+import re
+import threading
+
+# 預設 / 最大回傳筆數
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+
+_LEADING_DIGITS = re.compile(r'^\d+')
+
+
+def _static_sort_key(route):
+    """
+    與前端 route-stops.js 的智慧排序相同，但不含與查詢字串有關的前兩項：
+    數字開頭優先並依整數值排序 (225 < 225區 < 226)，其餘依長度、字典序。
+    (前端使用 localeCompare，這裡以字元碼順序近似)
+    """
+    route_name = route["RouteName"].lower()
+    output_name = route["OutputName"].lower()
+    match = _LEADING_DIGITS.match(route_name)
+    if match:
+        return (0, int(match.group()), 0, output_name)
+    return (1, 0, len(output_name), output_name)
+
+
+class RouteSearchIndex:
+    """
+    路線搜尋索引 (/api/routes/search)。
+    - RouteName 的前綴 trie：每個節點存放以該前綴開頭的路線 (依靜態排序)
+    - RouteName / OutputName 的單字元與雙字元 n-gram 倒排表，支援「幹線」等中文子字串
+    排序與前端相同：RouteName 完全相符 > RouteName 前綴 > 數字開頭 (依整數值) > 長度 > 字典序。
+    由於前兩項只是分層，各層內皆依預先算好的靜態順序排列，取到 limit 筆即可停止。
+    """
+
+    def __init__(self, route_list):
+        order = sorted(range(len(route_list)), key=lambda i: _static_sort_key(route_list[i]))
+        self.routes = [route_list[i] for i in order]
+        self.default_routes = tuple(route_list)
+        self.route_names = [r["RouteName"].lower() for r in self.routes]
+        self.output_names = [r["OutputName"].lower() for r in self.routes]
+
+        self.exact = {}
+        self.trie = {}
+        self.grams = {}
+
+        # id 即靜態排序位置，依序加入後各列表自然有序
+        for rank, (route_name, output_name) in enumerate(zip(self.route_names, self.output_names)):
+            self.exact.setdefault(route_name, []).append(rank)
+
+            node = self.trie
+            for ch in route_name:
+                node = node.setdefault(ch, {})
+                node.setdefault("", []).append(rank)
+
+            seen = set()
+            for text in (route_name, output_name):
+                for n in (1, 2):
+                    for i in range(len(text) - n + 1):
+                        gram = text[i:i + n]
+                        if gram not in seen:
+                            seen.add(gram)
+                            self.grams.setdefault(gram, []).append(rank)
+
+    def _prefix_ids(self, query):
+        node = self.trie
+        for ch in query:
+            node = node.get(ch)
+            if node is None:
+                return ()
+        return node.get("", ())
+
+    def _substring_ids(self, query):
+        """以最短的 n-gram 倒排表作為候選，再以子字串比對確認。"""
+        if len(query) == 1:
+            candidates = self.grams.get(query, ())
+        else:
+            postings = [self.grams.get(query[i:i + 2], ()) for i in range(len(query) - 1)]
+            candidates = min(postings, key=len)
+
+        route_names = self.route_names
+        output_names = self.output_names
+        for rank in candidates:
+            if query in route_names[rank] or query in output_names[rank]:
+                yield rank
+
+    def _ranked_ids(self, query):
+        # 1. RouteName 完全相符
+        yield from self.exact.get(query, ())
+        # 2. RouteName 前綴 (包含完全相符者，由呼叫端去除重複)
+        yield from self._prefix_ids(query)
+        # 3. 其餘子字串相符者 (RouteName 以查詢字串開頭者已在前一層)
+        route_names = self.route_names
+        for rank in self._substring_ids(query):
+            if not route_names[rank].startswith(query):
+                yield rank
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """回傳排序後的前 limit 筆路線 ({"RouteName", "OutputName"})；空字串回傳 /api/routes 的前 limit 筆。"""
+        query = query.lower()
+        if not query:
+            return list(self.default_routes[:limit])
+
+        results = []
+        taken = set()
+        for rank in self._ranked_ids(query):
+            if rank in taken:
+                continue
+            taken.add(rank)
+            results.append(self.routes[rank])
+            if len(results) >= limit:
+                break
+        return results
+
+
+class RouteSearchCache:
+    """依路線快照 (digest) 快取搜尋索引，all_routes.json 更新時重建。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry = (None, None)
+
+    def get(self, snapshot):
+        digest, index = self._entry
+        if index is not None and digest == snapshot.digest:
+            return index
+        with self._lock:
+            digest, index = self._entry
+            if index is None or digest != snapshot.digest:
+                index = RouteSearchIndex(snapshot.route_list)
+                self._entry = (snapshot.digest, index)
+            return index
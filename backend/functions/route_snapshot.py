@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import threading
+from types import MappingProxyType
+
+from functions.artifacts import find_artifact, loads_artifact
+
+logger = logging.getLogger(__name__)
+
+
+def build_route_list(all_routes):
+    """
+    依 all_routes 建立 /api/routes 使用的路線清單：「幹線」路線排序後置前，其餘維持原順序。
+    """
+    routes = []
+
+    for route_name, route_info in all_routes.items():
+        temp_line_dict = {"RouteName": route_name}
+        temp_line_dict["OutputName"] = route_name
+        if route_info.get("OtherRouteName") is not None:
+            temp_line_dict["OutputName"] = route_info["OtherRouteName"] + " " + route_name
+        routes.append(temp_line_dict)
+
+    # 將所有路線分為「幹線」路線和其他路線
+    trunk_routes = [route for route in routes if "幹線" in route["OutputName"]]
+    trunk_routes.sort(key=lambda x: x["OutputName"])
+    other_routes = [route for route in routes if "幹線" not in route["OutputName"]]
+
+    return trunk_routes + other_routes
+
+
+class RouteSnapshot:
+    """
+    all_routes.json 的不可變快照。
+    routes: 路線名稱 -> 路線資訊 (唯讀)
+    route_list: 預先排序好的 /api/routes 回傳內容
+    """
+    __slots__ = ("routes", "route_list", "digest", "mtime_ns", "size")
+
+    def __init__(self, routes, route_list, digest, mtime_ns, size):
+        object.__setattr__(self, "routes", MappingProxyType(routes))
+        object.__setattr__(self, "route_list", tuple(route_list))
+        object.__setattr__(self, "digest", digest)
+        object.__setattr__(self, "mtime_ns", mtime_ns)
+        object.__setattr__(self, "size", size)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RouteSnapshot is immutable")
+
+    def with_stat(self, mtime_ns, size):
+        """內容相同但檔案時間改變時，沿用既有資料建立新快照。"""
+        snapshot = RouteSnapshot.__new__(RouteSnapshot)
+        for name in ("routes", "route_list", "digest"):
+            object.__setattr__(snapshot, name, getattr(self, name))
+        object.__setattr__(snapshot, "mtime_ns", mtime_ns)
+        object.__setattr__(snapshot, "size", size)
+        return snapshot
+
+
+class RouteSnapshotStore:
+    """
+    行程內共用的路線快照。
+    每次 get() 只做一次 os.stat；檔案 mtime/大小改變時才重新讀取，
+    內容雜湊不同才重新解析，並以單一參照指派的方式原子替換快照。
+    file_path 為邏輯路徑，實際檔案可為 artifacts.py 支援的任一格式；
+    目前的檔案消失 (管線改用其他格式寫入) 時才重新尋找。
+    load=False 時延後到第一次 get() 才讀取檔案 (縮短啟動時間)。
+    """
+
+    def __init__(self, file_path, load=True):
+        self.file_path = file_path
+        self._actual_path = file_path
+        self._lock = threading.Lock()
+        self._snapshot = None
+        if load:
+            self.get()
+
+    def seed(self, all_routes, route_list, digest):
+        """
+        以啟動快照中預先整理好的內容作為初始快照 (尚未載入時才採用)。
+        下一次 get() 會比對檔案內容雜湊，相同時直接沿用，不需解析 JSON 與重新排序。
+        """
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = RouteSnapshot(all_routes, route_list, digest, None, None)
+
+    def get(self):
+        """回傳目前的快照；檔案不存在且從未載入時回傳 None。"""
+        path = self._actual_path
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            path = find_artifact(self.file_path)
+            if path is None:
+                return self._snapshot
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return self._snapshot
+            self._actual_path = path
+
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.mtime_ns == st.st_mtime_ns and snapshot.size == st.st_size:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.mtime_ns == st.st_mtime_ns and snapshot.size == st.st_size:
+                return snapshot
+            self._snapshot = self._load(path, st, snapshot)
+            return self._snapshot
+
+    def _load(self, path, st, previous):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+
+        if previous is not None and previous.digest == digest:
+            return previous.with_stat(st.st_mtime_ns, st.st_size)
+
+        try:
+            all_routes = loads_artifact(raw, path)
+        except (ValueError, EOFError, OSError) as e:
+            # 管線寫入到一半時可能讀到不完整的檔案，保留舊快照
+            if previous is not None:
+                logger.warning("路線快照重新載入失敗，沿用舊版本: %s", e)
+                return previous
+            raise
+
+        return RouteSnapshot(all_routes, build_route_list(all_routes), digest, st.st_mtime_ns, st.st_size)
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'static')
+
+RULE_FILES = (
+    'dual_terminal_routes.json',
+    'official_data_corrections.json',
+    'special_turnaround_rules.json',
+)
+
+
+def clean_name(n):
+    n = n.replace('（', '(').replace('）', ')')
+    n = n.replace('臺', '台')
+    # Strict mode: keep parens content
+    return n.strip()
+
+
+class SubstringMatcher:
+    """
+    Aho-Corasick 多模式子字串比對：一次掃描判斷文字是否包含任一 pattern。
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [False]
+        self._match_all = False
+
+        for pattern in patterns:
+            if not pattern:
+                # 空字串必定是子字串
+                self._match_all = True
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(False)
+                node = nxt
+            self._out[node] = True
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fallback = self._goto[f].get(ch, 0)
+                self._fail[nxt] = fallback if fallback != nxt else 0
+                self._out[nxt] = self._out[nxt] or self._out[self._fail[nxt]]
+
+    def search(self, text):
+        if self._match_all:
+            return True
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                return True
+        return False
+
+
+class SpecialTurnaroundRule:
+    """預先正規化的特殊迴轉規則 (special_turnaround_rules.json 的一筆)。"""
+    __slots__ = ("rule_name", "sequence", "trigger_index")
+
+    def __init__(self, rule_name, sequence, trigger_index):
+        self.rule_name = rule_name
+        self.sequence = sequence
+        self.trigger_index = trigger_index
+
+
+class RuleRegistry:
+    """
+    編譯後的靜態規則：
+    - dual_exact: 雙端發車路線 (完全比對) -> loop_range
+    - dual_fuzzy: 雙端發車路線 (子字串比對) 的 Aho-Corasick automaton
+    - ignore_same_terminal: 官方資料誤植路線集合
+    - special_rules: 已正規化站名序列的特殊迴轉規則
+    """
+
+    def __init__(self, dual_terminal_data, corrections_data, special_rules_data):
+        exact_list = []
+        fuzzy_list = []
+        if isinstance(dual_terminal_data, list):
+            exact_list = dual_terminal_data
+        elif isinstance(dual_terminal_data, dict):
+            exact_list = dual_terminal_data.get("exact_match", []) or []
+            fuzzy_list = dual_terminal_data.get("fuzzy_match", []) or []
+
+        dual_exact = {}
+        for entry in exact_list:
+            if isinstance(entry, str):
+                # Legacy string format
+                dual_exact.setdefault(entry, None)
+            elif isinstance(entry, dict) and entry.get("route") is not None:
+                dual_exact.setdefault(entry["route"], entry.get("loop_range"))
+        self.dual_exact = dual_exact
+        self.dual_fuzzy = SubstringMatcher(p for p in fuzzy_list if isinstance(p, str))
+
+        ignore = []
+        if isinstance(corrections_data, dict):
+            ignore = corrections_data.get("ignore_same_terminal", []) or []
+        self.ignore_same_terminal = frozenset(ignore)
+
+        compiled = []
+        for rule in special_rules_data or []:
+            sequence = tuple(clean_name(n) for n in rule.get('sequence', []))
+            trigger_stop = clean_name(rule.get('trigger_stop', ''))
+            if not sequence or not trigger_stop or trigger_stop not in sequence:
+                continue
+            compiled.append(SpecialTurnaroundRule(rule.get('rule_name'), sequence, sequence.index(trigger_stop)))
+        self.special_rules = tuple(compiled)
+
+    def dual_terminal_entry(self, route_name):
+        """
+        回傳 (是否為雙端發車路線, loop_range)。
+        完全比對優先並可帶 loop_range；子字串比對一律使用預設方式 (loop_range = None)。
+        """
+        if route_name in self.dual_exact:
+            return True, self.dual_exact[route_name]
+        if route_name is not None and self.dual_fuzzy.search(route_name):
+            return True, None
+        return False, None
+
+    def is_dual_terminal(self, route_name):
+        return self.dual_terminal_entry(route_name)[0]
+
+    def ignores_same_terminal(self, route_name):
+        return route_name in self.ignore_same_terminal
+
+
+def _load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning("Error loading rules from %s: %s", path, e)
+        return default
+
+
+def _file_mtimes(static_dir):
+    mtimes = []
+    for file_name in RULE_FILES:
+        try:
+            mtimes.append(os.stat(os.path.join(static_dir, file_name)).st_mtime_ns)
+        except FileNotFoundError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_rule_registry(static_dir=STATIC_DIR):
+    """
+    取得已編譯的規則；只在任一規則檔 mtime 改變時重新讀取與編譯。
+    """
+    mtimes = _file_mtimes(static_dir)
+    cached = _cache.get(static_dir)
+    if cached is not None and cached[0] == mtimes:
+        return cached[1]
+
+    with _cache_lock:
+        cached = _cache.get(static_dir)
+        if cached is not None and cached[0] == mtimes:
+            return cached[1]
+
+        registry = RuleRegistry(
+            _load_json(os.path.join(static_dir, 'dual_terminal_routes.json'), {}),
+            _load_json(os.path.join(static_dir, 'official_data_corrections.json'), {}),
+            _load_json(os.path.join(static_dir, 'special_turnaround_rules.json'), []),
+        )
+        _cache[static_dir] = (mtimes, registry)
+        return registry
+
+
+# 各規則檔的預設內容 (檔案不存在時)，順序與 RULE_FILES 相同
+RULE_DEFAULTS = ({}, {}, [])
+
+
+def load_rule_data(static_dir=STATIC_DIR):
+    """讀取三個規則檔的原始內容 (供啟動快照使用)。"""
+    return [_load_json(os.path.join(static_dir, name), default) for name, default in zip(RULE_FILES, RULE_DEFAULTS)]
+
+
+def rule_file_digests(static_dir=STATIC_DIR):
+    """各規則檔內容的 sha1 (檔案不存在時為 None)。"""
+    digests = []
+    for file_name in RULE_FILES:
+        try:
+            with open(os.path.join(static_dir, file_name), 'rb') as f:
+                digests.append(hashlib.sha1(f.read()).hexdigest())
+        except FileNotFoundError:
+            digests.append(None)
+    return digests
+
+
+def seed_rule_registry(rule_data, digests, static_dir=STATIC_DIR):
+    """
+    以啟動快照中的規則內容建立快取，省去讀取與解析規則檔。
+    只有在目前規則檔的內容雜湊與快照相同時才採用，回傳是否成功。
+    """
+    if list(digests) != rule_file_digests(static_dir):
+        return False
+    with _cache_lock:
+        _cache[static_dir] = (_file_mtimes(static_dir), RuleRegistry(*rule_data))
+    return True
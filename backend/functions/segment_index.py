@@ -0,0 +1,161 @@
+import base64
+import threading
+from array import array
+
+
+class RouteSegmentArrays:
+    """
+    單一路線的上下車段次陣列 (依去程、返程及 seqNo 攤平，與前端站牌選單順序相同)。
+    任兩站的段數 = max(alighting[下車站] - boarding[上車站] + 1, 1)，O(1) 查表。
+    """
+    __slots__ = ("route_name", "city", "seqs", "names", "directions", "boarding", "alighting", "positions")
+
+    def __init__(self, route_name, city, rows):
+        self.route_name = route_name
+        self.city = city
+        self.seqs = array('i')
+        self.names = []
+        self.directions = array('b')
+        self.boarding = array('i')
+        self.alighting = array('i')
+        self.positions = {}
+
+        for row in rows:
+            self.positions[row['seqNo']] = len(self.seqs)
+            self.seqs.append(row['seqNo'])
+            self.names.append(row['nameZh'])
+            self.directions.append(1 if row['goBack'] else 0)
+            self.boarding.append(row['segment_boarding'] or 1)
+            self.alighting.append(row['segment_alighting'] or 1)
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def resolve(self, stop, after=-1):
+        """
+        將站牌 (seqNo 整數或站名) 轉為攤平後的位置；站名取 after 之後第一個符合者。
+        找不到時回傳 None。
+        """
+        if isinstance(stop, bool):
+            return None
+        if isinstance(stop, int):
+            return self.positions.get(stop)
+        if isinstance(stop, str):
+            for i in range(after + 1, len(self.names)):
+                if self.names[i] == stop:
+                    return i
+        return None
+
+    def segments_between(self, board_pos, alight_pos):
+        segments = self.alighting[alight_pos] - self.boarding[board_pos] + 1
+        return segments if segments > 1 else 1
+
+    def matrix_bytes(self):
+        """
+        所有 (上車站 i < 下車站 j) 組合的段數，依列優先排列的上三角 uint8 位元組。
+        第 i 列長度為 n - i - 1。
+        """
+        n = len(self.seqs)
+        boarding = self.boarding
+        alighting = self.alighting
+        out = bytearray()
+        for i in range(n):
+            b = boarding[i] - 1
+            out.extend(min(max(alighting[j] - b, 1), 255) for j in range(i + 1, n))
+        return bytes(out)
+
+    def matrix_payload(self):
+        return {
+            "route_name": self.route_name,
+            "city": self.city,
+            "stops": [
+                {"seq": seq, "name": name, "direction": direction}
+                for seq, name, direction in zip(self.seqs, self.names, self.directions)
+            ],
+            "encoding": "upper-triangle-u8-base64",
+            "data": base64.b64encode(self.matrix_bytes()).decode('ascii')
+        }
+
+
+class SegmentIndex:
+    """
+    路線名稱 -> RouteSegmentArrays 的記憶體快取。
+    首次查詢時由資料庫載入，資料版本改變 (新的 bus_data.db) 時整個清空。
+    只快取資料庫中存在的路線 (筆數上限即為路線數)；不存在的名稱每次直接回傳 None，不佔用快取。
+    query_timer: 可選的計時 context manager 工廠 (例如 Metrics.query_timer)，用於紀錄載入查詢時間。
+    """
+
+    def __init__(self, query_timer=None):
+        self._lock = threading.Lock()
+        self._version = None
+        self._routes = {}
+        self._query_timer = query_timer
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, conn, route_name, version):
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._routes = {}
+                    self._version = version
+
+        routes = self._routes
+        arrays = routes.get(route_name)
+        if arrays is not None:
+            self.hits += 1
+            return arrays
+
+        self.misses += 1
+        if self._query_timer is not None:
+            with self._query_timer("segment_arrays"):
+                arrays = self._load(conn, route_name)
+        else:
+            arrays = self._load(conn, route_name)
+        if arrays is not None:
+            routes[route_name] = arrays
+        return arrays
+
+    def stats(self):
+        return {"hit": self.hits, "miss": self.misses}
+
+    @staticmethod
+    def _load(conn, route_name):
+        route = conn.execute(
+            'SELECT route_unique_id, nameZh, city FROM routes WHERE nameZh = ? ORDER BY id LIMIT 1',
+            (route_name,)
+        ).fetchone()
+        if route is None:
+            return None
+
+        rows = conn.execute('''
+            SELECT nameZh, goBack, seqNo, segment_boarding, segment_alighting
+            FROM stops
+            WHERE route_unique_id = ?
+            ORDER BY goBack, seqNo
+        ''', (route['route_unique_id'],)).fetchall()
+        return RouteSegmentArrays(route['nameZh'], route['city'], rows)
+
+
+def count_segments(arrays, board, alight):
+    """
+    計算單一查詢的段數，回傳結果 dict (成功含 segments，失敗含 error)。
+    """
+    if arrays is None:
+        return {"error": "Route not found"}
+
+    board_pos = arrays.resolve(board)
+    if board_pos is None:
+        return {"error": f"Boarding stop '{board}' not found"}
+
+    alight_pos = arrays.resolve(alight, after=board_pos)
+    if alight_pos is None:
+        return {"error": f"Alighting stop '{alight}' not found"}
+    if alight_pos <= board_pos:
+        return {"error": "Alighting stop must come after boarding stop"}
+
+    return {
+        "board": {"seq": arrays.seqs[board_pos], "name": arrays.names[board_pos]},
+        "alight": {"seq": arrays.seqs[alight_pos], "name": arrays.names[alight_pos]},
+        "segments": arrays.segments_between(board_pos, alight_pos)
+    }
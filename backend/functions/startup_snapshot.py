@@ -0,0 +1,176 @@
+"""
+啟動快照：將 API 啟動時需要的資料 (路線清單、規則、熱門路線站牌內容) 預先整理成單一檔案，
+伺服器冷啟動時只需讀取一個檔案即可開始服務。
+
+於管線中 convert_to_db.py 與 process_routes.py 之後執行:
+    python ./backend/functions/startup_snapshot.py
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Ensure we can import from the same directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from functions.artifacts import find_artifact, loads_artifact
+from functions.route_snapshot import build_route_list
+from functions.rule_registry import load_rule_data, rule_file_digests
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_FILE = 'startup_snapshot.json'
+
+# 預先載入站牌內容的熱門路線：所有「幹線」路線 + data/static/hot_routes.json 列出的路線
+HOT_ROUTES_FILE = 'hot_routes.json'
+HOT_ROUTE_LIMIT = 64
+
+
+def read_build_id(conn):
+    """讀取資料庫的建置識別碼 (convert_to_db.write_build_info)；舊版資料庫回傳 None。"""
+    try:
+        row = conn.execute("SELECT value FROM build_info WHERE key = 'build_id'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def select_hot_routes(route_list, static_dir):
+    names = [route["RouteName"] for route in route_list if "幹線" in route["OutputName"]]
+    hot_file = os.path.join(static_dir, HOT_ROUTES_FILE)
+    if os.path.exists(hot_file):
+        with open(hot_file, 'r', encoding='utf-8') as f:
+            names = json.load(f) + names
+
+    hot = []
+    for name in names:
+        if name not in hot:
+            hot.append(name)
+    return hot[:HOT_ROUTE_LIMIT]
+
+
+def build_startup_snapshot(base_dir):
+    data_dir = os.path.join(base_dir, 'data')
+    static_dir = os.path.join(data_dir, 'static')
+    routes_path = os.path.join(data_dir, 'processed', 'all_routes.json')
+    db_path = os.path.join(data_dir, 'bus_data.db')
+    output_path = os.path.join(data_dir, 'processed', SNAPSHOT_FILE)
+
+    routes_file = find_artifact(routes_path)
+    if routes_file is None:
+        print(f"錯誤：找不到 {routes_path}")
+        return None
+
+    # 雜湊以實際檔案的內容計算，與 RouteSnapshotStore 一致
+    with open(routes_file, 'rb') as f:
+        raw = f.read()
+    all_routes = loads_artifact(raw, routes_file)
+    route_list = build_route_list(all_routes)
+
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "routes": {
+            "digest": hashlib.sha1(raw).hexdigest(),
+            "all_routes": all_routes,
+            "route_list": route_list,
+        },
+        "rules": {
+            "digests": rule_file_digests(static_dir),
+            "data": load_rule_data(static_dir),
+        },
+        "payloads": {"build_id": None, "routes": {}},
+    }
+
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            snapshot["payloads"]["build_id"] = read_build_id(conn)
+            for name in select_hot_routes(route_list, static_dir):
+                try:
+                    row = conn.execute(
+                        'SELECT payload, payload_gzip FROM route_payloads WHERE nameZh = ? ORDER BY route_id LIMIT 1',
+                        (name,)
+                    ).fetchone()
+                except sqlite3.OperationalError:
+                    break
+                if row is None:
+                    continue
+                payload, payload_gzip = row
+                snapshot["payloads"]["routes"][name] = [
+                    bytes(payload).decode('utf-8'),
+                    base64.b64encode(payload_gzip).decode('ascii') if payload_gzip is not None else None,
+                ]
+        finally:
+            conn.close()
+
+    # 先寫入暫存檔再替換，API 不會讀到寫入一半的快照
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, output_path)
+
+    print(f"已建立啟動快照: {output_path} "
+          f"(路線 {len(route_list)} 條，熱門路線內容 {len(snapshot['payloads']['routes'])} 筆)")
+    return output_path
+
+
+def load_startup_snapshot(path):
+    """讀取啟動快照；不存在、格式不符或內容損壞時回傳 None (改由各原始檔載入)。"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning("啟動快照讀取失敗，改用原始檔案: %s", e)
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return snapshot
+
+
+def route_seed(snapshot):
+    """RouteSnapshotStore 使用的 (all_routes, route_list, digest)。"""
+    if snapshot is None:
+        return None
+    routes = snapshot["routes"]
+    return routes["all_routes"], routes["route_list"], routes["digest"]
+
+
+def hot_payloads(snapshot):
+    """逐筆產生 (路線名稱, payload bytes, payload_gzip bytes 或 None)。"""
+    for name, (payload, payload_gzip) in snapshot["payloads"]["routes"].items():
+        yield name, payload.encode('utf-8'), base64.b64decode(payload_gzip) if payload_gzip is not None else None
+
+
+class StartupState:
+    """
+    啟動進度 (/ready)。/health 只代表行程存活；
+    warm-up (載入快照、預熱快取) 完成後才回報 ready。
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._ready = threading.Event()
+        self.details = {}
+
+    def mark_ready(self, **details):
+        self.details = dict(details, startup_ms=round((time.perf_counter() - self.started_at) * 1000, 1))
+        self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+
+if __name__ == "__main__":
+    build_startup_snapshot(backend_dir)
@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import threading
+
+from flask import make_response, request
+
+from functions.build_assets import DIST_DIR, ENCODING_SUFFIXES, MANIFEST_FILE, MANIFEST_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# 雜湊檔名的內容永遠不變，可長期快取；入口頁面每次需向伺服器確認 (ETag)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ENTRY_CACHE_CONTROL = "no-cache"
+
+# 同樣被接受時優先使用壓縮率較高的編碼
+ENCODING_PREFERENCE = ("br", "gzip")
+
+MIMETYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+}
+
+
+class StaticAsset:
+    __slots__ = ("name", "mimetype", "etag", "immutable", "bodies")
+
+    def __init__(self, name, etag, immutable, bodies):
+        self.name = name
+        self.mimetype = MIMETYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+        self.etag = etag
+        self.immutable = immutable
+        # 編碼 ("identity" / "gzip" / "br") -> 內容
+        self.bodies = bodies
+
+
+class StaticAssetStore:
+    """
+    frontend/dist/ (build_assets.py 的輸出) 的記憶體快取。
+    第一次使用時讀入所有檔案與預先壓縮的版本，manifest 更新 (重新建置) 時自動重新載入。
+    dist/ 不存在時 lookup 一律回傳 None，由呼叫端改用原始 frontend/ 檔案。
+    """
+
+    def __init__(self, frontend_dir):
+        self.dist_dir = os.path.join(frontend_dir, DIST_DIR)
+        self.manifest_path = os.path.join(self.dist_dir, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._stat = None
+        self._assets = {}
+
+    def _current_stat(self):
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format") != MANIFEST_FORMAT:
+            return {}
+
+        assets = {}
+        for name, entry in manifest["files"].items():
+            bodies = {}
+            for encoding in ["identity"] + entry["encodings"]:
+                path = os.path.join(self.dist_dir, name + ENCODING_SUFFIXES.get(encoding, ""))
+                with open(path, 'rb') as f:
+                    bodies[encoding] = f.read()
+            assets[name] = StaticAsset(name, entry["etag"], entry["immutable"], bodies)
+        return assets
+
+    def lookup(self, filename):
+        stat = self._current_stat()
+        if stat != self._stat:
+            with self._lock:
+                if stat != self._stat:
+                    try:
+                        self._assets = self._load() if stat is not None else {}
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.warning("前端資源載入失敗，改用原始檔案: %s", e)
+                        self._assets = {}
+                    self._stat = stat
+        return self._assets.get(filename)
+
+
+def negotiate_encoding(asset):
+    """依 Accept-Encoding 選出 asset 已預先壓縮的最佳編碼，皆不接受時回傳 "identity"。"""
+    best = "identity"
+    best_quality = 0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in asset.bodies:
+            continue
+        quality = request.accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def send_asset(asset):
+    """回傳預先壓縮的內容 (支援 If-None-Match)，雜湊檔名加上 immutable 長期快取。"""
+    encoding = negotiate_encoding(asset)
+    etag = asset.etag if encoding == "identity" else f"{asset.etag}-{encoding}"
+    cache_control = IMMUTABLE_CACHE_CONTROL if asset.immutable else ENTRY_CACHE_CONTROL
+
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(asset.bodies[encoding])
+        response.headers["Content-Type"] = asset.mimetype
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,292 @@
+import math
+import sqlite3
+import threading
+
+from functions.rule_registry import clean_name
+
+# 同一實體站牌的座標取至小數第 4 位 (約 10 公尺) 合併
+LOCATION_PRECISION = 4
+
+# 附近站牌查詢的預設值與上限 (公尺 / 筆數)
+DEFAULT_NEARBY_RADIUS = 500
+MAX_NEARBY_RADIUS = 5000
+DEFAULT_NEARBY_LIMIT = 20
+MAX_NEARBY_LIMIT = 200
+
+# k-nearest 查詢由此半徑開始，找不到足夠站牌時加倍
+INITIAL_SEARCH_RADIUS = 200
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def physical_stop_key(name, longitude, latitude):
+    """
+    實體站牌的鍵值：正規化站名 + 座標群集。
+    不同路線 (或不同縣市資料) 經過同一個站牌時會得到相同的鍵值。
+    """
+    return (clean_name(name or ""), round(longitude, LOCATION_PRECISION), round(latitude, LOCATION_PRECISION))
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """兩點間的大圓距離 (公尺，haversine)。"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def create_stop_index_tables(cursor):
+    cursor.execute('DROP TABLE IF EXISTS physical_stops')
+    cursor.execute('''
+    CREATE TABLE physical_stops (
+        id INTEGER PRIMARY KEY,
+        nameZh TEXT,
+        city TEXT,
+        longitude REAL,
+        latitude REAL,
+        stop_count INTEGER -- 合併的路線站牌數
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_physical_stops_lat ON physical_stops (latitude, longitude)')
+
+    cursor.execute('DROP TABLE IF EXISTS stop_rtree')
+    try:
+        cursor.execute('CREATE VIRTUAL TABLE stop_rtree USING rtree(id, min_lon, max_lon, min_lat, max_lat)')
+        return True
+    except sqlite3.OperationalError as e:
+        # SQLite 未編譯 R*Tree 模組時，改用 physical_stops 的緯度索引
+        print(f"無法建立 R*Tree 索引，改用緯度索引: {e}")
+        return False
+
+
+def build_stop_index(conn):
+    """
+    由 stops 資料表整理出去除重複的實體站牌，並建立空間索引 (R*Tree)。
+    回傳 {physical_stop_key: physical_stop_id}。
+    """
+    print("正在建立站牌空間索引...")
+    cursor = conn.cursor()
+    has_rtree = create_stop_index_tables(cursor)
+
+    cursor.execute('''
+        SELECT nameZh, city, longitude, latitude
+        FROM stops
+        WHERE longitude IS NOT NULL AND latitude IS NOT NULL
+        ORDER BY id
+    ''')
+
+    stops = {}
+    for name, city, longitude, latitude in cursor.fetchall():
+        try:
+            longitude = float(longitude)
+            latitude = float(latitude)
+        except (TypeError, ValueError):
+            continue
+        key = physical_stop_key(name, longitude, latitude)
+        entry = stops.get(key)
+        if entry is None:
+            stops[key] = [len(stops) + 1, name, city, longitude, latitude, 1]
+        else:
+            entry[5] += 1
+
+    rows = [tuple(entry) for entry in stops.values()]
+    cursor.executemany('''
+        INSERT INTO physical_stops (id, nameZh, city, longitude, latitude, stop_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    if has_rtree:
+        cursor.executemany(
+            'INSERT INTO stop_rtree (id, min_lon, max_lon, min_lat, max_lat) VALUES (?, ?, ?, ?, ?)',
+            [(row[0], row[3], row[3], row[4], row[4]) for row in rows]
+        )
+    conn.commit()
+    print(f"已建立 {len(rows)} 個實體站牌的空間索引。")
+    return {key: entry[0] for key, entry in stops.items()}
+
+
+def create_stop_routes_table(cursor):
+    cursor.execute('DROP TABLE IF EXISTS stop_routes')
+    cursor.execute('''
+    CREATE TABLE stop_routes (
+        physical_stop_id INTEGER, -- 對應 physical_stops.id
+        route_id INTEGER, -- 對應 routes.id (同一 route_unique_id 取 id 最小者)
+        nameZh TEXT, -- 路線名稱
+        city TEXT,
+        bus_type TEXT,
+        goBack INTEGER,
+        seqNo INTEGER,
+        segment_boarding INTEGER,
+        segment_alighting INTEGER,
+        PRIMARY KEY (physical_stop_id, route_id, goBack, seqNo)
+    ) WITHOUT ROWID
+    ''')
+
+
+def build_stop_routes(conn, stop_ids):
+    """
+    建立實體站牌 -> 停靠路線的反向索引 (stop_routes)。
+    stop_ids: build_stop_index 回傳的 {physical_stop_key: physical_stop_id}
+    需在段次計算 (process_segments) 完成後呼叫。
+    """
+    print("正在建立站牌停靠路線索引 (stop_routes)...")
+    cursor = conn.cursor()
+    create_stop_routes_table(cursor)
+
+    cursor.execute('''
+        SELECT r.id, r.nameZh, r.city, r.bus_type,
+               s.nameZh, s.longitude, s.latitude, s.goBack, s.seqNo, s.segment_boarding, s.segment_alighting
+        FROM stops s
+        JOIN (SELECT MIN(id) AS id, route_unique_id FROM routes GROUP BY route_unique_id) u
+             ON u.route_unique_id = s.route_unique_id
+        JOIN routes r ON r.id = u.id
+        WHERE s.longitude IS NOT NULL AND s.latitude IS NOT NULL
+    ''')
+
+    rows = {}
+    for (route_id, route_name, city, bus_type, stop_name, longitude, latitude,
+         go_back, seq, boarding, alighting) in cursor.fetchall():
+        try:
+            key = physical_stop_key(stop_name, float(longitude), float(latitude))
+        except (TypeError, ValueError):
+            continue
+        physical_id = stop_ids.get(key)
+        if physical_id is None:
+            continue
+        rows[(physical_id, route_id, go_back, seq)] = (
+            physical_id, route_id, route_name, city, bus_type, go_back, seq, boarding, alighting
+        )
+
+    cursor.executemany('''
+        INSERT INTO stop_routes (physical_stop_id, route_id, nameZh, city, bus_type, goBack, seqNo,
+                                 segment_boarding, segment_alighting)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows.values())
+    conn.commit()
+    print(f"已建立 {len(rows)} 筆站牌停靠路線索引。")
+
+
+class StopRoutesIndex:
+    """
+    記憶體中的站牌停靠路線索引：實體站牌 id -> (站牌資訊, 停靠路線清單)，並可依正規化站名查詢。
+    第一次查詢時由 stop_routes 資料表整批載入，資料版本改變 (新的 bus_data.db) 時重新載入；
+    之後每次查詢只需一次 dict 查詢，成本與結果筆數成正比。
+    資料庫沒有 stop_routes 資料表 (舊版資料庫) 時會拋出 sqlite3.OperationalError。
+    query_timer: 可選的計時 context manager 工廠 (例如 Metrics.query_timer)。
+    """
+
+    def __init__(self, query_timer=None):
+        self._lock = threading.Lock()
+        self._version = None
+        self._stops = None
+        self._names = None
+        self._query_timer = query_timer
+
+    def _ensure(self, conn, version):
+        if self._stops is not None and self._version == version:
+            return
+        with self._lock:
+            if self._stops is None or self._version != version:
+                if self._query_timer is not None:
+                    with self._query_timer("stop_routes"):
+                        stops, names = self._load(conn)
+                else:
+                    stops, names = self._load(conn)
+                self._stops, self._names = stops, names
+                self._version = version
+
+    @staticmethod
+    def _load(conn):
+        stops = {}
+        for physical_id, name, city, longitude, latitude in conn.execute(
+                'SELECT id, nameZh, city, longitude, latitude FROM physical_stops'):
+            stops[physical_id] = {"id": physical_id, "name": name, "city": city,
+                                  "lon": longitude, "lat": latitude, "routes": []}
+
+        for (physical_id, route_name, city, bus_type, go_back, seq, boarding, alighting) in conn.execute('''
+                SELECT physical_stop_id, nameZh, city, bus_type, goBack, seqNo, segment_boarding, segment_alighting
+                FROM stop_routes
+                ORDER BY physical_stop_id, route_id, goBack, seqNo'''):
+            stop = stops.get(physical_id)
+            if stop is not None:
+                stop["routes"].append({
+                    "route_name": route_name,
+                    "city": city,
+                    "bus_type": bus_type,
+                    "direction": go_back,
+                    "seq": seq,
+                    "boarding": boarding,
+                    "alighting": alighting
+                })
+
+        names = {}
+        for stop in stops.values():
+            names.setdefault(clean_name(stop["name"] or ""), []).append(stop)
+        return stops, names
+
+    def by_id(self, conn, physical_id, version):
+        """回傳單一實體站牌 (含停靠路線)，找不到時回傳 None。"""
+        self._ensure(conn, version)
+        return self._stops.get(physical_id)
+
+    def by_name(self, conn, name, version):
+        """回傳同名 (正規化後) 的所有實體站牌 (含停靠路線)。"""
+        self._ensure(conn, version)
+        return self._names.get(clean_name(name), [])
+
+
+def _bounding_box(lat, lon, radius):
+    d_lat = radius / METERS_PER_DEGREE_LAT
+    d_lon = radius / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return lon - d_lon, lon + d_lon, lat - d_lat, lat + d_lat
+
+
+def _query_box(conn, box):
+    min_lon, max_lon, min_lat, max_lat = box
+    try:
+        return conn.execute('''
+            SELECT p.id, p.nameZh, p.city, p.longitude, p.latitude, p.stop_count
+            FROM stop_rtree r JOIN physical_stops p ON p.id = r.id
+            WHERE r.min_lon <= ? AND r.max_lon >= ? AND r.min_lat <= ? AND r.max_lat >= ?
+        ''', (max_lon, min_lon, max_lat, min_lat)).fetchall()
+    except sqlite3.OperationalError:
+        # 沒有 R*Tree (模組不存在)：以緯度索引縮小範圍
+        return conn.execute('''
+            SELECT id, nameZh, city, longitude, latitude, stop_count
+            FROM physical_stops
+            WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+        ''', (min_lat, max_lat, min_lon, max_lon)).fetchall()
+
+
+def find_nearby_stops(conn, lat, lon, radius=DEFAULT_NEARBY_RADIUS, limit=DEFAULT_NEARBY_LIMIT):
+    """
+    回傳半徑 radius 公尺內距離最近的 limit 個實體站牌 (依距離排序)。
+    先以小範圍查詢空間索引，站牌不足 limit 個時範圍加倍，直到 radius 為止，
+    因此 k-nearest 與半徑查詢都只會讀取目標附近的索引節點。
+    """
+    search_radius = min(radius, INITIAL_SEARCH_RADIUS)
+    while True:
+        found = []
+        for row in _query_box(conn, _bounding_box(lat, lon, search_radius)):
+            dist = distance_m(lat, lon, row[4], row[3])
+            if dist <= search_radius:
+                found.append((dist, row))
+        if len(found) >= limit or search_radius >= radius:
+            break
+        search_radius = min(search_radius * 2, radius)
+
+    found.sort(key=lambda item: (item[0], item[1][0]))
+    return [
+        {
+            "id": row[0],
+            "name": row[1],
+            "city": row[2],
+            "lon": row[3],
+            "lat": row[4],
+            "distance": round(dist, 1),
+            "stop_count": row[5]
+        }
+        for dist, row in found[:limit]
+    ]
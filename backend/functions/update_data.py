@@ -1,10 +1,27 @@
 import argparse
 import requests
 import gzip
+import hashlib
 import json
 import os
+import random
+import sys
+import threading
+import time
+import urllib3
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# Ensure we can import from the backend directory
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from functions import artifacts
+from functions import fare_list
+from functions.pipeline_state import file_digest, load_manifest, save_manifest
+
 # 載入環境變數
 load_dotenv()
 
@@ -18,7 +35,34 @@ NEWTAIPEI_GETSTOP_URL = os.getenv("NEWTAIPEI_GETSTOP_URL")
 TAIPEI_GETSTOPLOCATION_URL = os.getenv("TAIPEI_GETSTOPLOCATION_URL")
 NEWTAIPEI_GETSTOPLOCATION_URL = os.getenv("NEWTAIPEI_GETSTOPLOCATION_URL")
 
-import xml.etree.ElementTree as ET
+TAIPEI_GETBUSROUTEFARELIST_URL = os.getenv("TAIPEI_GETBUSROUTEFARELIST_URL")
+NEWTAIPEI_GETBUSROUTEFARELIST_URL = os.getenv("NEWTAIPEI_GETBUSROUTEFARELIST_URL")
+
+# 票價資料直接轉為 route_fares 資料表的資料列 (見 fare_list.py)，不保存通用的巢狀結構
+FARE_ROWS_FILE = 'bus_route_fare_rows.json'
+
+# 各縣市的資料來源: {city: [(url, 輸出檔名), ...]}
+FEEDS = {
+    'taipei': [
+        (TAIPEI_GETROUTE_URL, 'bus_routes.json'),
+        (TAIPEI_GETSTOP_URL, 'stops.json'),
+        (TAIPEI_GETSTOPLOCATION_URL, 'stop_locations.json'),
+        (TAIPEI_GETBUSROUTEFARELIST_URL, FARE_ROWS_FILE),
+    ],
+    'newtaipei': [
+        (NEWTAIPEI_GETROUTE_URL, 'bus_routes.json'),
+        (NEWTAIPEI_GETSTOP_URL, 'stops.json'),
+        (NEWTAIPEI_GETSTOPLOCATION_URL, 'stop_locations.json'),
+        (NEWTAIPEI_GETBUSROUTEFARELIST_URL, FARE_ROWS_FILE),
+    ],
+}
+
+# 同時下載的資料數、每個請求的逾時 (連線, 讀取 秒) 與重試設定
+DEFAULT_WORKERS = 4
+REQUEST_TIMEOUT = (10, 120)
+DEFAULT_RETRIES = 3
+BACKOFF_BASE = 1.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 def xml_to_dict(element):
     """
@@ -55,92 +99,447 @@ def xml_to_dict(element):
     return {tag: data}
 
 
-def fetch_and_decompress(url, output_dir, output_filename):
+class RetryableError(Exception):
+    """暫時性的下載錯誤 (連線中斷、逾時、5xx / 429、內容被截斷)，可以重試。"""
+
+
+# 下載中途發生、可以重試的錯誤 (整份資料會重新下載)
+STREAM_ERRORS = (requests.RequestException, urllib3.exceptions.HTTPError, ConnectionError, EOFError)
+
+# 每個下載執行緒各自持有一個 keep-alive Session (requests.Session 不保證可跨執行緒共用)
+_sessions = threading.local()
+
+
+def get_session():
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _sessions.session = session
+    return session
+
+
+class CountingReader:
+    """包裝 HTTP 原始串流，紀錄已讀取的 (壓縮) 位元組數。"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.count += len(data)
+        return data
+
+
+def open_feed(url, headers=None, timeout=REQUEST_TIMEOUT):
+    """
+    開始下載 url，回傳 (response, CountingReader)，內容尚未讀取。
+    條件式請求的結果為 304 (內容未變更) 時回傳 (response, None)。
+    伺服器回應暫時性錯誤時拋出 RetryableError。
+    """
+    try:
+        response = get_session().get(url, headers=headers, stream=True, timeout=timeout)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise RetryableError(str(e)) from e
+    if response.status_code == 304:
+        response.close()
+        return response, None
+    if response.status_code in RETRY_STATUS:
+        response.close()
+        raise RetryableError(f"HTTP {response.status_code}")
+    response.raise_for_status()
+    # 由 gzip.GzipFile 自行解壓縮，不讓 urllib3 處理 Content-Encoding
+    response.raw.decode_content = False
+    return response, CountingReader(response.raw)
+
+
+def with_retries(func, url, retries=DEFAULT_RETRIES, backoff=BACKOFF_BASE):
+    """
+    執行 func()，回傳 (結果, 嘗試次數)。
+    暫時性錯誤以指數退避 (backoff * 2^n，加上隨機抖動) 重試 retries 次，其餘錯誤直接拋出。
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return func(), attempt
+        except RetryableError as e:
+            if attempt > retries:
+                raise
+            delay = backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.1)
+            print(f"下載失敗 ({e})，{delay:.1f} 秒後重試 ({attempt}/{retries}): {url}")
+            time.sleep(delay)
+
+
+def _local_tag(tag):
+    return tag.split('}')[-1]
+
+
+class _ContainerWriter:
+    """
+    以串流方式寫出 xml_to_dict 的 {子節點 tag: 值 或 值的 list} 結構。
+    同一 tag 出現第二次時才開始寫成 list (與 xml_to_dict 相同)，因此每個 tag 最多暫存一筆。
+    同一 tag 需連續出現 (資料來源的 RouteFares 只包含 RouteFare)。
+    """
+
+    def __init__(self, out, attrib):
+        self.out = out
+        self.keys = 0
+        self.closed_tags = set()
+        self.tag = None
+        self.pending = None
+        self.count = 0
+        out.write("{")
+        for key, value in attrib.items():
+            self._key(key)
+            out.write(json.dumps(value, ensure_ascii=False))
+
+    def _key(self, key):
+        self.out.write(",\n" if self.keys else "\n")
+        self.out.write(f"{json.dumps(key, ensure_ascii=False)}: ")
+        self.keys += 1
+
+    def add(self, tag, value):
+        if tag != self.tag:
+            self._close_tag()
+            if tag in self.closed_tags:
+                raise ValueError(f"XML 子節點 <{tag}> 不連續，無法以串流方式轉換")
+            self.tag = tag
+            self.pending = value
+            self.count = 1
+            return
+        if self.count == 1:
+            self._key(tag)
+            self.out.write("[\n")
+            self.out.write(json.dumps(self.pending, ensure_ascii=False))
+            self.pending = None
+        self.out.write(",\n")
+        self.out.write(json.dumps(value, ensure_ascii=False))
+        self.count += 1
+
+    def _close_tag(self):
+        if self.tag is None:
+            return
+        if self.count == 1:
+            self._key(self.tag)
+            self.out.write(json.dumps(self.pending, ensure_ascii=False))
+        else:
+            self.out.write("\n]")
+        self.closed_tags.add(self.tag)
+        self.tag = None
+        self.pending = None
+
+    def close(self):
+        self._close_tag()
+        self.out.write("\n}")
+
+
+class _NdjsonContainerWriter:
+    """
+    _ContainerWriter 的 NDJSON 版本 (行格式見 artifacts.iter_ndjson_lines)：第一層節點 index 寫成一個 dict，
+    同一 tag 出現第二次後每筆資料各寫成一行。只出現一次的 tag 與 iter_ndjson_lines 相同方式寫出。
+    """
+
+    def __init__(self, out, attrib, index):
+        self.out = out
+        self.path = (index,)
+        self.closed_tags = set()
+        self.tag = None
+        self.pending = None
+        self.count = 0
+        self._line(self.path, {})
+        for key, value in attrib.items():
+            self._line(self.path + (key,), value)
+
+    def _line(self, path, value):
+        self.out.write(artifacts.ndjson_line(path, value))
+        self.out.write('\n')
+
+    def add(self, tag, value):
+        if tag != self.tag:
+            self._close_tag()
+            if tag in self.closed_tags:
+                raise ValueError(f"XML 子節點 <{tag}> 不連續，無法以串流方式轉換")
+            self.tag = tag
+            self.pending = value
+            self.count = 1
+            return
+        path = self.path + (tag,)
+        if self.count == 1:
+            self._line(path, [])
+            self._line(path + (0,), self.pending)
+            self.pending = None
+        self._line(path + (self.count,), value)
+        self.count += 1
+
+    def _close_tag(self):
+        if self.tag is None:
+            return
+        if self.count == 1:
+            for line in artifacts.iter_ndjson_lines(self.pending, self.path + (self.tag,)):
+                self.out.write(line)
+                self.out.write('\n')
+        self.closed_tags.add(self.tag)
+        self.tag = None
+        self.pending = None
+
+    def close(self):
+        self._close_tag()
+
+
+def stream_xml_to_json(stream, out, fmt="json"):
+    """
+    以 iterparse 逐筆轉換 XML 資料並寫入 out (文字檔)，結果與 [xml_to_dict(child) 的值 for child in root] 相同。
+    第二層的每筆資料 (例如 RouteFares 內的 RouteFare) 轉換後立即寫出並清除，記憶體用量不隨資料大小增加。
+    fmt 為 ndjson 時以 NDJSON 寫出 (第一層有子節點的節點一律展開，每筆資料一行)。
+    回傳寫出的資料筆數。
+    """
+    ndjson = fmt.startswith('ndjson')
+    depth = 0
+    items = 0
+    records = 0
+    container = None
+    current = None
+    root = None
+    out.write(artifacts.ndjson_line((), []) + '\n' if ndjson else "[")
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = elem
+            elif depth == 3 and container is None:
+                # 第一層節點有子節點：改為串流寫出
+                if ndjson:
+                    container = _NdjsonContainerWriter(out, current.attrib, items)
+                else:
+                    out.write(",\n" if items else "\n")
+                    container = _ContainerWriter(out, current.attrib)
+            elif depth == 2:
+                current = elem
+            continue
+
+        depth -= 1
+        if depth == 2:
+            # 第二層的一筆資料 (例如 RouteFare)
+            tag = _local_tag(elem.tag)
+            container.add(tag, xml_to_dict(elem)[tag])
+            records += 1
+            current.remove(elem)
+        elif depth == 1:
+            if container is not None:
+                container.close()
+                container = None
+            else:
+                tag = _local_tag(elem.tag)
+                value = xml_to_dict(elem)[tag]
+                if ndjson:
+                    for line in artifacts.iter_ndjson_lines(value, (items,)):
+                        out.write(line)
+                        out.write('\n')
+                else:
+                    out.write(",\n" if items else "\n")
+                    out.write(json.dumps(value, ensure_ascii=False))
+            items += 1
+            root.remove(elem)
+
+    if not ndjson:
+        out.write("\n]\n")
+    return records
+
+
+def write_fare_rows(stream, is_xml, city, out, fmt):
+    """票價資料 (XML 或 JSON) 以 fare_list 的專用轉換逐列寫出資料列文件，回傳資料列數。"""
+    skip_counts = {}
+    if is_xml:
+        rows = fare_list.iter_fare_rows(stream, city, skip_counts)
+    else:
+        rows = fare_list.json_fare_rows(json.load(stream), city, skip_counts)
+    count = fare_list.write_fare_rows_document(rows, skip_counts, out, ndjson=fmt.startswith('ndjson'))
+    print(f"[{city}] 票價資料轉換完成: {count} 筆資料列，略過 {skip_counts}")
+    return count
+
+
+def url_fingerprint(url):
+    """網址的雜湊 (變更紀錄不保存網址本身，其中可能含有金鑰)。"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+
+
+def conditional_headers(url, output_file, previous):
+    """上次下載的 ETag / Last-Modified 仍適用 (同一網址且輸出檔案存在) 時，回傳條件式請求標頭。"""
+    if not previous or previous.get("url") != url_fingerprint(url) or not os.path.exists(output_file):
+        return {}
+    if file_digest(output_file) != previous.get("sha256"):
+        # 輸出檔案已被其他方式改動，重新下載
+        return {}
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+    return headers
+
+
+def fetch_and_decompress(url, output_dir, output_filename, retries=DEFAULT_RETRIES, backoff=BACKOFF_BASE,
+                         previous=None, fmt=None):
     """
-    從指定網址下載 .gz 檔案並解壓縮，並儲存為 JSON。
-    若內容為 XML (開頭為 <)，則自動轉換為 JSON。
+    從指定網址下載 .gz 檔案，邊下載邊解壓縮並以 fmt 格式儲存 (見 artifacts.py，預設為精簡 JSON)。
+    若內容為 XML (開頭為 <)，則以 iterparse 逐筆轉換為 JSON / NDJSON，不需將整份資料載入記憶體。
+    先寫入暫存檔，完成後才替換原檔案 (失敗時保留舊資料)。
+    previous: 變更紀錄中此筆資料上次的狀態，用於條件式請求與判斷內容是否改變。
+    回傳此筆資料的結果 {"file", "ok", "status", "changed", "feed", "attempts", "bytes", "records", "total_s"}；
+    status 為 "updated"、"unchanged" (內容雜湊相同)、"not_modified" (304) 或 "failed"。
     """
+    result = {"file": f"{os.path.basename(output_dir)}/{output_filename}",
+              "ok": False, "status": "failed", "changed": False, "feed": previous,
+              "attempts": 0, "bytes": 0, "records": None, "total_s": 0.0}
     if not url:
         print(f"警告: 未提供 URL (檔案: {output_filename})，跳過下載。")
-        return
+        return result
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    fmt = fmt or artifacts.DEFAULT_FORMAT
+    logical_file = os.path.join(output_dir, output_filename)
+    output_file = artifacts.artifact_path(logical_file, fmt)
+    tmp_file = output_file + ".tmp"
+    headers = conditional_headers(url, output_file, previous)
+
+    def attempt():
+        response, raw = open_feed(url, headers)
+        if raw is None:
+            return response, None, 0
+        try:
+            with gzip.GzipFile(fileobj=raw) as stream, \
+                    artifacts.open_text(tmp_file, 'w', compressed=fmt.endswith('.gz')) as out:
+                # 略過開頭空白後判斷是否為 XML
+                head = stream.peek(64).lstrip(b'\xef\xbb\xbf \t\r\n')
+                if output_filename == FARE_ROWS_FILE:
+                    records = write_fare_rows(stream, head.startswith(b'<'), os.path.basename(output_dir), out, fmt)
+                elif head.startswith(b'<'):
+                    print(f"偵測到 XML 格式 ({output_filename})，以串流方式轉換為 {fmt.split('.')[0].upper()}...")
+                    records = stream_xml_to_json(stream, out, fmt)
+                else:
+                    records = None
+                    artifacts.write_value(json.load(stream), out, fmt)
+            return response, records, raw.count
+        except STREAM_ERRORS as e:
+            raise RetryableError(str(e)) from e
+        finally:
+            response.close()
 
+    start = time.perf_counter()
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        decompressed_data = gzip.decompress(response.content)
-        decoded_data = decompressed_data.decode('utf-8')
-        
-        # 檢查是否為 XML
-        if decoded_data.strip().startswith('<'):
-            print(f"偵測到 XML 格式 ({output_filename})，正在轉換為 JSON...")
-            try:
-                # 預處理: 移除可能的 encoding header 以避免某些 parse error
-                # root = ET.fromstring(decoded_data)
-                
-                # 使用 iterparse 或 fromstring
-                root = ET.fromstring(decoded_data)
-                
-                xml_data = []
-                # 假設 Root 下的第一層就是各個資料項目 (例如 <BusRouteFareList> -> <RouteFare>...)
-                # 我們把每一項轉成 Dict
-                for child in root:
-                    child_dict = xml_to_dict(child)
-                    # xml_to_dict 回傳的是 {Tag: Content}，我們通常只需要 Content
-                    # 但為了保險，我們把 key 也留著，或者 print 出來看看
-                    # 通常 List 的 Item 我們只取 value
-                    key = list(child_dict.keys())[0]
-                    xml_data.append(child_dict[key])
-                
-                final_data = xml_data
-                
-            except ET.ParseError as e:
-                print(f"XML 解析失敗: {e}")
-                # 嘗試印出部分內容除錯
-                print(f"前 200 字元: {decoded_data[:200]}")
-                return
+        (response, result["records"], result["bytes"]), result["attempts"] = with_retries(attempt, url, retries, backoff)
+        result["ok"] = True
+        if response.status_code == 304:
+            result["status"] = "not_modified"
+            print(f"資料未變更 (304)，沿用現有檔案: {output_file}")
         else:
-            final_data = json.loads(decoded_data)
-            
-        print(f"資料下載並解壓縮成功: {output_filename}")
-        
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        output_file = os.path.join(output_dir, output_filename)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(final_data, f, ensure_ascii=False, indent=4)
-            
-        print(f"資料已成功儲存至 {output_file}")
-        
+            digest = file_digest(tmp_file)
+            result["changed"] = previous is None or digest != previous.get("sha256") or not os.path.exists(output_file)
+            result["status"] = "updated" if result["changed"] else "unchanged"
+            result["feed"] = {
+                "url": url_fingerprint(url),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": digest,
+            }
+            if result["changed"]:
+                os.replace(tmp_file, output_file)
+                artifacts.remove_other_formats(logical_file, output_file)
+                print(f"資料已成功儲存至 {output_file}")
+            else:
+                print(f"資料內容未變更: {output_file}")
+    except ET.ParseError as e:
+        print(f"XML 解析失敗 ({output_filename}): {e}")
     except Exception as e:
         print(f"執行時發生錯誤 ({output_filename}): {e}")
+    finally:
+        result["total_s"] = time.perf_counter() - start
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    return result
+
+
+def download_all(feeds, data_dir, workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES, backoff=BACKOFF_BASE,
+                 previous=None, fmt=None):
+    """
+    以執行緒池同時下載多個縣市的所有資料 (最多 workers 個同時進行)。
+    feeds: {city: [(url, 輸出檔名), ...]}，輸出至 data_dir/<city>/。
+    previous: 變更紀錄的 feeds ({"<city>/<檔名>": 上次狀態})，None 時一律重新下載。
+    fmt: 輸出格式 (artifacts.FORMATS)，None 時使用 PIPELINE_DATA_FORMAT。
+    回傳每筆資料的結果 (順序與 feeds 相同)。
+    """
+    previous = previous or {}
+    jobs = [(url, os.path.join(data_dir, city), filename)
+            for city, city_feeds in feeds.items()
+            for url, filename in city_feeds]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="download") as pool:
+        futures = [pool.submit(fetch_and_decompress, url, output_dir, filename, retries, backoff,
+                               previous.get(f"{os.path.basename(output_dir)}/{filename}"), fmt)
+                   for url, output_dir, filename in jobs]
+        return [future.result() for future in futures]
+
+
+def print_summary(results, elapsed):
+    print("下載結果:")
+    for r in results:
+        records = f"{r['records']:>6} records" if r["records"] is not None else " " * 14
+        print(f"  {r['file']:<36} {r['status']:<12} {r['bytes'] / 1024:>9.1f} KB  {records}  "
+              f"{r['total_s']:6.2f}s  attempts {r['attempts']}")
+    print(f"共 {len(results)} 筆，更新 {sum(1 for r in results if r['changed'])} 筆，"
+          f"失敗 {sum(1 for r in results if not r['ok'])} 筆，耗時 {elapsed:.2f}s")
+
+
+def record_changes(results, data_dir):
+    """將下載結果寫入變更紀錄 (pipeline_manifest.json)，供後續階段判斷是否需要執行。"""
+    manifest = load_manifest(data_dir)
+    for r in results:
+        if r["feed"] is not None:
+            manifest["feeds"][r["file"]] = r["feed"]
+    # 不紀錄執行時間：資料未變更時變更紀錄的內容也不變，管線不會產生新的 commit
+    manifest["last_update"] = {
+        "changed": [r["file"] for r in results if r["changed"]],
+        "failed": [r["file"] for r in results if not r["ok"]],
+    }
+    save_manifest(manifest, data_dir)
+
 
 def main():
     # 使用 argparse 函式庫來解析命令列參數
     parser = argparse.ArgumentParser(description="Update bus data (routes, stops, locations) for different cities.")
-    parser.add_argument('city', type=str, help="The city to fetch data for (taipei or newtaipei).")
+    parser.add_argument('cities', nargs='*', default=list(FEEDS),
+                        help="Cities to fetch data for (taipei, newtaipei). Defaults to all cities.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Number of concurrent downloads.")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="Retries for transient errors.")
+    parser.add_argument('--force', action='store_true', help="Ignore stored ETag / Last-Modified and download everything.")
+    parser.add_argument('--format', choices=artifacts.FORMATS, default=artifacts.DEFAULT_FORMAT,
+                        help="On-disk format of the downloaded data (default: $PIPELINE_DATA_FORMAT or json).")
     
     args = parser.parse_args()
 
+    unknown = [city for city in args.cities if city not in FEEDS]
+    if unknown:
+        print(f"找不到 {', '.join(unknown)} 的資料來源。")
+        return
+
     # 根據腳本位置設定輸出目錄
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    output_dir = os.path.join(base_dir, 'data', args.city)
+    data_dir = os.path.join(base_dir, 'data')
 
-    print(f"開始更新 {args.city} 的公車資料...")
-    
-    if args.city == 'taipei':
-        fetch_and_decompress(TAIPEI_GETROUTE_URL, output_dir, 'bus_routes.json')
-        fetch_and_decompress(TAIPEI_GETSTOP_URL, output_dir, 'stops.json')
-        fetch_and_decompress(TAIPEI_GETSTOPLOCATION_URL, output_dir, 'stop_locations.json')
-        fetch_and_decompress(os.getenv("TAIPEI_GETBUSROUTEFARELIST_URL"), output_dir, 'bus_route_fare_list.json')
-    elif args.city == 'newtaipei':
-        fetch_and_decompress(NEWTAIPEI_GETROUTE_URL, output_dir, 'bus_routes.json')
-        fetch_and_decompress(NEWTAIPEI_GETSTOP_URL, output_dir, 'stops.json')
-        fetch_and_decompress(NEWTAIPEI_GETSTOPLOCATION_URL, output_dir, 'stop_locations.json')
-        fetch_and_decompress(os.getenv("NEWTAIPEI_GETBUSROUTEFARELIST_URL"), output_dir, 'bus_route_fare_list.json')
-    else:
-        print(f"找不到 {args.city} 的資料來源。")
+    print(f"開始更新 {', '.join(args.cities)} 的公車資料 (同時下載 {args.workers} 筆)...")
+    start = time.perf_counter()
+    previous = None if args.force else load_manifest(data_dir)["feeds"]
+    results = download_all({city: FEEDS[city] for city in args.cities}, data_dir, args.workers, args.retries,
+                           previous=previous, fmt=args.format)
+    print_summary(results, time.perf_counter() - start)
+    record_changes(results, data_dir)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,9 @@
+"""
+gunicorn 設定 (Procfile 的 `gunicorn app:app` 會自動讀取目前目錄的 gunicorn.conf.py)。
+"""
+
+
+def post_worker_init(worker):
+    # 每個 worker 載入 app 後才啟動背景預熱 (匯入 app 本身不啟動執行緒)
+    from app import start_warm_up
+    start_warm_up()
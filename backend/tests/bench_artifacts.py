@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# __file__ is in backend/tests/
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from functions import artifacts
+
+DATA_DIR = os.path.join(backend_dir, 'data')
+ARTIFACTS = (
+    'taipei/bus_routes.json',
+    'taipei/stop_locations.json',
+    'taipei/bus_route_fare_rows.json',
+    'newtaipei/bus_routes.json',
+    'newtaipei/stop_locations.json',
+    'newtaipei/bus_route_fare_rows.json',
+    'merged/merged_bus_routes.json',
+    'processed/all_routes.json',
+)
+ROUNDS = 3
+
+
+def best_load_time(path):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        value = artifacts.load_artifact(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return value, best
+
+
+def main():
+    sources = [(name, os.path.join(DATA_DIR, name)) for name in ARTIFACTS]
+    sources = [(name, path) for name, path in sources if artifacts.artifact_exists(path)]
+    if not sources:
+        print(f"No pipeline artifacts found under {DATA_DIR}")
+        return
+
+    # 基準：原本的 indent=4 JSON
+    formats = ("indent=4",) + artifacts.FORMATS
+    totals = {fmt: [0, 0.0] for fmt in formats}
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for name, path in sources:
+            value = artifacts.load_artifact(path)
+            target = os.path.join(tmp_dir, name.replace('/', '_'))
+
+            baseline = artifacts.artifact_path(target, "json")
+            with open(baseline, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False, indent=4)
+            _, elapsed = best_load_time(target)
+            totals["indent=4"][0] += os.path.getsize(baseline)
+            totals["indent=4"][1] += elapsed
+
+            for fmt in artifacts.FORMATS:
+                actual = artifacts.dump_artifact(value, target, fmt)
+                loaded, elapsed = best_load_time(target)
+                if loaded != value:
+                    raise RuntimeError(f"{name} ({fmt}) does not round-trip")
+                totals[fmt][0] += os.path.getsize(actual)
+                totals[fmt][1] += elapsed
+            os.remove(actual)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    base_size, base_time = totals["indent=4"]
+    print(f"{len(sources)} artifacts")
+    for fmt in formats:
+        size, elapsed = totals[fmt]
+        print(f"{fmt:<10} {size / 1e6:7.2f} MB ({size / base_size:6.1%})  load {elapsed * 1000:7.1f}ms "
+              f"({elapsed / base_time:6.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+# __file__ is in backend/tests/
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+# 量測時不輸出存取 log
+os.environ.setdefault("LOG_SAMPLE_DEFAULT", "0")
+
+import app as backend_app
+from functions.fare_engine import BUS_OPTIONS
+
+
+def make_itineraries(count, seed=0):
+    rng = random.Random(seed)
+    route_names = list(backend_app.route_store.get().routes)
+    itineraries = []
+    for _ in range(count):
+        legs = rng.randint(1, 4)
+        if rng.random() < 0.5:
+            trips = [{"bus_type": rng.choice(BUS_OPTIONS), "trip_count": rng.randint(1, 3)} for _ in range(legs)]
+        else:
+            trips = [{"line_name": rng.choice(route_names), "trip_count": rng.randint(1, 3)} for _ in range(legs)]
+        itineraries.append({"bus_trips": trips})
+    return itineraries
+
+
+def bench(label, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {count:>7} itineraries  {elapsed * 1000:8.1f} ms  {count / elapsed:12,.0f} itineraries/s")
+
+
+def main(count=20000):
+    itineraries = make_itineraries(count)
+    client = backend_app.app.test_client()
+    all_routes = backend_app.route_store.get().routes
+    evaluator = backend_app.get_batch_fare_evaluator()
+
+    def resolve(line_name):
+        return backend_app.resolve_line_bus_type(all_routes, line_name)
+
+    legs, errors = evaluator.encode(itineraries, "full_fare", resolve)
+
+    bench("encode (python)", lambda: evaluator.encode(itineraries, "full_fare", resolve), count)
+    bench("evaluate (numpy)", lambda: evaluator.evaluate(legs, count), count)
+    bench("POST /api/batch_fare", lambda: client.post('/api/batch_fare', json={"itineraries": itineraries}), count)
+
+    # 對照：逐筆呼叫單一行程 API
+    sample = itineraries[:2000]
+
+    def one_by_one():
+        # /line_calculate_fare 會 print 請求內容，避免輸出干擾計時
+        with contextlib.redirect_stdout(io.StringIO()):
+            for it in sample:
+                url = '/type_calculate_fare' if 'bus_type' in it["bus_trips"][0] else '/line_calculate_fare'
+                client.post(url, json=dict(it, fare_type="full_fare"))
+
+    bench("per-itinerary endpoints", one_by_one, len(sample))
+
+
+if __name__ == "__main__":
+    main()
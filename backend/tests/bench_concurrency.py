@@ -0,0 +1,98 @@
+import http.client
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import threading
+import time
+from urllib.parse import quote
+
+# __file__ is in backend/tests/
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+db_path = os.path.join(backend_dir, 'data', 'bus_data.db')
+
+SERVERS = {
+    # 與 Procfile 相同的 WSGI 模式 (gunicorn 預設 1 個 sync worker)
+    "wsgi (gunicorn sync)": ["gunicorn", "--bind", "127.0.0.1:{port}", "--log-level", "warning", "app:app"],
+    "asgi (uvicorn)": ["uvicorn", "asgi:application", "--host", "127.0.0.1", "--port", "{port}", "--log-level", "warning"],
+}
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def client_worker(port, paths, requests_per_client, timings, errors):
+    rng = random.Random()
+    for _ in range(requests_per_client):
+        path = rng.choice(paths)
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status != 200:
+                errors.append(response.status)
+        except OSError as e:
+            errors.append(str(e))
+        timings.append(time.perf_counter() - start)
+
+
+def run_load(port, paths, clients, requests_per_client):
+    timings = []
+    errors = []
+    threads = [
+        threading.Thread(target=client_worker, args=(port, paths, requests_per_client, timings, errors))
+        for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return timings, errors, elapsed
+
+
+def main(clients=64, requests_per_client=30, port=8765):
+    if not os.path.exists(db_path):
+        print(f"DB not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    names = [r[0] for r in conn.execute("SELECT nameZh FROM routes ORDER BY id LIMIT 300")]
+    conn.close()
+    paths = [f"/api/route_stops?route_name={quote(n)}" for n in names] + ["/api/routes", "/api/bus_options"]
+
+    for label, command in SERVERS.items():
+        proc = subprocess.Popen([part.format(port=port) for part in command], cwd=backend_dir,
+                                env=dict(os.environ, LOG_SAMPLE_DEFAULT="0"))
+        try:
+            wait_ready(port)
+            run_load(port, paths, 4, 5)  # 暖機
+            timings, errors, elapsed = run_load(port, paths, clients, requests_per_client)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+        timings.sort()
+        print(f"{label:<22} clients={clients} requests={len(timings)} errors={len(errors)} "
+              f"throughput={len(timings) / elapsed:8.1f} req/s "
+              f"p50={statistics.median(timings) * 1000:7.1f}ms p95={timings[int(len(timings) * 0.95) - 1] * 1000:7.1f}ms")
+        port += 1
+
+
+if __name__ == "__main__":
+    main()
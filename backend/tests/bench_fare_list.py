@@ -0,0 +1,53 @@
+import gzip
+import io
+import os
+import sys
+import time
+
+# __file__ is in backend/tests/
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(backend_dir, 'functions'))
+sys.path.insert(0, backend_dir)
+
+from bench_update_data import generic_fare_rows, load_fare_fixture
+from functions import fare_list
+
+CITIES = ('taipei', 'newtaipei')
+ROUNDS = 5
+
+
+def schema_rows(xml_bytes, city):
+    return list(fare_list.iter_fare_rows(io.BytesIO(xml_bytes), city))
+
+
+def best_of(func, *args):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    for city in CITIES:
+        fare_gz = load_fare_fixture(city)
+        if fare_gz is None:
+            print(f"{city}: fare fixture not found, skipped")
+            continue
+        xml_bytes = gzip.decompress(fare_gz)
+
+        # 原本的通用轉換 (xml_to_dict) 作為基準
+        generic, generic_time = best_of(generic_fare_rows, xml_bytes, city)
+        schema, schema_time = best_of(schema_rows, xml_bytes, city)
+        if schema != generic:
+            raise RuntimeError(f"{city}: converted rows do not match")
+
+        print(f"{city:<10} {len(xml_bytes) / 1e6:5.1f} MB xml, {len(generic):>6} rows | "
+              f"generic {generic_time * 1000:7.1f}ms | schema {schema_time * 1000:7.1f}ms | "
+              f"x{generic_time / schema_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
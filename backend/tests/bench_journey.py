@@ -0,0 +1,62 @@
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+# __file__ is in backend/tests/
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from functions.fare_engine import default_engine
+from functions.journey_planner import JourneyGraph
+
+DB_PATH = os.path.join(backend_dir, 'data', 'bus_data.db')
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<24} n={len(timings):<6} mean={statistics.mean(timings) * 1e3:8.2f}ms "
+          f"p50={statistics.median(timings) * 1e3:8.2f}ms p95={p95 * 1e3:8.2f}ms")
+
+
+def main(queries=200, seed=1):
+    if not os.path.exists(DB_PATH):
+        print(f"DB not found at {DB_PATH}")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        start = time.perf_counter()
+        try:
+            graph = JourneyGraph(conn)
+        except sqlite3.OperationalError:
+            print("journey_patterns not found (rebuild the DB with convert_to_db.py)")
+            return
+        print(f"graph load: {(time.perf_counter() - start) * 1e3:.1f}ms "
+              f"({len(graph.patterns)} patterns, {len(graph.stop_patterns)} stops)")
+    finally:
+        conn.close()
+
+    rng = random.Random(seed)
+    names = sorted(graph.name_index)
+    fare_type_id = default_engine.encode_fare_type("full_fare")
+
+    found, not_found = [], []
+    for _ in range(queries):
+        origin, destination = rng.sample(names, 2)
+        start = time.perf_counter()
+        legs = graph.plan(graph.resolve(origin), graph.resolve(destination), fare_type_id)
+        elapsed = time.perf_counter() - start
+        (found if legs is not None else not_found).append(elapsed)
+
+    if found:
+        report("journey found", found)
+    if not_found:
+        report("no journey", not_found)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+# __file__ is in backend/tests/
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+# 量測時不輸出存取 log
+os.environ.setdefault("LOG_SAMPLE_DEFAULT", "0")
+
+import app as backend_app
+from functions.response_cache import ResponseCache
+
+
+def legacy_get_db_connection():
+    """改版前的作法：每次請求都重新開啟連線。"""
+    conn = sqlite3.connect(backend_app.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def sample_route_names(limit=200):
+    conn = sqlite3.connect(backend_app.DB_PATH)
+    try:
+        rows = conn.execute("SELECT nameZh FROM routes ORDER BY id LIMIT ?", (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+
+def run(client, route_names, rounds):
+    timings = []
+    for _ in range(rounds):
+        for name in route_names:
+            start = time.perf_counter()
+            response = client.get('/api/route_stops', query_string={"route_name": name})
+            timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{name}: HTTP {response.status_code}")
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<24} n={len(timings):<6} mean={statistics.mean(timings) * 1e6:8.1f}us "
+          f"p50={statistics.median(timings) * 1e6:8.1f}us p95={p95 * 1e6:8.1f}us")
+
+
+def main(rounds=5):
+    if not os.path.exists(backend_app.DB_PATH):
+        print(f"DB not found at {backend_app.DB_PATH}")
+        return
+
+    route_names = sample_route_names()
+    client = backend_app.app.test_client()
+    pooled_get_db_connection = backend_app.get_db_connection
+
+    # 前兩種模式停用回應快取，量測資料庫查詢本身
+    response_cache = backend_app.route_stops_cache
+    backend_app.route_stops_cache = ResponseCache(max_entries=0)
+
+    # 暖機 (讓兩種模式都先載入 Flask / 路線快照)
+    run(client, route_names[:10], 1)
+
+    backend_app.get_db_connection = legacy_get_db_connection
+    try:
+        report("per-request connect", run(client, route_names, rounds))
+    finally:
+        backend_app.get_db_connection = pooled_get_db_connection
+
+    report("pooled read-only", run(client, route_names, rounds))
+
+    backend_app.route_stops_cache = response_cache
+    run(client, route_names, 1)
+    report("response cache", run(client, route_names, rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# __file__ is in backend/tests/
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+snapshot_path = os.path.join(backend_dir, 'data', 'processed', 'startup_snapshot.json')
+
+FIRST_REQUESTS = ['/health', '/api/routes', '/api/route_stops?route_name=307', '/api/bus_options']
+
+# 在全新的 Python 行程中量測：匯入時間、各端點第一次請求的延遲、到 /ready 為止的時間
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {backend_dir!r})
+import app
+imported = time.perf_counter()
+# 與伺服器進入點 (gunicorn.conf.py / asgi.py) 相同，匯入後啟動預熱
+app.start_warm_up()
+client = app.app.test_client()
+first = {{}}
+for path in {paths!r}:
+    t = time.perf_counter()
+    status = client.get(path).status_code
+    first[path] = (time.perf_counter() - t, status)
+while client.get('/ready').status_code != 200:
+    time.sleep(0.001)
+ready = time.perf_counter()
+print(json.dumps({{"import": imported - start, "first": first, "ready": ready - start}}))
+'''
+
+
+def run_once(env):
+    code = CHILD.format(backend_dir=backend_dir, paths=FIRST_REQUESTS)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], cwd=backend_dir, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def report(label, results):
+    ms = lambda values: f"{statistics.median(values) * 1000:7.1f}ms"
+    print(f"{label}")
+    print(f"  import app            {ms([r['import'] for r in results])}")
+    for path in FIRST_REQUESTS:
+        statuses = {r['first'][path][1] for r in results}
+        print(f"  first {path:<34} {ms([r['first'][path][0] for r in results])}  status={sorted(statuses)}")
+    print(f"  ready (since import)  {ms([r['ready'] for r in results])}")
+    print(f"  process wall time     {ms([r['process'] for r in results])}")
+
+
+def main(runs=5):
+    if not os.path.exists(snapshot_path):
+        print(f"startup snapshot not found at {snapshot_path}; run functions/startup_snapshot.py first")
+        return
+
+    base_env = dict(os.environ, LOG_SAMPLE_DEFAULT="0")
+    modes = {
+        "startup snapshot": base_env,
+        "no snapshot (source files)": dict(base_env, STARTUP_SNAPSHOT_PATH=os.path.join(backend_dir, 'missing.json')),
+    }
+    for label, env in modes.items():
+        report(label, [run_once(env) for _ in range(runs)])
+
+
+if __name__ == "__main__":
+    main()
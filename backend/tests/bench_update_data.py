@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# __file__ is in backend/tests/
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(backend_dir, 'functions'))
+
+import update_data
+
+DATA_DIR = os.path.join(backend_dir, 'data')
+FIXTURE_FILES = ('bus_routes.json', 'stop_locations.json')
+
+# 票價資料以原始的 XML 格式 (gzip) 提供，下載時直接轉為資料列 (fare_list.py)
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FARE_FIXTURE = 'bus_route_fare_list.xml.gz'
+
+# 模擬遠端伺服器：每個回應前的延遲 (秒)，以及每份資料第一次請求回傳 503 (測試重試)
+RESPONSE_DELAY = 0.3
+
+
+class FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, feeds, delay):
+        super().__init__(('127.0.0.1', 0), FeedHandler)
+        self.feeds = feeds
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.reset(False)
+
+    def reset(self, fail_first):
+        with self.lock:
+            self.fail_first = set(self.feeds) if fail_first else set()
+            self.requests = 0
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            fail = self.path in server.fail_first
+            server.fail_first.discard(self.path)
+        time.sleep(server.delay)
+
+        body = server.feeds.get(self.path)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"' if body is not None else None
+        if not fail and etag is not None and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if fail or body is None:
+            self.send_response(503 if fail else 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/gzip")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def load_fare_fixture(city):
+    """tests/fixtures/<city>/ 的票價 XML (gzip 壓縮)，不存在時回傳 None。"""
+    path = os.path.join(FIXTURE_DIR, city, FARE_FIXTURE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def generic_fare_rows(xml_bytes, city, skip_counts=None):
+    """原本的做法：整份 XML 以 xml_to_dict 遞迴轉為 dict，再由 json_fare_rows 逐層取出 BufferZone。"""
+    root = ET.fromstring(xml_bytes)
+    data = [update_data.xml_to_dict(child)[child.tag.split('}')[-1]] for child in root]
+    return list(update_data.fare_list.json_fare_rows(data, city, skip_counts))
+
+
+def load_fixture_feeds():
+    """以 data/<city>/ 的現有資料與 tests/fixtures/ 的票價 XML 作為模擬的 gzip 資料來源，回傳 (feeds, 預期輸出)。"""
+    feeds = {}
+    expected = {}
+    for city in update_data.FEEDS:
+        for filename in FIXTURE_FILES:
+            path = os.path.join(DATA_DIR, city, filename)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                raw = f.read()
+            feeds[f"/{city}/{filename}.gz"] = gzip.compress(raw, compresslevel=6)
+            expected[os.path.join(city, filename)] = json.loads(raw)
+
+        fare_gz = load_fare_fixture(city)
+        if fare_gz is not None:
+            skip_counts = {}
+            rows = generic_fare_rows(gzip.decompress(fare_gz), city, skip_counts)
+            feeds[f"/{city}/{update_data.FARE_ROWS_FILE}.gz"] = fare_gz
+            expected[os.path.join(city, update_data.FARE_ROWS_FILE)] = \
+                update_data.fare_list.fare_rows_document(rows, skip_counts)
+    return feeds, expected
+
+
+def run(server, expected, workers, out_dir, backoff=0.05, previous=None):
+    sources = {}
+    for path in server.feeds:
+        _, city, name = path.split('/')
+        sources.setdefault(city, []).append((server.url(path), name[:-len('.gz')]))
+
+    start = time.perf_counter()
+    results = update_data.download_all(sources, out_dir, workers=workers, backoff=backoff, previous=previous)
+    elapsed = time.perf_counter() - start
+    for r in results:
+        if not r["ok"]:
+            raise RuntimeError(f"{r['file']} failed")
+        if update_data.artifacts.load_artifact(os.path.join(out_dir, r["file"])) != expected[r["file"]]:
+            raise RuntimeError(f"{r['file']} does not match the fixture")
+    return results, elapsed
+
+
+def main():
+    feeds, expected = load_fixture_feeds()
+    if not feeds:
+        print(f"No fixture feeds found under {DATA_DIR}")
+        return
+    print(f"{len(feeds)} fixture feeds, {sum(len(b) for b in feeds.values()) / 1e6:.1f} MB gzip, "
+          f"{RESPONSE_DELAY * 1000:.0f}ms server delay")
+
+    # 最後一輪沿用前一輪的下載結果，以條件式請求 (ETag) 略過未變更的資料
+    scenarios = (("serial", 1, False, False), ("parallel", 8, False, False),
+                 ("parallel + 503", 8, True, False), ("conditional", 8, False, True))
+    server = FeedServer(feeds, RESPONSE_DELAY)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    previous = None
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            for label, workers, fail_first, conditional in scenarios:
+                server.reset(fail_first)
+                results, elapsed = run(server, expected, workers, out_dir, previous=previous if conditional else None)
+                previous = {r["file"]: r["feed"] for r in results}
+                attempts = sum(r["attempts"] for r in results)
+                not_modified = sum(1 for r in results if r["status"] == "not_modified")
+                print(f"{label:<16} workers={workers:<2} elapsed={elapsed:6.2f}s requests={server.requests:<3} "
+                      f"attempts={attempts:<3} not_modified={not_modified}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -19,9 +19,11 @@ export const ENDPOINTS = {
     TYPE_CALCULATE: '/type_calculate_fare',
     LINE_CALCULATE: '/line_calculate_fare',
     ROUTES: '/api/routes',
+    ROUTE_SEARCH: '/api/routes/search',
     BUS_OPTIONS: '/api/bus_options',
     ROUTE_STOPS: '/api/route_stops',
-    HEALTH: '/health'
+    HEALTH: '/health',
+    READY: '/ready'
 };
 
 // 公車種類選項 (已改為動態讀取，保留作為 fallback 或參考)
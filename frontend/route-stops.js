@@ -9,7 +9,6 @@ import { BACKEND_URL, ENDPOINTS } from './config.js';
  */
 export async function initGetLineStationsPage() {
     const routeSelect = document.getElementById('route-select');
-    const loadingRoutesStatus = document.getElementById('loading-routes-status');
     const loadingStopsStatus = document.getElementById('loading-stops-status');
     const errorMessage = document.getElementById('error-message');
     const stationsContainer = document.getElementById('stations-container');
@@ -34,33 +33,11 @@ export async function initGetLineStationsPage() {
         return;
     }
 
-    let allRoutes = [];
     let currentFlatStops = []; // Store flattened list of stops for fare calc
-    let currentRoutes = []; // Fix: Declare here to avoid ReferenceError
-
-    // 1. 載入所有路線
-    try {
-        const response = await fetch(BACKEND_URL + ENDPOINTS.ROUTES);
-        if (!response.ok) throw new Error('無法載入路線資料');
-
-        allRoutes = await response.json();
-        populateRouteSelect(allRoutes);
-        loadingRoutesStatus.style.display = 'none';
-
-    } catch (error) {
-        console.error(error);
-        loadingRoutesStatus.textContent = `載入路線失敗: ${error.message}`;
-        loadingRoutesStatus.style.color = 'red';
-    }
 
     const clearRouteSearchBtn = document.getElementById('clear-route-search');
 
-    // 2. 填充與搜尋邏輯
-    function populateRouteSelect(routes) {
-        currentRoutes = routes;
-        // renderDropdown(routes); 
-    }
-
+    // 2. 路線搜尋：依輸入內容向 /api/routes/search 取得，不在載入時下載全部路線
     function toggleClearBtn() {
         if (routeSearch.value.trim().length > 0) {
             clearRouteSearchBtn.style.display = 'flex';
@@ -69,63 +46,38 @@ export async function initGetLineStationsPage() {
         }
     }
 
-    // Input Event (Filtering)
-    routeSearch.addEventListener('input', (e) => {
-        const query = e.target.value.toLowerCase();
-        toggleClearBtn();
+    // 由後端 /api/routes/search 篩選並排序 (不分大小寫)，只顯示前 SEARCH_LIMIT 筆；
+    // 多取一筆以判斷結果是否被截斷，截斷時在清單最後提示使用者輸入更多文字
+    const SEARCH_LIMIT = 100;
+    let searchController = null;
 
-        const filtered = currentRoutes.filter(r =>
-            r.OutputName.toLowerCase().includes(query) ||
-            r.RouteName.toLowerCase().includes(query)
-        );
-
-        // Smart Sort: Exact Match > Starts With > Numeric Start > Length > Alphabetical
-        filtered.sort((a, b) => {
-            const nameA = a.OutputName.toLowerCase();
-            const nameB = b.OutputName.toLowerCase();
-            const routeA = a.RouteName.toLowerCase();
-            const routeB = b.RouteName.toLowerCase();
-
-            // 1. Exact Match on RouteName (e.g. "5" vs "5")
-            if (routeA === query && routeB !== query) return -1;
-            if (routeB === query && routeA !== query) return 1;
-
-            // 2. Starts With on RouteName (e.g. "5" vs "508")
-            const startA = routeA.startsWith(query);
-            const startB = routeB.startsWith(query);
-            if (startA && !startB) return -1;
-            if (!startA && startB) return 1;
-
-            // 3. Numeric Start Priority & Value Sort
-            // Routes starting with a digit come before routes starting with non-digit
-            // AND within numeric routes, sort by integer value (e.g. 225 < 225區 < 226)
-            const isNumA = /^\d/.test(routeA);
-            const isNumB = /^\d/.test(routeB);
-
-            if (isNumA && !isNumB) return -1;
-            if (!isNumA && isNumB) return 1;
-
-            if (isNumA && isNumB) {
-                // Parse integer part
-                const numA = parseInt(routeA, 10);
-                const numB = parseInt(routeB, 10);
-
-                if (numA !== numB) {
-                    return numA - numB;
-                }
-                // If numbers match (e.g. 225 vs 225區), shorter usually base route
-                // localeCompare handles this nicely too (225 < 225Sec)
-                return nameA.localeCompare(nameB);
-            }
+    async function searchRoutes(query) {
+        // 取消上一次尚未完成的搜尋，避免較舊的結果覆蓋新的結果
+        if (searchController) searchController.abort();
+        searchController = new AbortController();
 
-            // 4. Length (Shorter is usually more relevant for text routes)
-            if (nameA.length !== nameB.length) return nameA.length - nameB.length;
-
-            return nameA.localeCompare(nameB);
-        });
+        let routes;
+        try {
+            const url = `${BACKEND_URL}${ENDPOINTS.ROUTE_SEARCH}?q=${encodeURIComponent(query)}&limit=${SEARCH_LIMIT + 1}`;
+            const response = await fetch(url, { signal: searchController.signal });
+            if (!response.ok) throw new Error('無法搜尋路線');
+            routes = await response.json();
+        } catch (error) {
+            if (error.name === 'AbortError') return;
+            console.error(error);
+            renderMessage(`搜尋路線失敗: ${error.message}`, 'red');
+            routeList.style.display = 'block';
+            return;
+        }
 
-        renderDropdown(filtered, query);
+        renderDropdown(routes.slice(0, SEARCH_LIMIT), routes.length > SEARCH_LIMIT);
         routeList.style.display = 'block';
+    }
+
+    // Input Event (Filtering)
+    routeSearch.addEventListener('input', (e) => {
+        toggleClearBtn();
+        searchRoutes(e.target.value.trim());
     });
 
     // Clear Button Click
@@ -133,23 +85,17 @@ export async function initGetLineStationsPage() {
         // Prevent event bubbling if needed, though button is outside ul
         routeSearch.value = '';
         routeSelectHidden.value = '';
-        renderDropdown(currentRoutes, ""); // Show all logic? Or reset?
-        // Let's reset display logic too
         resetDisplay();
         toggleClearBtn();
-        routeList.style.display = 'block'; // Keep list open or close? User might want to browse. Open is better.
+        // Keep the list open so the user can browse
+        searchRoutes('');
         routeSearch.focus();
     });
 
     // Focus Event (Show List)
     routeSearch.addEventListener('focus', () => {
         toggleClearBtn();
-        if (routeSearch.value.trim() === "") {
-            renderDropdown(currentRoutes, "");
-        } else {
-            renderDropdown(currentRoutes.filter(r => r.OutputName.includes(routeSearch.value) || r.RouteName.includes(routeSearch.value)), routeSearch.value);
-        }
-        routeList.style.display = 'block';
+        searchRoutes(routeSearch.value.trim());
     });
 
     // Click Outside to Close
@@ -160,32 +106,31 @@ export async function initGetLineStationsPage() {
         }
     });
 
-    function renderDropdown(routes, query) {
+    function messageItem(text, color) {
+        const li = document.createElement('li');
+        li.className = 'dropdown-item';
+        li.textContent = text;
+        li.style.color = color;
+        li.style.cursor = 'default';
+        return li;
+    }
+
+    function renderMessage(text, color) {
+        routeList.innerHTML = '';
+        routeList.appendChild(messageItem(text, color));
+    }
+
+    function renderDropdown(routes, truncated) {
         routeList.innerHTML = '';
         if (routes.length === 0) {
-            const li = document.createElement('li');
-            li.className = 'dropdown-item';
-            li.textContent = '無符合路線';
-            li.style.color = '#999';
-            li.style.cursor = 'default';
-            routeList.appendChild(li);
+            routeList.appendChild(messageItem('無符合路線', '#999'));
             return;
         }
 
-        // Limit results to improve performance
-        // User requested ALL results. Removing limit. 
-        // const MAX_RESULTS = 100;
-        // const displayRoutes = routes.slice(0, MAX_RESULTS);
-        const displayRoutes = routes;
-
-        displayRoutes.forEach(route => {
+        routes.forEach(route => {
             const li = document.createElement('li');
             li.className = 'dropdown-item';
-
-            // Highlight Logic
-            const text = route.OutputName;
-            /* Simple highlighting if needed, maybe overkill for now. */
-            li.textContent = text;
+            li.textContent = route.OutputName;
 
             li.addEventListener('click', () => {
                 routeSearch.value = route.OutputName;
@@ -198,6 +143,11 @@ export async function initGetLineStationsPage() {
             });
             routeList.appendChild(li);
         });
+
+        // 只顯示前 SEARCH_LIMIT 筆，其餘需輸入更多文字縮小範圍
+        if (truncated) {
+            routeList.appendChild(messageItem(`僅顯示前 ${SEARCH_LIMIT} 筆，請輸入更多文字以縮小範圍`, '#999'));
+        }
     }
 
     // 3. 處理路線變更 (Refactored to separate function)
@@ -48,7 +48,13 @@ export async function checkServerStatus() {
     statusDiv.className = 'checking';
 
     try {
-        const response = await fetch(BACKEND_URL + ENDPOINTS.HEALTH);
+        // 只呼叫 /ready：200 與 503 都代表伺服器可連線，503 表示仍在預熱中，稍後再確認
+        const response = await fetch(BACKEND_URL + ENDPOINTS.READY);
+        if (response.status === 503) {
+            statusDiv.textContent = '後端伺服器連線狀態：啟動中...';
+            setTimeout(checkServerStatus, 1000);
+            return;
+        }
         if (response.ok) {
             statusDiv.textContent = '後端伺服器連線狀態：已連線';
             statusDiv.className = 'connected';